@@ -0,0 +1,370 @@
+"""
+Break tone-recognition errors down by syllable, initial, final and clip properties.
+
+Reads one or more results CSVs (run_tone_eval.py, run_tone_experiments.py, merge_shards.py)
+and joins each row with metadata about its clip:
+  - pinyin / initial / final of the true syllable (index entries or cmn-<pinyin><tone> filenames)
+  - heard_initial / heard_final parsed from the model's heard_pinyin
+  - duration_bin from the index duration_s (or a metadata duration_s / duration_ms column)
+  - any column of --metadata CSVs keyed by audio_file, e.g. the synthesis parameters
+    (duration_ms, range_hz, f0_high_hz) from generate_tones.py --sweep, or extra pack fields
+Every other results column (model, prompt_id, stage, ...) can be grouped on directly;
+"tone" is the true tone and "pred" the predicted tone.
+
+Each column is integer-coded once; every group key (e.g. model,initial or model,tone,duration_bin)
+is then one np.unique over the combined codes plus a few np.bincount calls, so millions of rows
+and many keys stay fast. Per group: rows, answered share, accuracy and macro F1 over answered
+rows (empty predictions excluded, as in analyze_tone_results.py), the share with the heard
+pinyin syllable correct, and how often the tone is still wrong when the syllable is right.
+Samples from --samples runs count as separate rows.
+
+Usage:
+  python scripts/analyze_error_breakdown.py results/tone_eval_syllabs_index.csv --manifest audio-cmn/64k/syllabs/index.json
+  python scripts/analyze_error_breakdown.py results/tone_eval_sweep.csv --metadata synthetic_tones/sweep/metadata.csv \\
+      --by model,range_hz --by model,tone,duration_ms
+  python scripts/analyze_error_breakdown.py results/run.csv --by model,initial --min-n 20 --csv-out results/breakdown.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import operator
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+from packed_corpus import PackedCorpus
+from pinyin_utils import parse_filename, parse_syllable, split_pinyin
+
+_ROOT = Path(__file__).resolve().parent.parent
+SKIP_COLUMNS = ("raw_response",)  # free text; never a group key and the bulk of the file
+READ_CHUNK = 100_000  # CSV rows transposed and coded per step
+DENSE_GROUPS = 1 << 22  # key spaces up to this size are grouped with bincount instead of a sort
+UNKNOWN = "?"
+ZERO_INITIAL_LABEL = "(zero)"
+DEFAULT_DURATION_EDGES = (0.25, 0.4, 0.6)  # seconds
+DEFAULT_KEYS = ["model", "model,tone", "model,initial", "model,final", "model,duration_bin", "model,tone,duration_bin"]
+
+
+def encode(values) -> tuple[np.ndarray, list[str]]:
+    """(int32 codes, labels) with labels in first-seen order."""
+    index: dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32)
+    return codes, list(index)
+
+
+def read_results(paths: list[Path]) -> dict[str, tuple[np.ndarray, list[str]]]:
+    """Integer-coded columns of all results CSVs (missing columns are ''), skipping SKIP_COLUMNS.
+
+    Rows are read READ_CHUNK at a time and each column is coded against a
+    running label index, so raw strings are never held for the whole file."""
+    index: dict[str, dict[str, int]] = {}
+    parts: dict[str, list[np.ndarray]] = {}
+    n = 0
+
+    def add(column: str, values, count: int) -> None:
+        if column not in index:
+            index[column] = {"": 0} if n else {}
+            parts[column] = [np.zeros(n, dtype=np.int32)]  # earlier files lacked this column
+        idx = index[column]
+        for v in sorted(set(values) - idx.keys()):  # sorted: labels do not depend on hash order
+            idx[v] = len(idx)
+        parts[column].append(np.fromiter(map(idx.__getitem__, values), dtype=np.int32, count=count))
+
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            keep = [(i, c) for i, c in enumerate(header) if c not in SKIP_COLUMNS]
+            while True:
+                chunk = list(itertools.islice(reader, READ_CHUNK))
+                if not chunk:
+                    break
+                width = len(header)
+                if min(map(len, chunk)) < width:
+                    chunk = [r + [""] * (width - len(r)) for r in chunk]
+                for i, c in keep:
+                    add(c, list(map(operator.itemgetter(i), chunk)), len(chunk))
+                for c in index:
+                    if c not in header:
+                        add(c, [""] * len(chunk), len(chunk))
+                n += len(chunk)
+    return {c: (np.concatenate(parts[c]), list(index[c])) for c in index}
+
+
+def lookup(labels: list[str], fn, dtype=object) -> np.ndarray:
+    """fn applied once per distinct label; index the result with a codes array."""
+    return np.array([fn(label) for label in labels], dtype=dtype)
+
+
+def load_clip_metadata(
+    manifest: Path | None,
+    pack: Path | None,
+    metadata_csvs: list[Path],
+) -> dict[str, dict[str, str]]:
+    """{audio_file: {column: value}} from an index_corpus index, a pack's entry fields and metadata CSVs."""
+    meta: dict[str, dict[str, str]] = {}
+    if manifest is not None:
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+        for name, e in (data.get("entries") or {}).items():
+            fields = {k: e[k] for k in ("pinyin", "initial", "final", "duration_s") if e.get(k) is not None}
+            meta.setdefault(name, {}).update({k: str(v) for k, v in fields.items()})
+    if pack is not None:
+        with PackedCorpus(pack) as pc:
+            reserved = {"offset", "length", "format", "tone", "sha1", "pcm"}
+            for name, e in pc.entries.items():
+                meta.setdefault(name, {}).update({k: str(v) for k, v in e.items() if k not in reserved})
+    for path in metadata_csvs:
+        with open(path, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                name = r.pop("audio_file", None)
+                r.pop("tone", None)
+                if name:
+                    meta.setdefault(name, {}).update(r)
+    return meta
+
+
+def duration_label(seconds: float | None, edges: tuple[float, ...]) -> str:
+    if seconds is None:
+        return UNKNOWN
+    k = int(np.searchsorted(edges, seconds, side="right"))
+    if k == 0:
+        return f"<{edges[0]:.2f}s"
+    if k == len(edges):
+        return f">={edges[-1]:.2f}s"
+    return f"{edges[k - 1]:.2f}-{edges[k]:.2f}s"
+
+
+def _clip_duration(fields: dict[str, str]) -> float | None:
+    for key, scale in (("duration_s", 1.0), ("duration_ms", 0.001)):
+        try:
+            return float(fields[key]) * scale
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def build_columns(
+    cols: dict[str, tuple[np.ndarray, list[str]]],
+    clip_meta: dict[str, dict[str, str]],
+    duration_edges: tuple[float, ...],
+) -> tuple[dict[str, tuple[np.ndarray, list[str]]], dict[str, np.ndarray]]:
+    """(group dimensions {name: (codes, labels)}, per-row arrays true / pred / valid / pinyin_ok / heard_known)."""
+    file_codes, files = cols["audio_file"]
+    dims = {c: v for c, v in cols.items() if c not in ("true_tone", "predicted_tone", "heard_pinyin")}
+    dims["tone"] = cols["true_tone"]
+    dims["pred"] = cols["predicted_tone"]
+
+    # Per distinct clip: true syllable, initial, final, duration bin and metadata columns
+    def true_syllable(name: str) -> str:
+        fields = clip_meta.get(name, {})
+        if fields.get("pinyin"):
+            return fields["pinyin"]
+        label = parse_filename(name)
+        return label[0] if label else ""
+
+    syllables = [true_syllable(f) for f in files]
+    parts = [split_pinyin(s) if s else (None, None) for s in syllables]
+    per_file = {
+        "pinyin": [s or UNKNOWN for s in syllables],
+        "initial": [UNKNOWN if i is None else (i or ZERO_INITIAL_LABEL) for i, _ in parts],
+        "final": [UNKNOWN if fin is None else fin for _, fin in parts],
+        "duration_bin": [duration_label(_clip_duration(clip_meta.get(f, {})), duration_edges) for f in files],
+    }
+    extra = sorted({k for f in files for k in clip_meta.get(f, {})} - set(per_file) - {"pinyin", "initial", "final"})
+    for k in extra:
+        per_file[k] = [clip_meta.get(f, {}).get(k, UNKNOWN) for f in files]
+    for name, values in per_file.items():
+        if name in dims:
+            continue
+        codes, labels = encode(values)
+        dims[name] = (codes[file_codes], labels)
+
+    # Per distinct heard answer: syllable, initial, final
+    heard_codes, heard = cols.get("heard_pinyin", (np.zeros(len(file_codes), dtype=np.int32), [""]))
+    heard_parsed = [parse_syllable(h) if h else None for h in heard]
+    heard_syl = [p[0] if p else "" for p in heard_parsed]
+    heard_parts = [split_pinyin(s) if s else (None, None) for s in heard_syl]
+    for name, values in (
+        ("heard_initial", [UNKNOWN if i is None else (i or ZERO_INITIAL_LABEL) for i, _ in heard_parts]),
+        ("heard_final", [UNKNOWN if fin is None else fin for _, fin in heard_parts]),
+    ):
+        codes, labels = encode(values)
+        dims[name] = (codes[heard_codes], labels)
+
+    # Syllables from both sides share one vocabulary so correctness is one array comparison
+    vocab: dict[str, int] = {}
+    true_sid = np.array([vocab.setdefault(s, len(vocab)) if s else -1 for s in syllables], dtype=np.int64)
+    heard_sid = np.array([vocab.setdefault(s, len(vocab)) if s else -2 for s in heard_syl], dtype=np.int64)
+    row_true_sid = true_sid[file_codes]
+    row_heard_sid = heard_sid[heard_codes]
+
+    def tone_of(label: str) -> int:
+        label = label.strip()
+        return int(label) if label in ("1", "2", "3", "4") else 0
+
+    true = lookup(cols["true_tone"][1], tone_of, np.int8)[cols["true_tone"][0]]
+    pred = lookup(cols["predicted_tone"][1], tone_of, np.int8)[cols["predicted_tone"][0]]
+    rows = {
+        "true": true,
+        "pred": pred,
+        "valid": pred > 0,
+        "heard_known": (row_heard_sid >= 0) & (row_true_sid >= 0),
+        "pinyin_ok": row_heard_sid == row_true_sid,
+    }
+    keep = true > 0  # rows without a 1-4 label (e.g. single-file runs) have nothing to score
+    if not keep.all():
+        dims = {name: (codes[keep], labels) for name, (codes, labels) in dims.items()}
+        rows = {name: values[keep] for name, values in rows.items()}
+    return dims, rows
+
+
+def group_metrics(
+    dims: dict[str, tuple[np.ndarray, list[str]]],
+    rows: dict[str, np.ndarray],
+    key: list[str],
+) -> list[dict]:
+    """Metrics for every observed combination of the key dimensions."""
+    codes = [dims[k][0].astype(np.int64) for k in key]
+    sizes = [max(len(dims[k][1]), 1) for k in key]
+    gid = np.ravel_multi_index(codes, sizes) if len(codes) > 1 else codes[0]
+    space = int(np.prod(sizes))
+    if space <= max(DENSE_GROUPS, len(gid)):
+        # Small key space: observed groups via bincount, no O(n log n) sort
+        uniq = np.flatnonzero(np.bincount(gid, minlength=space))
+        remap = np.full(space, -1, dtype=np.int64)
+        remap[uniq] = np.arange(len(uniq))
+        inv = remap[gid]
+    else:
+        uniq, inv = np.unique(gid, return_inverse=True)
+    g = len(uniq)
+    valid = rows["valid"]
+    true, pred = rows["true"].astype(np.int64), rows["pred"].astype(np.int64)
+    n = np.bincount(inv, minlength=g)
+    answered = np.bincount(inv, weights=valid, minlength=g)
+    correct = np.bincount(inv, weights=valid & (pred == true), minlength=g)
+    cm = np.bincount(
+        inv[valid] * 16 + (true[valid] - 1) * 4 + (pred[valid] - 1), minlength=g * 16
+    ).reshape(g, 4, 4)
+    tp = np.diagonal(cm, axis1=1, axis2=2)
+    denom = cm.sum(axis=2) + cm.sum(axis=1)  # 2tp + fp + fn
+    f1 = np.divide(2 * tp, denom, out=np.zeros(tp.shape), where=denom > 0)
+    known = rows["heard_known"] & valid
+    pinyin_ok = known & rows["pinyin_ok"]
+    n_known = np.bincount(inv, weights=known, minlength=g)
+    n_pinyin_ok = np.bincount(inv, weights=pinyin_ok, minlength=g)
+    n_ok_wrong = np.bincount(inv, weights=pinyin_ok & (pred != true), minlength=g)
+    combos = np.array(np.unravel_index(uniq, sizes)).T if len(codes) > 1 else uniq[:, None]
+    out = []
+    for j in range(g):
+        out.append({
+            "key": ",".join(key),
+            "group": tuple(dims[k][1][c] for k, c in zip(key, combos[j])),
+            "n": int(n[j]),
+            "answered": answered[j] / n[j],
+            "accuracy": correct[j] / answered[j] if answered[j] else float("nan"),
+            "macro_f1": f1[j].mean(),
+            "pinyin_correct": n_pinyin_ok[j] / n_known[j] if n_known[j] else float("nan"),
+            "tone_wrong_given_pinyin": n_ok_wrong[j] / n_pinyin_ok[j] if n_pinyin_ok[j] else float("nan"),
+        })
+    return out
+
+
+def format_table(key: list[str], groups: list[dict], min_n: int, top: int | None) -> str:
+    shown = sorted((r for r in groups if r["n"] >= min_n), key=lambda r: (np.nan_to_num(r["accuracy"], nan=-1), -r["n"], r["group"]))
+    hidden = len(groups) - len(shown)
+    if top is not None:
+        hidden += max(len(shown) - top, 0)
+        shown = shown[:top]
+    widths = [max([len(k)] + [len(r["group"][i]) for r in shown]) for i, k in enumerate(key)]
+    head = "  ".join(f"{k:<{w}}" for k, w in zip(key, widths))
+    lines = [
+        f"\nBy {', '.join(key)} (worst accuracy first):",
+        f"{head}  {'n':>7}  {'answered':>8}  {'acc':>6}  {'macroF1':>7}  {'pinyin ok':>9}  {'tone wrong|pinyin ok':>20}",
+    ]
+
+    def pct(x: float) -> str:
+        return "-" if np.isnan(x) else f"{x:.1%}"
+
+    for r in shown:
+        cells = "  ".join(f"{v:<{w}}" for v, w in zip(r["group"], widths))
+        lines.append(
+            f"{cells}  {r['n']:>7}  {pct(r['answered']):>8}  {pct(r['accuracy']):>6}  {r['macro_f1']:>7.3f}"
+            f"  {pct(r['pinyin_correct']):>9}  {pct(r['tone_wrong_given_pinyin']):>20}"
+        )
+    if hidden:
+        lines.append(f"({hidden} more groups with n < {min_n} or beyond --top)")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Grouped tone error breakdowns joined with clip metadata.")
+    parser.add_argument("csvs", nargs="+", type=Path, help="Results CSV(s) from run_tone_eval / run_tone_experiments / merge_shards")
+    parser.add_argument("--manifest", type=Path, default=None, help="index_corpus index for pinyin / duration metadata")
+    parser.add_argument("--pack", type=Path, default=None, help="Packed corpus whose extra entry fields become columns")
+    parser.add_argument("--metadata", type=Path, action="append", default=[], help="CSV keyed by audio_file (repeatable), e.g. synthetic_tones/sweep/metadata.csv")
+    parser.add_argument("--by", action="append", default=None, help="Comma-separated group key (repeatable; default: model, model+tone, model+initial, ...)")
+    parser.add_argument("--duration-bins", type=str, default=",".join(map(str, DEFAULT_DURATION_EDGES)), help="Duration bin edges in seconds")
+    parser.add_argument("--min-n", type=int, default=5, help="Hide groups with fewer rows (default: 5)")
+    parser.add_argument("--top", type=int, default=20, help="Show at most this many groups per key (default: 20; 0 = all)")
+    parser.add_argument("--csv-out", type=Path, default=None, help="Write every group of every key to this CSV")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "analyze_error_breakdown")
+
+    def resolve(path: Path | None) -> Path | None:
+        return path if path is None or path.is_absolute() else _ROOT / path
+
+    paths = [resolve(p) for p in args.csvs]
+    for p in paths:
+        if not p.exists():
+            print(f"Error: file not found: {p}", file=sys.stderr)
+            return 1
+    with profiling.span("load"):
+        cols = read_results(paths)
+        for required in ("model", "audio_file", "true_tone", "predicted_tone"):
+            if required not in cols:
+                print(f"Error: results have no {required} column", file=sys.stderr)
+                return 1
+        clip_meta = load_clip_metadata(resolve(args.manifest), resolve(args.pack), [resolve(p) for p in args.metadata])
+    edges = tuple(float(x) for x in args.duration_bins.split(","))
+    with profiling.span("join"):
+        dims, rows = build_columns(cols, clip_meta, edges)
+
+    # Default keys, plus model × each metadata column, skipping dimensions with nothing known
+    keys = [k.split(",") for k in (args.by or DEFAULT_KEYS)]
+    if args.by is None:
+        keys += [["model", c] for c in sorted({c for m in clip_meta.values() for c in m} - {"pinyin", "initial", "final", "duration_s"})]
+    n_rows = len(rows["true"])
+    print(f"{n_rows} rows, {len(dims['model'][1])} models, {len(dims['audio_file'][1])} clips")
+    results = []
+    for key in keys:
+        unknown = [k for k in key if k not in dims]
+        if unknown:
+            print(f"\nSkipping {','.join(key)}: unknown column(s) {', '.join(unknown)}; available: {', '.join(sorted(dims))}")
+            continue
+        if args.by is None and any(dims[k][1] == [UNKNOWN] for k in key):
+            continue
+        with profiling.span("group", key=",".join(key)):
+            groups = group_metrics(dims, rows, key)
+        results.extend(groups)
+        print(format_table(key, groups, args.min_n, args.top or None))
+
+    if args.csv_out is not None:
+        out = resolve(args.csv_out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=["key", "group", "n", "answered", "accuracy", "macro_f1", "pinyin_correct", "tone_wrong_given_pinyin"])
+            w.writeheader()
+            for r in results:
+                w.writerow({**r, "group": "|".join(r["group"])})
+        print(f"\nWrote {len(results)} groups to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
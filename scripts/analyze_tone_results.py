@@ -3,6 +3,11 @@ Compute per-model confusion matrix, precision, recall, and F1 for tone predictio
 
 Reads a results CSV from run_tone_eval.py (columns: model, audio_file, true_tone,
 predicted_tone, ...). Rows with empty predicted_tone are excluded from metrics.
+If the CSV has a prompt_id column (run_tone_experiments.py), metrics are broken down
+per prompt, with a macro-F1 table of prompt × model first. If it has a sample_idx column
+(run_tone_eval.py --samples N), samples are aggregated per clip by majority vote: the
+report compares single-sample (first draw) and voted macro F1 and shows per-model answer
+stability, and the detailed metrics use the voted predictions.
 
 Usage:
   python scripts/analyze_tone_results.py results/tone_eval_15syllables.csv
@@ -12,8 +17,12 @@ Usage:
 import argparse
 import csv
 import sys
+from collections import Counter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+
 TONES = [1, 2, 3, 4]
 
 # TABLE II: number of samples per tone in training data (baseline prior)
@@ -64,6 +73,74 @@ def precision_recall_f1(cm: list[list[int]], tone: int) -> tuple[float, float, f
     return precision, recall, f1
 
 
+def macro_f1(cm: list[list[int]]) -> float:
+    return sum(precision_recall_f1(cm, t)[2] for t in TONES) / 4
+
+
+def prompt_model_table(rows: list[dict], prompt_ids: list[str], models: list[str]) -> str:
+    """Macro F1 per (prompt_id, model); '-' where a cell has no rows."""
+    by_prompt = {pid: [r for r in rows if (r.get("prompt_id") or "") == pid] for pid in prompt_ids}
+    width = max(len(m) for m in models)
+    lines = ["Macro F1 by prompt (columns) and model (rows):", " " * width + "".join(f"  {pid:>14}" for pid in prompt_ids)]
+    for model in models:
+        cells = []
+        for pid in prompt_ids:
+            subset = by_prompt[pid]
+            if any(r.get("model") == model for r in subset):
+                cells.append(f"  {macro_f1(confusion_matrix(subset, model)):>14.4f}")
+            else:
+                cells.append(f"  {'-':>14}")
+        lines.append(f"{model:<{width}}" + "".join(cells))
+    return "\n".join(lines)
+
+
+def vote_rows(rows: list[dict]) -> list[dict]:
+    """Collapse samples to one row per (prompt_id, model, audio_file) by majority vote.
+
+    Votes count only parseable tones; ties go to the answer seen first. Each voted row gets
+    n_samples and agreement = votes for the winner / n_samples (empty answers count against)."""
+    groups: dict[tuple, list[dict]] = {}
+    for r in rows:
+        key = (r.get("prompt_id") or "", r.get("model"), r.get("audio_file"))
+        groups.setdefault(key, []).append(r)
+    voted = []
+    for samples in groups.values():
+        samples.sort(key=lambda r: int(r.get("sample_idx") or 0))
+        preds = [(r.get("predicted_tone") or "").strip() for r in samples]
+        counts = Counter(p for p in preds if p in ("1", "2", "3", "4"))
+        winner, top = "", 0
+        for p in preds:  # first-seen order breaks ties
+            if counts.get(p, 0) > top:
+                winner, top = p, counts[p]
+        row = dict(samples[0])
+        row.update(predicted_tone=winner, n_samples=len(samples), agreement=top / len(samples))
+        voted.append(row)
+    return voted
+
+
+def self_consistency_table(rows: list[dict], voted: list[dict], models: list[str]) -> str:
+    """Per model: single-sample vs voted macro F1, mean agreement, share of unanimous clips."""
+    first = [r for r in rows if int(r.get("sample_idx") or 0) == 0]
+    width = max(len(m) for m in models)
+    lines = [
+        "Self-consistency (single = first sample per clip, voted = majority over samples):",
+        f"{'model':<{width}}  {'samples':>7}  {'single F1':>9}  {'voted F1':>9}  {'agreement':>9}  {'unanimous':>9}",
+    ]
+    for model in models:
+        mv = [r for r in voted if r.get("model") == model]
+        if not mv:
+            continue
+        n_samples = sum(r["n_samples"] for r in mv) / len(mv)
+        agreement = sum(r["agreement"] for r in mv) / len(mv)
+        unanimous = sum(1 for r in mv if r["agreement"] == 1.0) / len(mv)
+        single = macro_f1(confusion_matrix(first, model))
+        voted_f1 = macro_f1(confusion_matrix(voted, model))
+        lines.append(
+            f"{model:<{width}}  {n_samples:>7.1f}  {single:>9.4f}  {voted_f1:>9.4f}  {agreement:>9.3f}  {unanimous:>8.1%}"
+        )
+    return "\n".join(lines)
+
+
 def metrics_per_model(rows: list[dict], model: str) -> str:
     cm = confusion_matrix(rows, model)
     lines = [f"\n{'='*60}", f"Model: {model}", "=" * 60]
@@ -89,13 +166,16 @@ def main() -> int:
     parser = argparse.ArgumentParser(description="Analyze tone eval CSV: confusion matrix, P/R/F1.")
     parser.add_argument("csv", type=Path, help="Results CSV from run_tone_eval.py")
     parser.add_argument("--output", "-o", type=Path, default=None, help="Write report to file")
+    profiling.add_profile_args(parser)
     args = parser.parse_args()
+    profiling.start(args, "analyze_tone_results")
     csv_path = args.csv if args.csv.is_absolute() else Path.cwd() / args.csv
     if not csv_path.exists():
         print(f"File not found: {csv_path}", file=sys.stderr)
         return 1
 
-    rows = load_results(csv_path)
+    with profiling.span("load"):
+        rows = load_results(csv_path)
     models = sorted({r["model"] for r in rows})
     if not models:
         print("No model rows in CSV.", file=sys.stderr)
@@ -110,8 +190,24 @@ def main() -> int:
         "A bias toward predicting 4 may reflect that prior as well as acoustic cues.",
         "",
     ]
-    for model in models:
-        report.append(metrics_per_model(rows, model))
+    if any((r.get("sample_idx") or "") != "" for r in rows):
+        voted = vote_rows(rows)
+        report.append(self_consistency_table(rows, voted, models))
+        report.append("\nDetailed metrics below use majority-voted predictions.\n")
+        rows = voted
+    prompt_ids = sorted({r.get("prompt_id") or "" for r in rows})
+    if prompt_ids != [""]:
+        report.append(prompt_model_table(rows, prompt_ids, models))
+        for pid in prompt_ids:
+            subset = [r for r in rows if (r.get("prompt_id") or "") == pid]
+            report.append(f"\n{'#' * 60}\nPrompt: {pid or '(none)'} ({len(subset)} rows)\n{'#' * 60}")
+            for model in sorted({r["model"] for r in subset}):
+                with profiling.span("metrics", model=model, prompt_id=pid):
+                    report.append(metrics_per_model(subset, model))
+    else:
+        for model in models:
+            with profiling.span("metrics", model=model):
+                report.append(metrics_per_model(rows, model))
 
     text = "\n".join(report)
     if args.output:
@@ -0,0 +1,74 @@
+"""
+In-memory audio containers for the evaluator: PCM -> WAV bytes and raw-input normalization.
+
+wav_bytes builds a 16-bit PCM WAV in one preallocated bytearray: the 44-byte header is packed
+in place and the samples are converted straight into the data section through a NumPy view,
+so the only copy is the int16 conversion itself. as_encoded turns any accepted input (path,
+bytes / bytearray / memoryview, binary file-like object, or NumPy samples) into encoded
+bytes plus a format name, sniffing the container from its magic bytes when not given.
+"""
+
+import struct
+from pathlib import Path
+
+import numpy as np
+
+WAV_HEADER_BYTES = 44
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+
+def wav_bytes(samples: np.ndarray, sample_rate: int) -> bytearray:
+    """16-bit PCM WAV of samples: int16, other integer PCM, or float in [-1, 1] (clipped);
+    shape (n,) for mono or (n, channels)."""
+    samples = np.asarray(samples)
+    channels = samples.shape[1] if samples.ndim == 2 else 1
+    data_len = samples.size * 2
+    buf = bytearray(WAV_HEADER_BYTES + data_len)
+    _WAV_HEADER.pack_into(
+        buf, 0,
+        b"RIFF", 36 + data_len, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_len,
+    )
+    out = np.frombuffer(buf, dtype="<i2", offset=WAV_HEADER_BYTES).reshape(samples.shape)
+    if samples.dtype == np.int16:
+        out[...] = samples
+    elif np.issubdtype(samples.dtype, np.integer):
+        np.multiply(samples, 32767 / np.iinfo(samples.dtype).max, out=out, casting="unsafe")
+    else:
+        if samples.size and np.abs(samples).max() > 1.0:
+            samples = np.clip(samples, -1.0, 1.0)
+        np.multiply(samples, 32767, out=out, casting="unsafe")
+    return buf
+
+
+def sniff_format(data) -> str:
+    """Container format from magic bytes: wav, mp3, flac or ogg."""
+    head = bytes(data[:4])
+    if head == b"RIFF":
+        return "wav"
+    if head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if head == b"fLaC":
+        return "flac"
+    if head == b"OggS":
+        return "ogg"
+    raise ValueError("unrecognized audio container; pass fmt explicitly")
+
+
+def as_encoded(audio, fmt: str | None = None, sample_rate: int | None = None) -> tuple:
+    """(encoded bytes-like, format) for a path, bytes-like, binary file-like or NumPy samples.
+
+    NumPy input needs sample_rate and becomes a WAV; bytes are passed through without copying."""
+    if isinstance(audio, np.ndarray):
+        if sample_rate is None:
+            raise ValueError("sample_rate is required for NumPy audio")
+        return wav_bytes(audio, sample_rate), "wav"
+    if isinstance(audio, (str, Path)):
+        path = Path(audio)
+        return path.read_bytes(), fmt or ("mp3" if path.suffix.lower() == ".mp3" else "wav")
+    if hasattr(audio, "read"):
+        audio = audio.read()
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return audio, fmt or sniff_format(audio)
+    raise TypeError(f"unsupported audio input: {type(audio).__name__}")
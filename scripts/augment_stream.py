@@ -0,0 +1,309 @@
+"""
+Robustness sweeps over augmented clips, generated on the fly with no files on disk.
+
+Source clips come from a manifest, an index_corpus index or a .pack. Each variant applies, in
+order: speed change (resampling; shifts pitch with tempo, like tape), pitch shift in semitones
+(librosa phase vocoder, duration kept), reverb (exponentially decaying noise impulse response
+with the given RT60) and additive white noise at a target SNR over the voiced frames. Every
+variant gets its own seed derived from (--seed, clip, variant, repeat), so results do not
+depend on worker count or ordering.
+
+Variants are encoded to an in-memory WAV (or MP3) buffer and streamed to the evaluator through
+two generator stages (augment, then evaluate) that each keep at most --prefetch items in flight
+on a thread pool, so memory stays bounded however large the sweep. Local models score the
+augmented samples directly. Rows carry the augmentation parameters (snr_db, rt60_s, speed,
+pitch_st, seed) and are appended to the output CSV as they finish; an accuracy table per
+parameter value is printed at the end (also: analyze_error_breakdown.py --by model,snr_db).
+
+Usage:
+  python scripts/augment_stream.py --manifest audio_syllabs/manifest_15syllables.json --audio-dir audio_syllabs \\
+      --models local/contour,gemini/gemini-2.5-pro --snr 30,20,10,5,0
+  python scripts/augment_stream.py --pack results/syllabs.pack --snr 20,10 --rt60 0,0.5 --product --repeats 3
+  python scripts/augment_stream.py ... --speed 0.9,1.1 --pitch -2,2 --format mp3 --workers 8 --prefetch 32
+"""
+
+import argparse
+import csv
+import functools
+import io
+import itertools
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import audio_io
+import http_pool
+import local_tone
+import profiling
+import run_tone_eval
+from packed_corpus import PackedCorpus
+from run_tone_eval import LOCAL_MODELS, TONE_DEFINITIONS, encode_bytes, run_encoded, run_local
+from sharding import stable_hash
+
+_ROOT = Path(__file__).resolve().parent.parent
+NEUTRAL = {"snr_db": None, "rt60_s": 0.0, "speed": 1.0, "pitch_st": 0.0}
+PARAM_COLUMNS = ["variant", "snr_db", "rt60_s", "speed", "pitch_st", "seed"]
+FIELDNAMES = [
+    "model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response", *PARAM_COLUMNS, "latency_s",
+]
+ENERGY_FRAME_MS = 10
+VOICED_ENERGY_RATIO = 0.01  # frames above this fraction of the loudest frame set the signal power
+
+
+def signal_power(samples: np.ndarray, sample_rate: int) -> float:
+    """Mean power over frames with at least VOICED_ENERGY_RATIO of the peak frame energy."""
+    frame = max(1, sample_rate * ENERGY_FRAME_MS // 1000)
+    n = len(samples) // frame * frame
+    if n == 0:
+        return float(np.mean(samples ** 2)) if len(samples) else 0.0
+    energy = (samples[:n].reshape(-1, frame) ** 2).mean(axis=1)
+    active = energy[energy >= VOICED_ENERGY_RATIO * energy.max()]
+    return float(active.mean()) if len(active) else 0.0
+
+
+def change_speed(samples: np.ndarray, factor: float) -> np.ndarray:
+    """Play back factor times faster (linear-interpolation resampling)."""
+    if factor == 1.0:
+        return samples
+    positions = np.arange(0, len(samples) - 1, factor)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def shift_pitch(samples: np.ndarray, sample_rate: int, semitones: float) -> np.ndarray:
+    if semitones == 0:
+        return samples
+    import librosa
+    return librosa.effects.pitch_shift(samples, sr=sample_rate, n_steps=semitones).astype(np.float32)
+
+
+def add_reverb(samples: np.ndarray, sample_rate: int, rt60: float, rng: np.random.Generator) -> np.ndarray:
+    """Convolve with a direct path plus exponentially decaying noise (-60 dB after rt60 s)."""
+    if rt60 <= 0:
+        return samples
+    n = int(rt60 * 1.5 * sample_rate)
+    t = np.arange(n) / sample_rate
+    ir = rng.standard_normal(n) * np.exp(-6.9 * t / rt60) * 0.1
+    ir[0] = 1.0
+    wet = fftconvolve(samples, ir)[:len(samples)]
+    peak = np.abs(wet).max()
+    return (wet * (np.abs(samples).max() / peak if peak > 0 else 1.0)).astype(np.float32)
+
+
+def add_noise(samples: np.ndarray, sample_rate: int, snr_db: float | None, rng: np.random.Generator) -> np.ndarray:
+    if snr_db is None:
+        return samples
+    noise_power = signal_power(samples, sample_rate) / 10 ** (snr_db / 10)
+    return (samples + rng.standard_normal(len(samples)) * np.sqrt(noise_power)).astype(np.float32)
+
+
+def augment(samples: np.ndarray, sample_rate: int, params: dict, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    out = change_speed(samples, params["speed"])
+    out = shift_pitch(out, sample_rate, params["pitch_st"])
+    out = add_reverb(out, sample_rate, params["rt60_s"], rng)
+    out = add_noise(out, sample_rate, params["snr_db"], rng)
+    return np.clip(out, -1.0, 1.0)
+
+
+def encode_variant(samples: np.ndarray, sample_rate: int, fmt: str) -> bytes:
+    """Encoded clip bytes, built in memory."""
+    if fmt == "wav":
+        return audio_io.wav_bytes(samples, sample_rate)
+    import soundfile
+    buf = io.BytesIO()
+    soundfile.write(buf, samples, sample_rate, format="MP3")
+    return buf.getvalue()
+
+
+def build_variants(
+    snrs: list[float | None],
+    rt60s: list[float],
+    speeds: list[float],
+    pitches: list[float],
+    product: bool,
+) -> list[dict]:
+    """Parameter sets: each axis varied alone around NEUTRAL (plus the clean clip), or the full product."""
+    if product:
+        combos = itertools.product(snrs or [None], rt60s or [0.0], speeds or [1.0], pitches or [0.0])
+        variants = [dict(zip(NEUTRAL, c)) for c in combos]
+    else:
+        variants = [dict(NEUTRAL)]
+        for key, values in (("snr_db", snrs), ("rt60_s", rt60s), ("speed", speeds), ("pitch_st", pitches)):
+            variants.extend({**NEUTRAL, key: v} for v in values if v != NEUTRAL[key])
+    unique = {tuple(v.values()): v for v in variants}  # drop repeats of the neutral setting
+    return list(unique.values())
+
+
+def variant_id(params: dict) -> str:
+    parts = []
+    if params["snr_db"] is not None:
+        parts.append(f"snr{params['snr_db']:g}")
+    if params["rt60_s"]:
+        parts.append(f"rt{params['rt60_s']:g}")
+    if params["speed"] != 1.0:
+        parts.append(f"x{params['speed']:g}")
+    if params["pitch_st"]:
+        parts.append(f"p{params['pitch_st']:+g}")
+    return "_".join(parts) or "clean"
+
+
+def prefetch_map(fn, items, workers: int, prefetch: int):
+    """Yield fn(item) in input order, with at most prefetch calls pending on a thread pool."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Evaluate models on augmented clips streamed from memory.")
+    parser.add_argument("--manifest", type=Path, default=None, help="Manifest or corpus index (default: synthetic_tones/manifest.json)")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Clip directory (default: index root, else synthetic_tones)")
+    parser.add_argument("--pack", type=Path, default=None, help="Read clips (and labels, unless --manifest) from a packed corpus")
+    parser.add_argument("--models", type=str, default="local/contour", help="Comma-separated models (default: local/contour)")
+    parser.add_argument("--snr", type=str, default="20,10,5,0", help="Noise SNRs in dB (default: 20,10,5,0; '' = none)")
+    parser.add_argument("--rt60", type=str, default="", help="Reverb RT60 values in seconds, e.g. 0.3,0.8")
+    parser.add_argument("--speed", type=str, default="", help="Speed factors, e.g. 0.9,1.1")
+    parser.add_argument("--pitch", type=str, default="", help="Pitch shifts in semitones, e.g. -2,2")
+    parser.add_argument("--product", action="store_true", help="Full product of all axes instead of one axis at a time")
+    parser.add_argument("--repeats", type=int, default=1, help="Noise / reverb draws per variant (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed (default: 0)")
+    parser.add_argument("--format", choices=("wav", "mp3"), default="wav", help="Encoding sent to API models (default: wav)")
+    parser.add_argument("--workers", type=int, default=4, help="Threads per stage (default: 4)")
+    parser.add_argument("--prefetch", type=int, default=16, help="Items in flight per stage (default: 16)")
+    parser.add_argument("--output", type=Path, default=None, help="Output CSV (default: results/tone_eval_<name>_augmented.csv)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "augment_stream")
+    http_pool.configure(max_connections=max(http_pool.DEFAULT_MAX_CONNECTIONS, args.workers))
+
+    def floats(value: str) -> list[float]:
+        return [float(v) for v in value.split(",") if v.strip()]
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    models = [m.strip() for m in args.models.split(",")]
+    remote = [m for m in models if m not in LOCAL_MODELS]
+    errors, warnings = run_tone_eval.model_index.validate_models(run_tone_eval.capabilities(), remote) if remote else ([], [])
+    errors += run_tone_eval.validate_local_models(models)
+    for w in warnings:
+        print(f"Warning: {w}", file=sys.stderr)
+    if errors:
+        parser.error("; ".join(errors))
+
+    pack = PackedCorpus(resolve(args.pack)) if args.pack is not None else None
+    manifest_path = resolve(args.manifest or run_tone_eval.DEFAULT_MANIFEST)
+    if pack is not None and args.manifest is None:
+        manifest = pack.manifest()
+        name = pack.path.stem
+        files = [f for f in sorted(manifest) if f in pack]
+    else:
+        manifest = run_tone_eval.load_manifest(manifest_path)
+        name = run_tone_eval.default_output_csv(manifest_path).stem.removeprefix("tone_eval_").removeprefix("tone_eval")
+        audio_dir = resolve(args.audio_dir or run_tone_eval.manifest_audio_dir(manifest_path) or run_tone_eval.DEFAULT_AUDIO_DIR)
+        files = [f for f in sorted(manifest) if (pack is not None and f in pack) or (pack is None and (audio_dir / f).exists())]
+
+    @functools.lru_cache(maxsize=max(8, args.prefetch))
+    def source(filename: str) -> tuple[np.ndarray, int]:
+        with profiling.span("read", file=filename):
+            if pack is not None:
+                return pack.pcm(filename)
+            return local_tone.load_audio(audio_dir / filename)
+
+    variants = build_variants([float(v) for v in floats(args.snr)], floats(args.rt60), floats(args.speed), floats(args.pitch), args.product)
+    jobs = [
+        (filename, params, repeat)
+        for filename in files  # clip-major, so the source cache stays small
+        for params in variants
+        for repeat in range(args.repeats)
+    ]
+    print(f"{len(files)} clips × {len(variants)} variants × {args.repeats} repeats = {len(jobs)} variants, {len(jobs) * len(models)} rows")
+
+    def make_variant(job):
+        filename, params, repeat = job
+        seed = stable_hash(str(args.seed), filename, variant_id(params), str(repeat)) % 2 ** 32
+        samples, sr = source(filename)
+        with profiling.span("augment", variant=variant_id(params)):
+            out = augment(samples, sr, params, seed)
+        payload = None
+        if remote:
+            with profiling.span("encode"):
+                payload = encode_bytes(encode_variant(out, sr, args.format), args.format)
+        return filename, params, seed, (out, sr), payload
+
+    def evaluate(item):
+        filename, params, seed, audio, payload = item
+        rows = []
+        for model in models:
+            start = time.perf_counter()
+            if model in LOCAL_MODELS:
+                pred, pinyin, raw = run_local(model, audio)
+            else:
+                pred, pinyin, raw = run_encoded(model, *payload, TONE_DEFINITIONS, None)
+            rows.append({
+                "model": model,
+                "audio_file": filename,
+                "true_tone": manifest[filename],
+                "predicted_tone": pred or "",
+                "heard_pinyin": pinyin or "",
+                "raw_response": raw.replace("\n", " ").strip(),
+                "variant": variant_id(params),
+                "snr_db": "" if params["snr_db"] is None else params["snr_db"],
+                "rt60_s": params["rt60_s"],
+                "speed": params["speed"],
+                "pitch_st": params["pitch_st"],
+                "seed": seed,
+                "latency_s": round(time.perf_counter() - start, 4),
+            })
+        return rows
+
+    out_csv = resolve(args.output or run_tone_eval.RESULTS_DIR / f"tone_eval_{name}_augmented.csv")
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    correct: dict[tuple[str, str], list[int]] = {}
+    n_rows = 0
+    with open(out_csv, "w", newline="", encoding="utf-8") as fh:
+        w = csv.DictWriter(fh, fieldnames=FIELDNAMES)
+        w.writeheader()
+        stream = prefetch_map(make_variant, jobs, args.workers, args.prefetch)
+        for k, rows in enumerate(prefetch_map(evaluate, stream, args.workers, args.prefetch), start=1):
+            with profiling.span("write"):
+                w.writerows(rows)
+            for r in rows:
+                c = correct.setdefault((r["model"], r["variant"]), [0, 0])
+                c[0] += int(r["predicted_tone"] == str(r["true_tone"]))
+                c[1] += 1
+            n_rows += len(rows)
+            if k % 50 == 0 or k == len(jobs):
+                print(f"  [{k}/{len(jobs)}] variants evaluated", flush=True)
+    print(f"Wrote {n_rows} rows to {out_csv}")
+
+    width = max(len(m) for m in models)
+    names = [variant_id(v) for v in variants]
+    col = max(8, *(len(n) for n in names))
+    print("\nAccuracy by variant:")
+    print(" " * width + "".join(f"  {n:>{col}}" for n in names))
+    for model in models:
+        cells = []
+        for n in names:
+            c, total = correct.get((model, n), (0, 0))
+            cells.append(f"  {c / total:>{col}.3f}" if total else f"  {'-':>{col}}")
+        print(f"{model:<{width}}" + "".join(cells))
+    report = http_pool.report()
+    if report:
+        print(f"\n{report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,685 @@
+"""
+Micro- and macro-benchmarks for the tone pipeline hot paths.
+
+Benchmarks (select with --only):
+  parse      parse_predicted_tone / parse_heard_pinyin over a corpus of raw responses
+             (raw_response column of results/*.csv, or built-in samples if none exist)
+  encode     encode_audio on WAV and MP3 files of several sizes
+  generate   generate_tones.f0_to_wav and generate_all at scale
+  confusion  analyze_tone_results.load_results + confusion_matrix on a large synthetic CSV
+  batch      run_tone_eval.main end to end against a mock provider (no network, no API keys)
+  http       provider requests through LiteLLM's real HTTP stack against mock_provider.py with added
+             per-request and per-connection latency: a new client per request vs LiteLLM's default
+             clients vs the shared http_pool clients (connections opened, ms per request)
+  knn        contour_index batch k-NN queries on a synthetic 100k-clip index (brute-force BLAS vs
+             cKDTree; queries per second) and incremental insert throughput
+  nn         tone_nn.py conv net: batched inference (length-bucketed on all cores vs one thread vs
+             unsorted batches; clips per second), F0 features + inference on a process pool, and
+             p50 / p99 single-clip latency of local/nn next to local/contour
+  stream     blocking completions vs streaming.py early exit against mock_provider.py streaming a
+             long reply token by token (ms to the parsed answer, tokens cut)
+  files      the same clips sent to several Gemini models inline vs as gemini_files references,
+             against mock_provider.py with limited upload bandwidth (request bytes, ms per request)
+  providers  every request shape of each providers.py adapter (OpenAI text-only vs text+audio
+             output, streamed where declared) against mock_provider.py with speech synthesis and
+             per-token delays (ms per request, reply bytes)
+
+Results are written as JSON together with machine info so runs can be compared over time.
+With --compare, every benchmark whose median is slower than the baseline by more than
+--threshold is flagged and the exit code is 1.
+
+Usage:
+  python scripts/benchmark_tone_pipeline.py
+  python scripts/benchmark_tone_pipeline.py --quick --only parse,encode
+  python scripts/benchmark_tone_pipeline.py --output results/bench/new.json --compare results/bench/baseline.json
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import analyze_tone_results
+import contour_index
+import gemini_files
+import generate_tones
+import http_pool
+import providers
+import run_tone_eval
+import streaming
+import tone_nn
+from mock_provider import MockProviderServer
+
+_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = _ROOT / "results"
+BENCH_DIR = RESULTS_DIR / "bench"
+MP3_SOURCES = sorted((_ROOT / "docs" / "audio" / "syllables").glob("*.mp3"))
+
+# Used when no results CSVs exist yet; shapes seen from the models in MODELS.
+SAMPLE_RESPONSES = [
+    "1) cai4\n2) 4",
+    "1) The pinyin I heard is **bai2**.\n2) 2",
+    "Pinyin: hao3\nTone: 3",
+    "I heard \"ma1\". The tone number is 1.",
+    "1) lü3 2) 3",
+    "The syllable sounds like a falling pitch, so it's tone 4 (e.g. shi4).",
+    "1) Pinyin: cai2\n2) Tone number: 2",
+    "I'm unable to process audio input.",
+    "",
+    "The pitch dips then rises. 1) ni3 2) 3",
+]
+DEFAULT_SIZES_KB = [16, 256, 4096]
+QUICK_SIZES_KB = [16, 256]
+
+
+def machine_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=_ROOT, capture_output=True, text=True, timeout=10,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+def time_call(fn, repeat: int = 5, number: int = 1) -> dict:
+    """Run fn() number times per repeat; return per-call timing stats in seconds."""
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_s": min(per_call),
+        "median_s": statistics.median(per_call),
+        "mean_s": statistics.fmean(per_call),
+    }
+
+
+def load_response_corpus(min_size: int) -> list[str]:
+    """Raw responses from results/*.csv, padded by repetition to at least min_size entries."""
+    corpus: list[str] = []
+    for csv_path in sorted(RESULTS_DIR.glob("*.csv")):
+        try:
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                corpus.extend(r["raw_response"] for r in csv.DictReader(f) if "raw_response" in r)
+        except (OSError, csv.Error, UnicodeDecodeError):
+            continue
+    if not corpus:
+        corpus = list(SAMPLE_RESPONSES)
+    reps = -(-min_size // len(corpus))
+    return (corpus * reps)[:max(min_size, len(corpus))]
+
+
+def bench_parse(quick: bool) -> dict:
+    corpus = load_response_corpus(2_000 if quick else 20_000)
+
+    def parse_all():
+        for text in corpus:
+            run_tone_eval.parse_predicted_tone(text)
+            run_tone_eval.parse_heard_pinyin(text)
+
+    stats = time_call(parse_all, repeat=3 if quick else 5)
+    stats["responses"] = len(corpus)
+    stats["responses_per_s"] = len(corpus) / stats["median_s"]
+    return {"parse_responses": stats}
+
+
+def _write_wav(path: Path, size_kb: int) -> None:
+    n = size_kb * 1024 // 2
+    t = np.arange(n, dtype=float) / generate_tones.SAMPLE_RATE
+    samples = generate_tones.f0_to_wav(
+        generate_tones.f0_t2(t), generate_tones.SAMPLE_RATE, generate_tones.AMPLITUDE, generate_tones.FADE_MS
+    )
+    from scipy.io import wavfile
+    wavfile.write(str(path), generate_tones.SAMPLE_RATE, samples)
+
+
+def _write_mp3(path: Path, size_kb: int) -> None:
+    # MP3 frames are self-contained, so repeating a real clip gives a valid longer stream.
+    if MP3_SOURCES:
+        chunk = MP3_SOURCES[0].read_bytes()
+    else:
+        chunk = random.Random(0).randbytes(8192)
+    reps = -(-size_kb * 1024 // len(chunk))
+    path.write_bytes((chunk * reps)[: size_kb * 1024])
+
+
+def bench_encode(quick: bool) -> dict:
+    out = {}
+    sizes = QUICK_SIZES_KB if quick else DEFAULT_SIZES_KB
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_kb in sizes:
+            for ext, writer in ((".wav", _write_wav), (".mp3", _write_mp3)):
+                path = Path(tmp) / f"clip_{size_kb}k{ext}"
+                writer(path, size_kb)
+                nbytes = path.stat().st_size
+                stats = time_call(lambda: run_tone_eval.encode_audio(path), repeat=5, number=20)
+                stats["bytes"] = nbytes
+                stats["mb_per_s"] = nbytes / stats["median_s"] / 1e6
+                out[f"encode_{ext[1:]}_{size_kb}k"] = stats
+    return out
+
+
+def bench_generate(quick: bool) -> dict:
+    sr = generate_tones.SAMPLE_RATE
+    seconds = 10 if quick else 120
+    t = np.arange(seconds * sr, dtype=float) / sr
+    f0 = generate_tones.f0_t3(t)
+    stats = time_call(
+        lambda: generate_tones.f0_to_wav(f0, sr, generate_tones.AMPLITUDE, generate_tones.FADE_MS),
+        repeat=5,
+    )
+    stats["samples"] = len(t)
+    stats["samples_per_s"] = len(t) / stats["median_s"]
+    out = {"f0_to_wav": stats}
+
+    rounds = 20 if quick else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        def gen_many():
+            for i in range(rounds):
+                generate_tones.generate_all(Path(tmp) / f"set{i % 8}")
+
+        stats = time_call(gen_many, repeat=3)
+        stats["sets"] = rounds
+        stats["sets_per_s"] = rounds / stats["median_s"]
+        out["generate_all"] = stats
+    return out
+
+
+def write_synthetic_results(path: Path, n_rows: int, models: list[str], seed: int = 0) -> None:
+    """Write a results CSV with n_rows random predictions spread over models."""
+    rng = np.random.default_rng(seed)
+    true = rng.integers(1, 5, n_rows)
+    pred = np.where(rng.random(n_rows) < 0.6, true, rng.integers(0, 5, n_rows))
+    model_idx = rng.integers(0, len(models), n_rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response"])
+        for i in range(n_rows):
+            p = "" if pred[i] == 0 else str(pred[i])
+            w.writerow([models[model_idx[i]], f"clip{i % 4096}.mp3", true[i], p, f"ma{p}", f"Tone: {p}"])
+
+
+def bench_confusion(quick: bool) -> dict:
+    n_rows = 50_000 if quick else 1_000_000
+    models = run_tone_eval.MODELS
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic_results.csv"
+        write_synthetic_results(path, n_rows, models)
+        load_stats = time_call(lambda: analyze_tone_results.load_results(path), repeat=3)
+        rows = analyze_tone_results.load_results(path)
+    load_stats["rows"] = n_rows
+    load_stats["rows_per_s"] = n_rows / load_stats["median_s"]
+
+    def all_models():
+        for m in models:
+            analyze_tone_results.confusion_matrix(rows, m)
+
+    cm_stats = time_call(all_models, repeat=3)
+    cm_stats["rows"] = n_rows
+    cm_stats["models"] = len(models)
+    cm_stats["rows_per_s"] = n_rows * len(models) / cm_stats["median_s"]
+    return {"load_results": load_stats, "confusion_matrix": cm_stats}
+
+
+def mock_completion(latency_s: float):
+    """Stand-in for litellm.completion returning a fixed well-formed answer after latency_s."""
+    def completion(**kwargs):
+        if latency_s:
+            time.sleep(latency_s)
+        msg = SimpleNamespace(content="1) ma3\n2) 3", audio=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+    return completion
+
+
+def bench_batch(quick: bool, mock_latency_ms: float = 5.0) -> dict:
+    n_files = 8 if quick else 40
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_dir = Path(tmp) / "audio"
+        manifest = {}
+        for i in range(n_files):
+            sub = audio_dir / f"set{i}"
+            for name, tone in generate_tones.generate_all(sub).items():
+                manifest[f"set{i}/{name}"] = tone
+        manifest_path = Path(tmp) / "manifest.json"
+        manifest_path.write_text(json.dumps(manifest))
+        out_csv = Path(tmp) / "out.csv"
+        argv = [
+            "run_tone_eval.py",
+            "--audio-dir", str(audio_dir),
+            "--manifest", str(manifest_path),
+            "--output", str(out_csv),
+        ]
+        saved = (sys.argv, run_tone_eval.litellm.completion, run_tone_eval.RESULTS_DIR)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_tone_eval.main()
+
+        try:
+            sys.argv = argv
+            run_tone_eval.litellm.completion = mock_completion(mock_latency_ms / 1000)
+            run_tone_eval.RESULTS_DIR = Path(tmp) / "results"
+            stats = time_call(run, repeat=3)
+        finally:
+            sys.argv, run_tone_eval.litellm.completion, run_tone_eval.RESULTS_DIR = saved
+    calls = len(manifest) * len(run_tone_eval.MODELS)
+    stats["calls"] = calls
+    stats["mock_latency_ms"] = mock_latency_ms
+    stats["calls_per_s"] = calls / stats["median_s"]
+    stats["overhead_ms_per_call"] = 1000 * (stats["median_s"] / calls) - mock_latency_ms
+    return {"batch_end_to_end": stats}
+
+
+def bench_http(quick: bool, latency_ms: float = 20.0, connect_latency_ms: float = 60.0, workers: int = 8) -> dict:
+    n_requests = 32 if quick else 128
+    model = "gemini/gemini-2.5-pro"
+    wav = io.BytesIO()
+    from scipy.io import wavfile
+    t = np.arange(generate_tones.SAMPLE_RATE // 2, dtype=float) / generate_tones.SAMPLE_RATE
+    wavfile.write(wav, generate_tones.SAMPLE_RATE, generate_tones.f0_to_wav(
+        generate_tones.f0_t4(t), generate_tones.SAMPLE_RATE, generate_tones.AMPLITUDE, generate_tones.FADE_MS
+    ))
+    encoded = run_tone_eval.encode_bytes(wav.getvalue(), "wav")
+    env_keys = ("GEMINI_API_KEY", "GEMINI_API_BASE")
+    saved_env = {k: os.environ.get(k) for k in env_keys}
+    out = {}
+    with MockProviderServer(latency_s=latency_ms / 1000, connect_latency_s=connect_latency_ms / 1000) as server:
+        os.environ.update(GEMINI_API_KEY="mock", GEMINI_API_BASE=f"{server.url}/v1beta")
+
+        def request(_):
+            if mode == "fresh":
+                # A private pool per request: every call opens (and closes) its own connection
+                pool = http_pool.ProviderPool(max_connections=1)
+                try:
+                    return run_tone_eval.litellm.completion(
+                        model=model,
+                        messages=run_tone_eval.build_messages(*encoded, run_tone_eval.TONE_DEFINITIONS),
+                        timeout=90,
+                        client=pool.client_for(model),
+                    )
+                finally:
+                    pool.close()
+            return run_tone_eval.complete_encoded(model, *encoded)
+
+        def run():
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                list(ex.map(request, range(n_requests)))
+
+        try:
+            for mode in ("fresh", "litellm", "pool"):
+                if mode == "pool":
+                    http_pool.configure(max_connections=workers)
+                else:
+                    http_pool.disable()
+                request(0)  # warm up imports and (for the shared clients) one connection
+                server.reset_counts()
+                stats = time_call(run, repeat=3)
+                stats["requests"] = server.requests
+                stats["connections_opened"] = server.connections
+                stats["ms_per_request"] = 1000 * stats["median_s"] / n_requests
+                stats.update(workers=workers, mock_latency_ms=latency_ms, mock_connect_latency_ms=connect_latency_ms)
+                out[f"http_{mode}"] = stats
+        finally:
+            http_pool.disable()
+            for k, v in saved_env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+    fresh = out["http_fresh"]["ms_per_request"]
+    for mode in ("litellm", "pool"):
+        out[f"http_{mode}"]["saved_ms_per_request_vs_fresh"] = fresh - out[f"http_{mode}"]["ms_per_request"]
+    return out
+
+
+def bench_knn(quick: bool, k: int = 10) -> dict:
+    n_clips = 20_000 if quick else 100_000
+    n_queries = 1000
+    rng = np.random.default_rng(0)
+    templates = contour_index.local_tone.template_contours()
+    # Templates with per-clip pitch range and noise, roughly the spread of real corpora
+    tones = rng.integers(0, 4, n_clips + n_queries)
+    vecs = templates[tones] * rng.uniform(0.5, 1.5, (len(tones), 1)) + rng.normal(0, 0.4, (len(tones), templates.shape[1]))
+    vecs = (vecs - vecs.mean(axis=1, keepdims=True)).astype(np.float32)
+    names = [f"clip{i}" for i in range(n_clips)]
+    queries = vecs[n_clips:]
+    index = contour_index.ContourIndex()
+    index.add(names, vecs[:n_clips], tones[:n_clips] + 1)
+    out = {}
+    for method in contour_index.METHODS:
+        index.search(queries[:1], k, method)  # build the tree outside the timed runs
+        stats = time_call(lambda: index.search(queries, k, method), repeat=3)
+        stats.update(clips=n_clips, queries=n_queries, k=k, queries_per_s=n_queries / stats["median_s"])
+        out[f"knn_search_{method}"] = stats
+    pred, _ = index.classify(queries, k)
+    out["knn_search_brute"]["accuracy"] = float(np.mean(pred == tones[n_clips:] + 1))
+
+    def inserts():
+        grown = contour_index.ContourIndex()
+        for start in range(0, n_clips, 100):  # recordings arriving in small batches
+            grown.add(names[start:start + 100], vecs[start:start + 100], tones[start:start + 100] + 1)
+
+    stats = time_call(inserts, repeat=3)
+    stats.update(clips=n_clips, batch=100, inserts_per_s=n_clips / stats["median_s"])
+    out["knn_insert"] = stats
+    return out
+
+
+def bench_nn(quick: bool, n_single: int = 200) -> dict:
+    n_clips = 1000 if quick else 8000
+    workers = os.cpu_count() or 1
+    feats, _ = tone_nn.synthetic_features(n_clips, seed=0, workers=workers)
+    net = tone_nn.ToneNet.create(seed=0)  # throughput does not depend on the weights
+    out = {}
+    for name, run in (
+        ("bucketed", lambda: tone_nn.predict(net, feats)),
+        ("bucketed_1thread", lambda: tone_nn.predict(net, feats, workers=1)),
+        # Batches in arrival order, each padded to its longest clip
+        ("unsorted_1thread", lambda: [
+            net.predict_proba(*tone_nn.pad_batch(feats[i:i + tone_nn.BATCH_SIZE])) for i in range(0, len(feats), tone_nn.BATCH_SIZE)
+        ]),
+    ):
+        stats = time_call(run, repeat=3)
+        stats.update(clips=len(feats), batch_size=tone_nn.BATCH_SIZE, clips_per_s=len(feats) / stats["median_s"])
+        out[f"nn_batch_{name}"] = stats
+
+    rng = np.random.default_rng(1)
+    clips = [(tone_nn.synthetic_clip(rng, i % 4 + 1), generate_tones.SAMPLE_RATE) for i in range(n_clips)]
+    tone_nn.extract_features(clips[:workers], workers)  # warm up the pool start-up path
+
+    def pipeline():
+        f = tone_nn.extract_features(clips, workers)
+        tone_nn.predict(net, [x for x in f if x is not None])
+
+    stats = time_call(pipeline, repeat=3)
+    stats.update(clips=n_clips, workers=workers, clips_per_s=n_clips / stats["median_s"])
+    out["nn_pipeline"] = stats
+
+    for name, fn in (("nn", net.classify_samples), ("contour", tone_nn.local_tone.classify_samples)):
+        fn(*clips[0])
+        per_clip = []
+        for samples, sr in clips[:n_single]:
+            start = time.perf_counter()
+            fn(samples, sr)
+            per_clip.append(time.perf_counter() - start)
+        out[f"nn_single_{name}"] = {
+            "repeat": n_single,
+            "number": 1,
+            "min_s": min(per_clip),
+            "median_s": statistics.median(per_clip),
+            "mean_s": statistics.fmean(per_clip),
+            "p99_s": float(np.percentile(per_clip, 99)),
+            "p99_ms": 1000 * float(np.percentile(per_clip, 99)),
+        }
+    return out
+
+
+def bench_stream(quick: bool, latency_ms: float = 50.0, token_latency_ms: float = 10.0) -> dict:
+    n_requests = 8 if quick else 32
+    answer = (
+        "1) ma3\n2) 3\n\nThe pitch starts in the middle of the speaker's range, dips low and then rises "
+        "again at the end, which is the typical contour of the third tone when said in isolation."
+    )
+    models = ["gemini/gemini-2.5-pro", "openai/gpt-4o-audio-preview"]
+    encoded = run_tone_eval.encode_audio(
+        generate_tones.f0_to_wav(
+            generate_tones.f0_t3(np.arange(generate_tones.SAMPLE_RATE // 2) / generate_tones.SAMPLE_RATE),
+            generate_tones.SAMPLE_RATE, generate_tones.AMPLITUDE, generate_tones.FADE_MS,
+        ),
+        "wav", generate_tones.SAMPLE_RATE,
+    )
+    env_keys = ("GEMINI_API_KEY", "GEMINI_API_BASE", "OPENAI_API_KEY", "OPENAI_BASE_URL")
+    saved_env = {k: os.environ.get(k) for k in env_keys}
+    out = {}
+    with MockProviderServer(latency_s=latency_ms / 1000, token_latency_s=token_latency_ms / 1000, answer=answer) as server:
+        os.environ.update(
+            GEMINI_API_KEY="mock", GEMINI_API_BASE=f"{server.url}/v1beta",
+            OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{server.url}/v1",
+        )
+        try:
+            for model in models:
+                for mode in ("blocking", "stream"):
+                    if mode == "stream":
+                        streaming.configure()
+                    else:
+                        streaming.disable()
+                    run_tone_eval.run_encoded(model, *encoded)  # warm up imports and connections
+                    server.reset_counts()
+                    preds = []
+                    stats = time_call(lambda: preds.append(run_tone_eval.run_encoded(model, *encoded)[0]), repeat=n_requests)
+                    stats["ms_per_request"] = 1000 * stats["median_s"]
+                    stats["tokens_streamed_per_request"] = server.tokens_streamed / n_requests
+                    stats["answers_parsed"] = sum(p == "3" for p in preds) / len(preds)
+                    stats.update(mock_latency_ms=latency_ms, token_latency_ms=token_latency_ms)
+                    out[f"stream_{mode}_{model.split('/', 1)[0]}"] = stats
+        finally:
+            streaming.disable()
+            for k, v in saved_env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+    for provider in ("gemini", "openai"):
+        stream = out[f"stream_stream_{provider}"]
+        stream["saved_ms_per_request_vs_blocking"] = out[f"stream_blocking_{provider}"]["ms_per_request"] - stream["ms_per_request"]
+    return out
+
+
+def bench_files(quick: bool, latency_ms: float = 20.0, bandwidth_mbps: float = 10.0) -> dict:
+    n_clips = 4 if quick else 16
+    models = ["gemini/gemini-2.5-pro", "gemini/gemini-2.5-flash", "gemini/gemini-2.0-flash"]
+    rounds = 3  # repeated runs over the same clips
+    clips = []
+    for i in range(n_clips):
+        t = np.arange(generate_tones.SAMPLE_RATE, dtype=float) / generate_tones.SAMPLE_RATE
+        f0 = generate_tones.f0_t4(t) * (1 + 0.02 * i)
+        samples = generate_tones.f0_to_wav(f0, generate_tones.SAMPLE_RATE, generate_tones.AMPLITUDE, generate_tones.FADE_MS)
+        clips.append(run_tone_eval.encode_audio(samples, "wav", generate_tones.SAMPLE_RATE))
+    env_keys = ("GEMINI_API_KEY", "GEMINI_API_BASE")
+    saved_env = {k: os.environ.get(k) for k in env_keys}
+    out = {}
+    with MockProviderServer(latency_s=latency_ms / 1000, bandwidth_bps=bandwidth_mbps * 1e6) as server:
+        os.environ.update(GEMINI_API_KEY="mock", GEMINI_API_BASE=f"{server.url}/v1beta")
+
+        def run():
+            if mode == "reference":
+                gemini_files.configure(None)  # uploads are part of the timed work: a fresh cache per repeat
+            for _ in range(rounds):
+                for encoded in clips:
+                    for model in models:
+                        run_tone_eval.complete_encoded(model, *encoded)
+
+        try:
+            for mode in ("inline", "reference"):
+                run_tone_eval.complete_encoded(models[0], *clips[0])  # warm up imports
+                server.reset_counts()
+                stats = time_call(run, repeat=3)
+                n_requests = rounds * n_clips * len(models)
+                stats["requests"] = n_requests
+                stats["uploads_per_repeat"] = server.uploads // 3
+                stats["body_bytes_per_request"] = server.bytes_received / (3 * n_requests)
+                stats["ms_per_request"] = 1000 * stats["median_s"] / n_requests
+                stats.update(clips=n_clips, models=len(models), rounds=rounds, mock_latency_ms=latency_ms, bandwidth_mbps=bandwidth_mbps)
+                out[f"files_{mode}"] = stats
+        finally:
+            gemini_files.disable()
+            for k, v in saved_env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+    out["files_reference"]["saved_ms_per_request_vs_inline"] = (
+        out["files_inline"]["ms_per_request"] - out["files_reference"]["ms_per_request"]
+    )
+    return out
+
+
+def bench_providers(quick: bool, latency_ms: float = 50.0, token_latency_ms: float = 5.0, audio_latency_ms: float = 250.0) -> dict:
+    n_requests = 8 if quick else 32
+    answer = "1) ma3\n2) 3\n\nThe pitch dips low and rises again at the end: the third tone."
+    models = ["openai/gpt-4o-audio-preview", "gemini/gemini-2.5-pro", "mistral/voxtral-small-latest"]
+    encoded = run_tone_eval.encode_audio(
+        generate_tones.f0_to_wav(
+            generate_tones.f0_t3(np.arange(generate_tones.SAMPLE_RATE // 2) / generate_tones.SAMPLE_RATE),
+            generate_tones.SAMPLE_RATE, generate_tones.AMPLITUDE, generate_tones.FADE_MS,
+        ),
+        "wav", generate_tones.SAMPLE_RATE,
+    )
+    env_keys = ("GEMINI_API_KEY", "GEMINI_API_BASE", "OPENAI_API_KEY", "OPENAI_BASE_URL", "MISTRAL_API_KEY", "MISTRAL_AZURE_API_BASE")
+    saved_env = {k: os.environ.get(k) for k in env_keys}
+    out = {}
+    with MockProviderServer(
+        latency_s=latency_ms / 1000, token_latency_s=token_latency_ms / 1000, audio_latency_s=audio_latency_ms / 1000, answer=answer,
+    ) as server:
+        os.environ.update(
+            GEMINI_API_KEY="mock", GEMINI_API_BASE=f"{server.url}/v1beta",
+            OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{server.url}/v1",
+            # LiteLLM's Mistral chat route takes its base URL only from MISTRAL_AZURE_API_BASE
+            MISTRAL_API_KEY="mock", MISTRAL_AZURE_API_BASE=f"{server.url}/v1",
+        )
+        try:
+            for model in models:
+                adapter = providers.adapter_for(model)
+                shapes = [(shape, False) for shape in adapter.SHAPES]
+                if adapter.streaming:
+                    shapes.append((f"{adapter.SHAPES[0]}+stream", True))
+                for shape, stream in shapes:
+                    adapter.shape = shape.removesuffix("+stream")
+                    if stream:
+                        streaming.configure()
+                    else:
+                        streaming.disable()
+                    run_tone_eval.run_encoded(model, *encoded)  # warm up imports and connections
+                    server.reset_counts()
+                    preds = []
+                    stats = time_call(lambda: preds.append(run_tone_eval.run_encoded(model, *encoded)[0]), repeat=n_requests)
+                    stats["ms_per_request"] = 1000 * stats["median_s"]
+                    stats["audio_replies_per_request"] = server.audio_replies / n_requests
+                    stats["answers_parsed"] = sum(p == "3" for p in preds) / len(preds)
+                    stats.update(adapter=type(adapter).__name__, shape=shape, mock_latency_ms=latency_ms,
+                                 token_latency_ms=token_latency_ms, audio_latency_ms=audio_latency_ms)
+                    out[f"providers_{model.split('/', 1)[0]}_{shape}"] = stats
+                adapter.shape = adapter.SHAPES[0]
+        finally:
+            streaming.disable()
+            for k, v in saved_env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+    for name, stats in out.items():
+        cheapest = out[name.rsplit("_", 1)[0] + "_text"]
+        if stats is not cheapest:
+            stats["extra_ms_per_request_vs_text"] = stats["ms_per_request"] - cheapest["ms_per_request"]
+    return out
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "encode": bench_encode,
+    "generate": bench_generate,
+    "confusion": bench_confusion,
+    "batch": bench_batch,
+    "http": bench_http,
+    "knn": bench_knn,
+    "nn": bench_nn,
+    "stream": bench_stream,
+    "files": bench_files,
+    "providers": bench_providers,
+}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return a line per benchmark whose median_s regressed by more than threshold (fraction)."""
+    regressions = []
+    base = baseline.get("benchmarks", {})
+    for name, stats in results["benchmarks"].items():
+        old = base.get(name, {}).get("median_s")
+        new = stats.get("median_s")
+        if not old or new is None:
+            continue
+        ratio = new / old
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {old * 1000:.3f} ms -> {new * 1000:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark tone pipeline hot paths; write JSON results.")
+    parser.add_argument("--only", type=str, default=None, help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs (for a fast smoke run)")
+    parser.add_argument("--output", "-o", type=Path, default=None, help="Output JSON (default: results/bench/bench_<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline JSON from an earlier run; flag regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold as a fraction of the baseline median (default: 0.2)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    results = {"machine": machine_info(), "quick": args.quick, "benchmarks": {}}
+    for name in names:
+        print(f"  {name} ...", flush=True)
+        for key, stats in BENCHMARKS[name](args.quick).items():
+            results["benchmarks"][key] = stats
+            print(f"    {key:28s} median {stats['median_s'] * 1000:10.3f} ms")
+
+    if args.output is not None:
+        out = resolve(args.output)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = BENCH_DIR / f"bench_{stamp}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Wrote {out}")
+
+    if args.compare is not None:
+        base_path = resolve(args.compare)
+        baseline = json.loads(base_path.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions vs {base_path} (> {args.threshold:.0%} slower):")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"No regressions vs {base_path} (threshold {args.threshold:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+"""
+Nearest-neighbour search over F0 contours: which corpus clips have the most similar pitch shape?
+
+Every clip of a corpus (run_tone_eval manifest, index_corpus index or .pack) is reduced to
+local_tone's contour vector: N_POINTS points over the voiced part, in semitones around the
+clip's median and mean-centred, so a speaker's pitch level drops out. The vectors are kept in
+one float32 matrix together with their squared norms. A batch of queries is answered either by
+brute force, where one BLAS matrix product per block of queries gives
+|q|^2 + |x|^2 - 2 q.x and argpartition picks the k smallest, or by a scipy cKDTree
+(--method kdtree). The tree is rebuilt lazily after inserts. Distances are RMS semitones,
+as in local_tone.classify_contour.
+
+add() appends to the matrix (capacity doubles as needed), so new recordings are searchable
+at once; the `add` command appends files to a saved index. `build` reuses the vectors of
+clips whose content stamp did not change, so re-building after a corpus grows only
+extracts the new clips, and keeps the recordings appended with `add` (unless a corpus clip
+of the same name replaces them).
+
+The kNN classifier votes over the k nearest labelled clips, weighted by 1 / (distance + 0.05
+semitones); confidence is the winning share. It is available to run_tone_eval.py as the local
+model local/knn (index: results/contour_index.npz).
+
+Usage:
+  python scripts/contour_index.py build results/syllabs.pack              # -> results/contour_index.npz
+  python scripts/contour_index.py query path/to/misclassified.mp3 -k 10
+  python scripts/contour_index.py query --name cmn-cai4.mp3 -k 10        # a clip already in the index
+  python scripts/contour_index.py add my_recording.wav --tone 3
+  python scripts/contour_index.py evaluate -k 1,5,9                      # leave-one-out accuracy
+  python scripts/run_tone_eval.py --models local/knn,local/contour --pack results/syllabs.pack
+"""
+
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import local_tone
+import profiling
+from packed_corpus import corpus_clips, map_clips
+
+_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_INDEX = _ROOT / "results" / "contour_index.npz"
+DEFAULT_K = 7
+QUERY_BLOCK = 1024  # queries per matrix product; bounds the (block, n) distance matrix
+DISTANCE_FLOOR = 0.05  # semitones; keeps 1 / distance finite for exact matches
+METHODS = ("brute", "kdtree")
+
+
+class ContourIndex:
+    """Growable matrix of contour vectors with names, tones (0 = unlabelled), speakers, content stamps
+    and whether each row was added outside a corpus build."""
+
+    def __init__(self, n_points: int = local_tone.N_POINTS, capacity: int = 1024):
+        self.n_points = n_points
+        self.n = 0
+        self._vecs = np.empty((capacity, n_points), dtype=np.float32)
+        self._norms = np.empty(capacity, dtype=np.float32)
+        self._tones = np.empty(capacity, dtype=np.int8)
+        self.names: list[str] = []
+        self.speakers: list[str] = []
+        self.stamps: list[str] = []
+        self.added: list[bool] = []
+        self._tree = None
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vecs[:self.n]
+
+    @property
+    def tones(self) -> np.ndarray:
+        return self._tones[:self.n]
+
+    def _reserve(self, extra: int) -> None:
+        need = self.n + extra
+        if need <= len(self._vecs):
+            return
+        cap = max(need, 2 * len(self._vecs))
+        for attr in ("_vecs", "_norms", "_tones"):
+            old = getattr(self, attr)
+            new = np.empty((cap,) + old.shape[1:], dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, attr, new)
+
+    def add(self, names: list[str], vecs: np.ndarray, tones=None, speakers=None, stamps=None, added=False) -> None:
+        """Append rows (vecs: (len(names), n_points)); they are searchable immediately.
+        added: one flag for all rows or one per row; build_index keeps added rows across rebuilds."""
+        vecs = np.asarray(vecs, dtype=np.float32).reshape(len(names), self.n_points)
+        self._reserve(len(names))
+        rows = slice(self.n, self.n + len(names))
+        self._vecs[rows] = vecs
+        self._norms[rows] = np.einsum("ij,ij->i", vecs, vecs)
+        self._tones[rows] = 0 if tones is None else tones
+        self.names.extend(names)
+        self.speakers.extend(speakers if speakers is not None else [""] * len(names))
+        self.stamps.extend(stamps if stamps is not None else [""] * len(names))
+        self.added.extend([added] * len(names) if isinstance(added, bool) else [bool(a) for a in added])
+        self.n += len(names)
+        self._tree = None
+
+    def search(self, queries: np.ndarray, k: int, method: str = "brute", exclude=None) -> tuple[np.ndarray, np.ndarray]:
+        """(RMS distances, row indices), each (len(queries), k) nearest first; k is capped at len(self).
+        exclude: one row index per query to leave out (-1: none), e.g. the query's own row."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if exclude is not None:
+            k = min(k, self.n - 1)
+            dist, idx = self.search(queries, k + 1, method)
+            drop = idx == np.asarray(exclude)[:, None]
+            drop[~drop.any(axis=1), -1] = True  # excluded row not among the k + 1: drop the farthest
+            return dist[~drop].reshape(len(queries), k), idx[~drop].reshape(len(queries), k)
+        k = min(k, self.n)
+        if method == "kdtree":
+            if self._tree is None:
+                from scipy.spatial import cKDTree
+                self._tree = cKDTree(self.vectors)
+            dist, idx = self._tree.query(queries, k=k, workers=-1)
+            dist, idx = dist.reshape(len(queries), k), idx.reshape(len(queries), k)
+            return (dist / np.sqrt(self.n_points)).astype(np.float32), idx
+        dist = np.empty((len(queries), k), dtype=np.float32)
+        idx = np.empty((len(queries), k), dtype=np.int64)
+        vecs, norms = self.vectors, self._norms[:self.n]
+        for start in range(0, len(queries), QUERY_BLOCK):
+            q = queries[start:start + QUERY_BLOCK]
+            d2 = q @ vecs.T
+            d2 *= -2
+            d2 += norms
+            d2 += np.einsum("ij,ij->i", q, q)[:, None]
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k] if k < self.n else np.broadcast_to(np.arange(self.n), d2.shape)
+            part_d2 = np.take_along_axis(d2, part, axis=1)
+            order = np.argsort(part_d2, axis=1)
+            idx[start:start + len(q)] = np.take_along_axis(part, order, axis=1)
+            dist[start:start + len(q)] = np.take_along_axis(part_d2, order, axis=1)
+        np.sqrt(np.maximum(dist, 0, out=dist), out=dist)
+        dist /= np.sqrt(self.n_points)
+        return dist, idx
+
+    def classify(self, queries: np.ndarray, k: int = DEFAULT_K, method: str = "brute", exclude=None) -> tuple[np.ndarray, np.ndarray]:
+        """(tones, confidences) by weighted vote of the k nearest labelled rows; tone 0 when none voted.
+        exclude: one row index per query to leave out (leave-one-out evaluation)."""
+        dist, idx = self.search(queries, k, method, exclude)
+        weights = 1.0 / (dist + DISTANCE_FLOOR)
+        tones = self.tones[idx]
+        votes = np.stack([np.where(tones == t, weights, 0.0).sum(axis=1) for t in range(1, 5)], axis=1)
+        total = votes.sum(axis=1)
+        best = votes.argmax(axis=1)
+        conf = np.where(total > 0, votes[np.arange(len(idx)), best] / np.where(total > 0, total, 1), 0.0)
+        return np.where(total > 0, best + 1, 0), conf
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                vectors=self.vectors,
+                tones=self.tones,
+                names=np.array(self.names, dtype=str),
+                speakers=np.array(self.speakers, dtype=str),
+                stamps=np.array(self.stamps, dtype=str),
+                added=np.array(self.added, dtype=bool),
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ContourIndex":
+        with np.load(path) as z:
+            index = cls(z["vectors"].shape[1], max(1024, len(z["vectors"])))
+            added = z["added"].tolist() if "added" in z.files else False  # indexes saved before the flag existed
+            index.add(z["names"].tolist(), z["vectors"], z["tones"], z["speakers"].tolist(), z["stamps"].tolist(), added)
+        return index
+
+
+def contour_of(samples: np.ndarray, sample_rate: int) -> np.ndarray | None:
+    return local_tone.contour_vector(local_tone.extract_f0(samples, sample_rate))
+
+
+def build_index(
+    corpus: Path,
+    audio_dir: Path | None,
+    workers: int,
+    previous: ContourIndex | None = None,
+    reuse_rows: bool = True,
+) -> tuple[ContourIndex, int]:
+    """Index every voiced tone 1-4 clip of corpus; rows of previous with the same (name, stamp) are
+    reused (unless reuse_rows is False), and rows of previous added with `add` are carried over
+    unless a corpus clip has the same name. Returns (index, clips without a usable contour)."""
+    clips = corpus_clips(corpus, audio_dir)
+    reuse = {}
+    if previous is not None and reuse_rows:
+        reuse = {(n, s): i for i, (n, s) in enumerate(zip(previous.names, previous.stamps))}
+    index = ContourIndex(capacity=max(1024, len(clips)))
+    todo = [c for c in clips if (c["name"], c["stamp"]) not in reuse]
+    print(f"Contours: {len(clips) - len(todo)} reused, {len(todo)} to extract")
+    vecs: dict[str, np.ndarray | None] = {}
+    if todo:
+        pack = corpus if corpus.suffix == ".pack" else None
+        with profiling.span("extract", clips=len(todo)):
+            vecs = dict(zip([c["name"] for c in todo], map_clips(contour_of, [c["source"] for c in todo], workers, pack)))
+    kept, unvoiced = [], 0
+    for c in clips:
+        i = reuse.get((c["name"], c["stamp"]))
+        vec = previous.vectors[i] if i is not None else vecs[c["name"]]
+        if vec is None:
+            unvoiced += 1
+        else:
+            kept.append((c, vec))
+    if kept:
+        index.add(
+            [c["name"] for c, _ in kept],
+            np.stack([v for _, v in kept]),
+            [c["tone"] for c, _ in kept],
+            [c["speaker"] for c, _ in kept],
+            [c["stamp"] for c, _ in kept],
+        )
+    if previous is not None:
+        names = {c["name"] for c in clips}
+        carried = [i for i in range(len(previous)) if previous.added[i] and previous.names[i] not in names]
+        if carried:
+            index.add(
+                [previous.names[i] for i in carried],
+                previous.vectors[carried],
+                previous.tones[carried],
+                [previous.speakers[i] for i in carried],
+                [previous.stamps[i] for i in carried],
+                added=True,
+            )
+            print(f"Kept {len(carried)} clips added with the add command")
+    return index, unvoiced
+
+
+_default: ContourIndex | None = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> ContourIndex:
+    """The index at DEFAULT_INDEX, loaded once per process."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            if not DEFAULT_INDEX.exists():
+                raise FileNotFoundError(f"{DEFAULT_INDEX} not found; build it with: python scripts/contour_index.py build <corpus>")
+            _default = ContourIndex.load(DEFAULT_INDEX)
+        return _default
+
+
+def classify_samples(samples: np.ndarray, sample_rate: int, k: int = DEFAULT_K) -> tuple[int, float]:
+    """local/knn: (tone 1-4, confidence) from the k nearest clips of the default index; (0, 0.0) if unvoiced."""
+    vec = contour_of(samples, sample_rate)
+    if vec is None:
+        return 0, 0.0
+    tones, conf = default_index().classify(vec[None, :], k)
+    return int(tones[0]), float(conf[0])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build and query a nearest-neighbour index of F0 contours.")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX, help="Index file (default: results/contour_index.npz)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="Index the clips of a manifest, corpus index or .pack (incremental)")
+    p.add_argument("corpus", type=Path)
+    p.add_argument("--audio-dir", type=Path, default=None, help="Clip directory (default: index root, else manifest directory)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for F0 extraction (default: CPUs)")
+    p.add_argument("--rebuild", action="store_true", help="Extract every corpus clip again instead of reusing unchanged rows")
+    p = sub.add_parser("query", help="Nearest clips to audio files or indexed clips")
+    p.add_argument("files", nargs="*", type=Path, help="Audio files to look up")
+    p.add_argument("--name", action="append", default=[], help="Name of a clip in the index (repeatable)")
+    p.add_argument("-k", type=int, default=10, help="Neighbours to show (default: 10)")
+    p.add_argument("--method", choices=METHODS, default="brute")
+    p = sub.add_parser("add", help="Append audio files to the index")
+    p.add_argument("files", nargs="+", type=Path)
+    p.add_argument("--tone", type=int, default=0, help="Tone label of the files (default: 0, unlabelled)")
+    p.add_argument("--speaker", type=str, default="", help="Speaker of the files")
+    p = sub.add_parser("evaluate", help="Leave-one-out kNN accuracy vs the template scorer (local/contour)")
+    p.add_argument("-k", type=str, default=str(DEFAULT_K), help=f"Comma-separated k values (default: {DEFAULT_K})")
+    p.add_argument("--method", choices=METHODS, default="brute")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "contour_index")
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    index_path = resolve(args.index)
+    if args.cmd == "build":
+        previous = ContourIndex.load(index_path) if index_path.exists() else None
+        corpus = resolve(args.corpus)
+        audio_dir = resolve(args.audio_dir) if args.audio_dir else None
+        index, unvoiced = build_index(corpus, audio_dir, args.workers, previous, reuse_rows=not args.rebuild)
+        index.save(index_path)
+        print(f"Indexed {len(index)} clips ({unvoiced} without a usable contour) into {index_path}")
+        return 0
+
+    if not index_path.exists():
+        print(f"Error: {index_path} not found; run the build command first", file=sys.stderr)
+        return 1
+    with profiling.span("load"):
+        index = ContourIndex.load(index_path)
+
+    if args.cmd == "add":
+        names, vecs, stamps = [], [], []
+        for path in map(resolve, args.files):
+            vec = contour_of(*local_tone.load_audio(path))
+            if vec is None:
+                print(f"Skipping {path}: no usable contour", file=sys.stderr)
+                continue
+            st = path.stat()
+            names.append(path.name)
+            vecs.append(vec)
+            stamps.append(f"{st.st_size}:{st.st_mtime_ns}")
+        if names:
+            index.add(names, np.stack(vecs), [args.tone] * len(names), [args.speaker] * len(names), stamps, added=True)
+            index.save(index_path)
+        print(f"Added {len(names)} clips; {len(index)} in {index_path}")
+        return 0
+
+    if args.cmd == "query":
+        queries, labels, exclude = [], [], []
+        for path in map(resolve, args.files):
+            vec = contour_of(*local_tone.load_audio(path))
+            if vec is None:
+                print(f"{path}: no usable contour", file=sys.stderr)
+                continue
+            queries.append(vec)
+            labels.append(str(path))
+            exclude.append(-1)
+        rows = {n: i for i, n in enumerate(index.names)}
+        for name in args.name:
+            if name not in rows:
+                print(f"{name}: not in the index", file=sys.stderr)
+                continue
+            queries.append(index.vectors[rows[name]])
+            labels.append(name)
+            exclude.append(rows[name])  # not its own neighbour
+        if not queries:
+            return 1
+        with profiling.span("search", queries=len(queries)):
+            dist, idx = index.search(np.stack(queries), args.k, args.method, exclude)
+            tones, conf = index.classify(np.stack(queries), args.k, args.method, exclude)
+        for label, vec, d, i, tone, c in zip(labels, queries, dist, idx, tones, conf):
+            template_tone, _ = local_tone.classify_contour(np.asarray(vec, dtype=np.float64))
+            print(f"{label}: kNN tone {tone or '?'} ({c:.2f}), template tone {template_tone}")
+            for dj, ij in zip(d, i):
+                speaker = f", {index.speakers[ij]}" if index.speakers[ij] else ""
+                print(f"  {dj:6.3f} st  tone {index.tones[ij] or '?'}  {index.names[ij]}{speaker}")
+        return 0
+
+    # evaluate
+    labelled = np.flatnonzero(index.tones > 0)
+    truth = index.tones[labelled]
+    template = np.array([local_tone.classify_contour(v.astype(np.float64))[0] for v in index.vectors[labelled]])
+    print(f"{len(labelled)} labelled clips; template scorer (local/contour) accuracy {np.mean(template == truth):.4f}")
+    for k in (int(x) for x in args.k.split(",")):
+        with profiling.span("evaluate", k=k):
+            pred, _ = index.classify(index.vectors[labelled], k, args.method, exclude=labelled)
+        per_tone = "  ".join(f"T{t} {np.mean(pred[truth == t] == t):.3f}" for t in range(1, 5) if np.any(truth == t))
+        print(f"  k={k:<3d} leave-one-out accuracy {np.mean(pred == truth):.4f}  ({per_tone})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
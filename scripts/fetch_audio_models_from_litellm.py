@@ -3,18 +3,16 @@ Fetch an up-to-date list of models that support audio input from LiteLLM's
 canonical model list on GitHub. No API keys required.
 
 Source: https://github.com/BerriAI/litellm/blob/main/model_prices_and_context_window.json
+The JSON is cached and revalidated via scripts/model_index.py; pass --refresh to force a
+conditional re-download, --offline to use only the cache / bundled fallback.
 """
 
-import json
+import argparse
 import sys
 from pathlib import Path
 
-try:
-    from urllib.request import urlopen
-except ImportError:
-    urlopen = None
-
-URL = "https://raw.githubusercontent.com/BerriAI/litellm/main/model_prices_and_context_window.json"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import model_index
 
 # Providers we care about (LiteLLM provider names in the JSON)
 PROVIDERS = {"openai", "anthropic", "mistral", "gemini", "google", "vertex_ai", "vertex_ai-language-models"}
@@ -29,46 +27,27 @@ PROVIDER_LABEL = {
 }
 
 
-def fetch_json(url: str) -> dict:
-    if urlopen is None:
-        raise RuntimeError("urllib.request.urlopen not available")
-    with urlopen(url, timeout=30) as r:
-        return json.loads(r.read().decode())
-
-
-def model_id_for_litellm(key: str, provider: str) -> str:
-    """Return the model string to pass to litellm.completion()."""
-    if "/" in key:
-        # Key is already "openai/gpt-4o", "gemini/gemini-2.0-flash", "vertex_ai/gemini-3-flash-preview"
-        return key
-    # Bare key like "gpt-4o-audio-preview" -> "openai/gpt-4o-audio-preview"
-    return f"{provider}/{key}"
-
-
 def main() -> int:
-    print("Fetching model list from LiteLLM GitHub...")
-    try:
-        data = fetch_json(URL)
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
+    parser = argparse.ArgumentParser(description="List audio-input models from LiteLLM's model list.")
+    parser.add_argument("--refresh", action="store_true", help="Revalidate the cached JSON with GitHub now")
+    parser.add_argument("--offline", action="store_true", help="Use only the cache or bundled fallback")
+    args = parser.parse_args()
+
+    print("Loading model list from LiteLLM GitHub (cached)...")
+    index = model_index.load_index(refresh=args.refresh, offline=args.offline)
+    if not index:
+        print("Error: no model data (no network, cache or fallback)", file=sys.stderr)
         return 1
 
     # Collect (provider_label, model_id) for supports_audio_input
     by_provider: dict[str, list[str]] = {}
-    for key, entry in data.items():
-        if key == "sample_spec" or not isinstance(entry, dict):
-            continue
-        if not entry.get("supports_audio_input"):
-            continue
-        provider = entry.get("litellm_provider") or ""
-        if provider not in PROVIDERS:
+    for record in index.values():
+        if not record["audio_input"] or record["provider"] not in PROVIDERS:
             continue
-        label = PROVIDER_LABEL.get(provider, provider)
-        model_id = model_id_for_litellm(key, provider)
-        if label not in by_provider:
-            by_provider[label] = []
-        if model_id not in by_provider[label]:
-            by_provider[label].append(model_id)
+        label = PROVIDER_LABEL.get(record["provider"], record["provider"])
+        models = by_provider.setdefault(label, [])
+        if record["id"] not in models:
+            models.append(record["id"])
 
     # Sort and print
     for label in sorted(by_provider.keys()):
@@ -0,0 +1,290 @@
+"""
+Upload-once Gemini Files API references for clips sent to many Gemini models and prompts.
+
+Inline audio makes every Gemini request carry the whole clip as base64 (about 4/3 of its size),
+once per model, prompt and repeated run. With this module enabled each clip is uploaded once
+through the Files API (resumable upload to <root>/upload/v1beta/files) and later requests send
+only a file_data part with the returned URI. URIs are cached in a JSON file keyed by the
+SHA-256 of the clip bytes (per API root), together with their expiration time (Gemini keeps
+uploads for 48 h); entries closer than EXPIRY_MARGIN_S to expiry are uploaded again.
+
+Every failure falls back to inline data: an upload error sends that request inline, and a
+request whose reference the API rejects (file expired, deleted, or owned by another key) is
+retried inline after the cache entry is dropped. Only gemini/ models use references.
+
+report() prints uploads, requests by reference and inline, the request bytes saved (net of the
+uploaded bytes) and the mean request latency of both kinds.
+
+Usage (run_tone_eval.py --gemini-files does this):
+  import gemini_files
+  gemini_files.configure()                       # cache: results/gemini_files.json
+  ref = gemini_files.reference(model, encoded, fmt)   # None: send inline
+  print(gemini_files.report())
+The API root follows GEMINI_API_BASE (minus /v1beta), so mock_provider.py can stand in for it.
+"""
+
+import atexit
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE = _ROOT / "results" / "gemini_files.json"
+DEFAULT_API_ROOT = "https://generativelanguage.googleapis.com"
+FILES_URI_PREFIX = "https://generativelanguage.googleapis.com/v1beta/files/"
+EXPIRY_MARGIN_S = 3600.0  # re-upload files that expire within the hour
+UPLOAD_TIMEOUT = 90.0
+PROCESSING_WAIT_S = 30.0
+SAVE_EVERY = 50  # uploads between cache file writes (and at close)
+MIME_TYPES = {"wav": "audio/wav", "mp3": "audio/mp3", "flac": "audio/flac", "ogg": "audio/ogg", "aac": "audio/aac"}
+# Status codes of a rejected file reference (not found, no permission): retry inline. A 400 counts
+# only when it is about the file (e.g. FAILED_PRECONDITION, not ACTIVE); other 400s are real errors
+STALE_REFERENCE_STATUS = (403, 404)
+
+
+def api_root() -> str:
+    base = (os.environ.get("GEMINI_API_BASE") or DEFAULT_API_ROOT).rstrip("/")
+    return base[: -len("/v1beta")] if base.endswith("/v1beta") else base
+
+
+def api_key() -> str:
+    return os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY") or ""
+
+
+def parse_time(value: str) -> float:
+    """RFC 3339 timestamp (nanosecond precision allowed) -> epoch seconds."""
+    head, _, frac = value.rstrip("Z").partition(".")
+    return datetime.fromisoformat(head + "+00:00").timestamp() + (float(f"0.{frac}") if frac else 0.0)
+
+
+class FileCache:
+    """Thread-safe content-hash -> uploaded file cache with upload and request counters."""
+
+    def __init__(self, path: Path | None = DEFAULT_CACHE, margin_s: float = EXPIRY_MARGIN_S):
+        self.path = path
+        self.margin_s = margin_s
+        self.root = api_root()
+        self.entries: dict[str, dict] = {}
+        self.stats = dict.fromkeys(
+            ("uploads", "upload_bytes", "upload_errors", "hits", "by_reference", "inline", "fallbacks", "saved_bytes"), 0
+        )
+        self.latency = {"reference": [0, 0.0], "inline": [0, 0.0]}  # [requests, seconds]
+        self.upload_s = 0.0
+        self._lock = threading.Lock()
+        self._digest_locks: dict[str, threading.Lock] = {}
+        self._client: httpx.Client | None = None
+        self._unsaved = 0
+        if path is not None and path.exists():
+            try:
+                stored = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                stored = {}
+            now = time.time()
+            self.entries = {d: e for d, e in stored.get(self.root, {}).items() if e["expires_at"] - self.margin_s > now}
+
+    def _http(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=UPLOAD_TIMEOUT)
+            return self._client
+
+    def save(self) -> None:
+        """Write the cache file (entries of other API roots are kept)."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._unsaved = 0
+            try:
+                stored = json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else {}
+            except (OSError, ValueError):
+                stored = {}
+            stored[self.root] = dict(self.entries)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(stored, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def _valid(self, digest: str) -> dict | None:
+        entry = self.entries.get(digest)
+        if entry is not None and entry["expires_at"] - self.margin_s <= time.time():
+            return None
+        return entry
+
+    def reference(self, encoded: str, fmt: str) -> dict | None:
+        """{"uri", "mime_type"} of the uploaded clip (uploading it on first use); None on failure."""
+        data = base64.b64decode(encoded)
+        digest = hashlib.sha256(data).hexdigest()
+        entry = self._valid(digest)
+        if entry is None:
+            with self._lock:
+                lock = self._digest_locks.setdefault(digest, threading.Lock())
+            with lock:  # one upload per clip, however many models ask at once
+                entry = self._valid(digest)
+                if entry is None:
+                    try:
+                        entry = self.upload(data, MIME_TYPES.get(fmt, f"audio/{fmt}"), digest)
+                    except (httpx.HTTPError, KeyError, ValueError, RuntimeError):
+                        with self._lock:
+                            self.stats["upload_errors"] += 1
+                        return None
+                    with self._lock:
+                        self.entries[digest] = entry
+                        self._unsaved += 1
+                    if self._unsaved >= SAVE_EVERY:
+                        self.save()
+        else:
+            with self._lock:
+                self.stats["hits"] += 1
+        return {"uri": entry["uri"], "mime_type": entry["mime_type"], "digest": digest, "inline_bytes": len(encoded)}
+
+    def upload(self, data: bytes, mime_type: str, digest: str) -> dict:
+        """Resumable Files API upload; waits while the file is PROCESSING. Returns the cache entry."""
+        http = self._http()
+        start = time.perf_counter()
+        params = {"key": api_key()}
+        resp = http.post(
+            f"{self.root}/upload/v1beta/files",
+            params=params,
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(len(data)),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+            },
+            json={"file": {"display_name": f"tone-{digest[:16]}"}},
+        )
+        resp.raise_for_status()
+        resp = http.post(
+            resp.headers["X-Goog-Upload-URL"],
+            headers={"X-Goog-Upload-Offset": "0", "X-Goog-Upload-Command": "upload, finalize"},
+            content=data,
+        )
+        resp.raise_for_status()
+        info = resp.json()["file"]
+        deadline = time.monotonic() + PROCESSING_WAIT_S
+        while info.get("state") == "PROCESSING":
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{info['name']} still PROCESSING after {PROCESSING_WAIT_S:.0f} s")
+            time.sleep(0.5)
+            resp = http.get(f"{self.root}/v1beta/{info['name']}", params=params)
+            resp.raise_for_status()
+            info = resp.json()
+        if info.get("state", "ACTIVE") != "ACTIVE":
+            raise RuntimeError(f"{info['name']} is {info['state']}")
+        with self._lock:
+            self.stats["uploads"] += 1
+            self.stats["upload_bytes"] += len(data)
+            self.upload_s += time.perf_counter() - start
+        return {
+            "name": info["name"],
+            "uri": info["uri"],
+            "mime_type": info.get("mimeType", mime_type),
+            "size": len(data),
+            "expires_at": parse_time(info["expirationTime"]),
+        }
+
+    def invalidate(self, ref: dict) -> None:
+        """Drop a reference the API rejected; the next use uploads the clip again."""
+        with self._lock:
+            self.stats["fallbacks"] += 1
+            entry = self.entries.get(ref["digest"])
+            if entry is not None and entry["uri"] == ref["uri"]:
+                del self.entries[ref["digest"]]
+                self._unsaved += 1
+
+    def count_request(self, ref: dict | None, latency_s: float) -> None:
+        with self._lock:
+            kind = "inline" if ref is None else "reference"
+            self.stats["by_reference" if ref is not None else "inline"] += 1
+            if ref is not None:
+                self.stats["saved_bytes"] += ref["inline_bytes"] - len(ref["uri"])
+            self.latency[kind][0] += 1
+            self.latency[kind][1] += latency_s
+
+    def report(self) -> str:
+        s = self.stats
+        if not (s["by_reference"] or s["inline"] or s["uploads"]):
+            return ""
+        net = s["saved_bytes"] - s["upload_bytes"]
+        lines = [
+            f"Gemini files ({self.root}): {s['uploads']} uploads ({s['upload_bytes'] / 1e6:.2f} MB, "
+            f"{self.upload_s:.2f} s), {s['hits']} cache hits, {s['upload_errors']} upload errors",
+            f"  {s['by_reference']} requests by reference, {s['inline']} inline ({s['fallbacks']} fallbacks after a rejected reference)",
+            f"  request bytes saved: {s['saved_bytes'] / 1e6:.2f} MB ({net / 1e6:+.2f} MB net of uploads)",
+        ]
+        means = {k: (t / n if n else None) for k, (n, t) in self.latency.items()}
+        if means["reference"] is not None and means["inline"] is not None:
+            lines.append(f"  mean request latency: {means['reference'] * 1000:.0f} ms by reference, {means['inline'] * 1000:.0f} ms inline")
+        elif means["reference"] is not None:
+            lines.append(f"  mean request latency: {means['reference'] * 1000:.0f} ms by reference")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        if self._unsaved:
+            self.save()
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+_cache: FileCache | None = None
+
+
+def configure(path: Path | None = DEFAULT_CACHE, margin_s: float = EXPIRY_MARGIN_S) -> FileCache:
+    """Enable references process-wide (replacing an earlier cache); path None keeps URIs in memory only."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = FileCache(path, margin_s)
+    return _cache
+
+
+def disable() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def reference(model: str, encoded: str, fmt: str) -> dict | None:
+    """File reference to send instead of inline data for model, or None (disabled, not Gemini, upload failed)."""
+    if _cache is None or not model.startswith("gemini/"):
+        return None
+    return _cache.reference(encoded, fmt)
+
+
+def is_stale_reference_error(e: Exception, ref: dict | None = None) -> bool:
+    """Whether e is the API rejecting the file reference ref (so the request can go inline)."""
+    status = getattr(e, "status_code", None)
+    if status in STALE_REFERENCE_STATUS:
+        return True
+    if status != 400:
+        return False
+    message = str(e)
+    file_id = ref["uri"].rsplit("/", 1)[-1] if ref is not None else None
+    return "FAILED_PRECONDITION" in message or "files/" in message or (file_id is not None and file_id in message)
+
+
+def invalidate(ref: dict) -> None:
+    if _cache is not None:
+        _cache.invalidate(ref)
+
+
+def count_request(model: str, ref: dict | None, latency_s: float) -> None:
+    if _cache is not None and model.startswith("gemini/"):
+        _cache.count_request(ref, latency_s)
+
+
+def report() -> str:
+    return _cache.report() if _cache is not None else ""
+
+
+atexit.register(disable)
@@ -7,15 +7,28 @@ T3: dip then rise
 T4: fall from relatively high
 
 Parameters can be overridden by results/suggested_tone_params.json (from scripts/analyze_bai_tones.py -o results/suggested_tone_params.json).
-Output: 16-bit PCM WAV in synthetic_tones/ plus a manifest for LLM eval.
+Output: 16-bit PCM WAV in synthetic_tones/ plus a manifest for LLM eval, or with
+--pack PATH a packed corpus (scripts/packed_corpus.py) holding the WAVs and their PCM.
+--sweep writes every tone over a grid of durations, pitch ranges and F0 heights to
+synthetic_tones/sweep/ with manifest.json and metadata.csv (the synthesis parameters per
+clip, joinable in scripts/analyze_error_breakdown.py).
+Pass --profile to time the synthesize / write stages (see scripts/profiling.py).
 """
 
+import argparse
+import csv
+import io
 import json
+import sys
 from pathlib import Path
 
 import numpy as np
 from scipy.io import wavfile
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+from packed_corpus import PackWriter
+
 _ROOT = Path(__file__).resolve().parent.parent
 _PARAMS_FILE = _ROOT / "results" / "suggested_tone_params.json"
 
@@ -40,6 +53,7 @@ FADE_MS = 10     # short fade-in/fade-out to avoid clicks
 
 OUTPUT_DIR = _ROOT / "synthetic_tones"
 MANIFEST_PATH = OUTPUT_DIR / "manifest.json"
+SWEEP_DIR = OUTPUT_DIR / "sweep"
 
 
 def _time_axis(duration_ms: float, sample_rate: int) -> np.ndarray:
@@ -56,35 +70,38 @@ def _fade(n_samples: int, sample_rate: int, fade_ms: float) -> np.ndarray:
     return np.concatenate([up, mid, down]).astype(np.float64)
 
 
-def f0_t1(t: np.ndarray) -> np.ndarray:
+def f0_t1(t: np.ndarray, high: float | None = None, low: float | None = None) -> np.ndarray:
     """T1: flat tone, relatively high frequency."""
-    return np.full_like(t, F0_HIGH)
+    return np.full_like(t, F0_HIGH if high is None else high)
 
 
-def f0_t2(t: np.ndarray) -> np.ndarray:
+def f0_t2(t: np.ndarray, high: float | None = None, low: float | None = None) -> np.ndarray:
     """T2: rising frequency."""
+    high, low = (F0_HIGH if high is None else high), (F0_LOW if low is None else low)
     progress = t / (t[-1] - t[0]) if t[-1] > t[0] else np.ones_like(t)
-    return F0_LOW + (F0_HIGH - F0_LOW) * progress
+    return low + (high - low) * progress
 
 
-def f0_t3(t: np.ndarray) -> np.ndarray:
+def f0_t3(t: np.ndarray, high: float | None = None, low: float | None = None) -> np.ndarray:
     """T3: first dips then rises."""
+    high, low = (F0_HIGH if high is None else high), (F0_LOW if low is None else low)
+    mid, dip = (high + low) / 2, low  # same relation as F0_MID / F0_DIP
     n = len(t)
-    t_end = t[-1] - t[0] if t[-1] > t[0] else 1.0
     # First half: mid -> dip; second half: dip -> high
     f0 = np.empty_like(t)
     mid_i = n // 2
     progress_first = np.linspace(0, 1, mid_i)
     progress_second = np.linspace(0, 1, n - mid_i)
-    f0[:mid_i] = F0_MID + (F0_DIP - F0_MID) * progress_first
-    f0[mid_i:] = F0_DIP + (F0_HIGH - F0_DIP) * progress_second
+    f0[:mid_i] = mid + (dip - mid) * progress_first
+    f0[mid_i:] = dip + (high - dip) * progress_second
     return f0
 
 
-def f0_t4(t: np.ndarray) -> np.ndarray:
+def f0_t4(t: np.ndarray, high: float | None = None, low: float | None = None) -> np.ndarray:
     """T4: frequency falls from relatively high value."""
+    high, low = (F0_HIGH if high is None else high), (F0_LOW if low is None else low)
     progress = t / (t[-1] - t[0]) if t[-1] > t[0] else np.ones_like(t)
-    return F0_HIGH + (F0_LOW - F0_HIGH) * progress
+    return high + (low - high) * progress
 
 
 def f0_to_wav(f0: np.ndarray, sample_rate: int, amplitude: float, fade_ms: float) -> np.ndarray:
@@ -107,10 +124,14 @@ def generate_all(
     sample_rate: int = SAMPLE_RATE,
     amplitude: float = AMPLITUDE,
     fade_ms: float = FADE_MS,
+    pack: PackWriter | None = None,
 ) -> dict:
-    """Generate tone1.wav .. tone4.wav and return manifest {filename: tone_label}."""
+    """Generate tone1.wav .. tone4.wav and return manifest {filename: tone_label}.
+
+    With pack, the WAVs (and their PCM) are added to the pack instead of written to output_dir."""
     output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if pack is None:
+        output_dir.mkdir(parents=True, exist_ok=True)
 
     t = _time_axis(duration_ms, sample_rate)
     contours = [
@@ -121,15 +142,103 @@ def generate_all(
     ]
     manifest = {}
     for f0_fn, tone_num, filename in contours:
-        f0 = f0_fn(t)
-        samples = f0_to_wav(f0, sample_rate, amplitude, fade_ms)
-        path = output_dir / filename
-        wavfile.write(str(path), sample_rate, samples)
+        with profiling.span("synthesize", file=filename):
+            f0 = f0_fn(t)
+            samples = f0_to_wav(f0, sample_rate, amplitude, fade_ms)
+        with profiling.span("write", file=filename):
+            if pack is not None:
+                buf = io.BytesIO()
+                wavfile.write(buf, sample_rate, samples)
+                pack.add(filename, buf.getvalue(), "wav", tone_num, samples, sample_rate)
+            else:
+                wavfile.write(str(output_dir / filename), sample_rate, samples)
         manifest[filename] = tone_num
     return manifest
 
 
+def generate_sweep(
+    output_dir: Path,
+    durations_ms: list[float],
+    ranges_hz: list[float],
+    f0_highs: list[float],
+    sample_rate: int = SAMPLE_RATE,
+    pack: PackWriter | None = None,
+) -> tuple[dict, list[dict]]:
+    """All four tones for every (duration, range, F0 high) combination.
+
+    Returns (manifest, metadata rows); each row holds audio_file, tone and the synthesis parameters."""
+    output_dir = Path(output_dir)
+    if pack is None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    manifest, metadata = {}, []
+    for duration_ms in durations_ms:
+        t = _time_axis(duration_ms, sample_rate)
+        for range_hz in ranges_hz:
+            for high in f0_highs:
+                for tone_num, f0_fn in enumerate((f0_t1, f0_t2, f0_t3, f0_t4), start=1):
+                    filename = f"tone{tone_num}_d{duration_ms:g}_r{range_hz:g}_h{high:g}.wav"
+                    with profiling.span("synthesize", file=filename):
+                        samples = f0_to_wav(f0_fn(t, high, high - range_hz), sample_rate, AMPLITUDE, FADE_MS)
+                    params = {"duration_ms": duration_ms, "range_hz": range_hz, "f0_high_hz": high}
+                    with profiling.span("write", file=filename):
+                        if pack is not None:
+                            buf = io.BytesIO()
+                            wavfile.write(buf, sample_rate, samples)
+                            pack.add(filename, buf.getvalue(), "wav", tone_num, samples, sample_rate, **params)
+                        else:
+                            wavfile.write(str(output_dir / filename), sample_rate, samples)
+                    manifest[filename] = tone_num
+                    metadata.append({"audio_file": filename, "tone": tone_num, **params})
+    return manifest, metadata
+
+
+def _floats(value: str) -> list[float]:
+    return [float(v) for v in value.split(",")]
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic tone WAVs and manifest.")
+    parser.add_argument("--pack", type=Path, default=None, help="Write the clips to this packed corpus instead of synthetic_tones/")
+    parser.add_argument("--sweep", action="store_true", help=f"Write a parameter sweep to {SWEEP_DIR.relative_to(_ROOT)}/ with metadata.csv")
+    parser.add_argument("--durations", type=str, default="150,280,450", help="Sweep durations in ms (default: 150,280,450)")
+    parser.add_argument("--ranges", type=str, default="15,40,80", help="Sweep pitch ranges in Hz (default: 15,40,80)")
+    parser.add_argument("--f0-highs", type=str, default="140,220,300", help="Sweep top F0 values in Hz (default: 140,220,300)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "generate_tones")
+
+    if args.sweep:
+        pack = PackWriter(args.pack if args.pack.is_absolute() else _ROOT / args.pack) if args.pack else None
+        manifest, metadata = generate_sweep(
+            SWEEP_DIR, _floats(args.durations), _floats(args.ranges), _floats(args.f0_highs), pack=pack
+        )
+        if pack is not None:
+            pack.close()
+            print(f"Wrote {len(manifest)} sweep clips to {pack.path}")
+            return
+        with open(SWEEP_DIR / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        with open(SWEEP_DIR / "metadata.csv", "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=list(metadata[0]))
+            w.writeheader()
+            w.writerows(metadata)
+        print(f"Wrote {len(manifest)} sweep WAVs to {SWEEP_DIR} (manifest.json, metadata.csv)")
+        return
+
+    if args.pack is not None:
+        pack_path = args.pack if args.pack.is_absolute() else _ROOT / args.pack
+        with PackWriter(pack_path) as pack:
+            manifest = generate_all(
+                OUTPUT_DIR,
+                duration_ms=DURATION_MS,
+                sample_rate=SAMPLE_RATE,
+                amplitude=AMPLITUDE,
+                fade_ms=FADE_MS,
+                pack=pack,
+            )
+        print(f"Wrote {len(manifest)} clips to {pack_path}")
+        return
+
     manifest = generate_all(
         OUTPUT_DIR,
         duration_ms=DURATION_MS,
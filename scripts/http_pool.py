@@ -0,0 +1,209 @@
+"""
+Long-lived pooled HTTP clients for provider calls, one per provider.
+
+Without a shared client every completion may pay for its own TCP connect and TLS handshake.
+Here each provider (openai, gemini) gets one httpx.Client with keep-alive, a connection pool
+sized for the caller's concurrency, and HTTP/2 when the optional h2 package is installed;
+completion_kwargs(model) hands it to litellm.completion as the `client` argument (an OpenAI
+SDK client for openai/, LiteLLM's HTTPHandler for gemini/). Other providers keep LiteLLM's
+own clients.
+
+Connection reuse is counted through httpcore's trace hook: every request, every new TCP
+connection and TLS handshake, and the time spent setting connections up. report() prints
+one line per provider.
+
+Usage (run_tone_eval.py does this; --no-http-pool turns it off):
+  import http_pool
+  http_pool.configure(max_connections=16)
+  litellm.completion(model=model, messages=messages, **http_pool.completion_kwargs(model))
+  print(http_pool.report())
+"""
+
+import atexit
+import importlib.util
+import os
+import threading
+import time
+
+import httpx
+
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_KEEPALIVE_EXPIRY = 120.0  # s an idle connection is kept open
+DEFAULT_TIMEOUT = 90.0
+POOLED_PROVIDERS = ("openai", "gemini")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ConnectionStats:
+    """Thread-safe request / connection counters fed by httpcore trace events."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.connect_s = 0.0
+        self._lock = threading.Lock()
+        self._started = threading.local()
+
+    def trace(self, event: str, info: dict) -> None:
+        if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+            self._started.t = time.perf_counter()
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            elapsed = time.perf_counter() - getattr(self._started, "t", time.perf_counter())
+            with self._lock:
+                self.connect_s += elapsed
+                if event == "connection.connect_tcp.complete":
+                    self.connections += 1
+                else:
+                    self.tls_handshakes += 1
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.connections)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+                "connect_s": self.connect_s,
+            }
+
+
+class CountingTransport(httpx.HTTPTransport):
+    """HTTPTransport that reports every request and new connection to a ConnectionStats."""
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.count_request()
+        request.extensions = {**request.extensions, "trace": self.stats.trace}
+        return super().handle_request(request)
+
+
+def provider_of(model: str) -> str:
+    """'gemini/gemini-2.5-pro' -> 'gemini'; unprefixed names count as openai."""
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+class ProviderPool:
+    """One lazily created pooled httpx.Client (and LiteLLM client wrapper) per provider."""
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_AVAILABLE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = timeout
+        self.stats: dict[str, ConnectionStats] = {}
+        self._http: dict[str, httpx.Client] = {}
+        self._clients: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def http_client(self, provider: str) -> httpx.Client:
+        with self._lock:
+            if provider not in self._http:
+                stats = self.stats.setdefault(provider, ConnectionStats())
+                transport = CountingTransport(stats, limits=self.limits, http2=self.http2)
+                self._http[provider] = httpx.Client(
+                    transport=transport, timeout=self.timeout, follow_redirects=True
+                )
+            return self._http[provider]
+
+    def client_for(self, model: str):
+        """The object LiteLLM takes as `client` for model's provider, or None to leave it to LiteLLM."""
+        provider = provider_of(model)
+        if provider not in POOLED_PROVIDERS:
+            return None
+        if provider not in self._clients:
+            client = self._make_client(provider)
+            with self._lock:
+                self._clients.setdefault(provider, client)
+        return self._clients[provider]
+
+    def _make_client(self, provider: str):
+        if provider == "openai":
+            import openai
+            # A passed-in client carries its own credentials and base URL; without a key
+            # LiteLLM's default client reports the missing key as usual
+            if not os.environ.get("OPENAI_API_KEY"):
+                return None
+            return openai.OpenAI(
+                api_key=os.environ["OPENAI_API_KEY"],
+                base_url=os.environ.get("OPENAI_BASE_URL") or os.environ.get("OPENAI_API_BASE") or None,
+                http_client=self.http_client(provider),
+                timeout=self.timeout,
+            )
+        from litellm.llms.custom_httpx.http_handler import HTTPHandler
+        return HTTPHandler(timeout=self.timeout, client=self.http_client(provider))
+
+    def report(self) -> str:
+        lines = []
+        for provider, stats in sorted(self.stats.items()):
+            s = stats.snapshot()
+            if not s["requests"]:
+                continue
+            lines.append(
+                f"  {provider:8s} {s['requests']} requests over {s['connections']} connections "
+                f"({s['reuse_rate']:.0%} reused, {s['tls_handshakes']} TLS handshakes, "
+                f"{s['connect_s'] * 1000:.0f} ms connecting)"
+            )
+        if not lines:
+            return ""
+        protocol = "HTTP/2 where offered" if self.http2 else "HTTP/1.1 keep-alive"
+        return f"HTTP pool ({protocol}, {self.limits.max_connections} connections per provider):\n" + "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._http.values():
+                client.close()
+            self._http.clear()
+            self._clients.clear()
+
+
+_pool: ProviderPool | None = None
+
+
+def configure(**kwargs) -> ProviderPool:
+    """Replace the process-wide pool (closing the old one); kwargs as for ProviderPool."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+    _pool = ProviderPool(**kwargs)
+    return _pool
+
+
+def disable() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+    _pool = None
+
+
+def completion_kwargs(model: str) -> dict:
+    """Extra litellm.completion kwargs routing model through the shared pool ({} when disabled)."""
+    if _pool is None:
+        return {}
+    client = _pool.client_for(model)
+    return {"client": client} if client is not None else {}
+
+
+def report() -> str:
+    return _pool.report() if _pool is not None else ""
+
+
+atexit.register(disable)
@@ -0,0 +1,264 @@
+"""
+Index a syllable corpus (e.g. audio-cmn/64k/syllabs with cmn-<pinyin><tone>.mp3 files) and
+write evaluation manifests from queries over the index.
+
+Each entry records pinyin, initial, final, tone, duration, size, mtime and SHA-1 of the file.
+The index is stored as JSON (default: <corpus>/index.json); re-indexing reuses every entry
+whose size and mtime are unchanged, so only new or modified files are hashed and probed.
+
+Queries filter by initial / final / tone / duration, draw a seeded sample stratified by
+tone, and select a deterministic train/dev/test split. Splits are keyed on the toneless
+syllable, so all tones of one syllable land in the same split. The selected entries are
+written as a run_tone_eval manifest ({filename: tone}); run_tone_eval also accepts the
+index file itself as --manifest.
+
+Usage:
+  python scripts/index_corpus.py audio-cmn/64k/syllabs
+  python scripts/index_corpus.py audio-cmn/64k/syllabs --initial zh,ch,sh --tone 3 \\
+      --sample 40 --manifest-out audio-cmn/64k/syllabs/manifest_retroflex.json
+  python scripts/index_corpus.py audio-cmn/64k/syllabs --initial none --split test --manifest-out ...
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+from pinyin_utils import parse_filename, split_pinyin
+
+_ROOT = Path(__file__).resolve().parent.parent
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+AUDIO_SUFFIXES = (".mp3", ".wav")
+SPLITS = ("train", "dev", "test")
+DEFAULT_SPLIT_RATIOS = (0.8, 0.1, 0.1)
+
+
+def audio_duration(path: Path) -> float | None:
+    """Duration in seconds from the file header (WAV via wave, others via soundfile/librosa)."""
+    try:
+        if path.suffix.lower() == ".wav":
+            with wave.open(str(path)) as w:
+                return w.getnframes() / w.getframerate()
+        import soundfile
+        return float(soundfile.info(str(path)).duration)
+    except Exception:
+        try:
+            import librosa
+            return float(librosa.get_duration(path=str(path)))
+        except Exception:
+            return None
+
+
+def file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_entry(path: Path, stat) -> dict:
+    label = parse_filename(path.name)
+    pinyin, tone = label if label else ("", 0)
+    initial, final = split_pinyin(pinyin) if pinyin else ("", "")
+    with profiling.span("probe", file=path.name):
+        sha1 = file_sha1(path)
+        duration = audio_duration(path)
+    return {
+        "pinyin": pinyin,
+        "initial": initial,
+        "final": final,
+        "tone": tone,
+        "duration_s": round(duration, 4) if duration is not None else None,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": sha1,
+    }
+
+
+def load_index(index_path: Path) -> dict:
+    if index_path.exists():
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    return {"version": INDEX_VERSION, "root": "", "entries": {}}
+
+
+def update_index(corpus_dir: Path, index_path: Path, workers: int = 8) -> tuple[dict, dict[str, int]]:
+    """Scan corpus_dir and refresh the index at index_path; return (index, change counts)."""
+    index = load_index(index_path)
+    old = index["entries"]
+    entries: dict[str, dict] = {}
+    todo: list[tuple[str, Path, object]] = []
+    with profiling.span("scan"):
+        for path in sorted(corpus_dir.iterdir()):
+            if path.suffix.lower() not in AUDIO_SUFFIXES or not path.is_file():
+                continue
+            st = path.stat()
+            prev = old.get(path.name)
+            if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+                entries[path.name] = prev
+            else:
+                todo.append((path.name, path, st))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for name, entry in zip([t[0] for t in todo], pool.map(lambda t: make_entry(t[1], t[2]), todo)):
+            entries[name] = entry
+    counts = {
+        "added": sum(1 for name, _, _ in todo if name not in old),
+        "changed": sum(1 for name, _, _ in todo if name in old),
+        "removed": sum(1 for name in old if name not in entries),
+        "unchanged": len(entries) - len(todo),
+    }
+    index = {"version": INDEX_VERSION, "root": str(corpus_dir), "entries": dict(sorted(entries.items()))}
+    if todo or counts["removed"] or not index_path.exists():
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(index, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(index_path)
+    return index, counts
+
+
+def _split_of(key: str, seed: int, ratios: tuple[float, ...] = DEFAULT_SPLIT_RATIOS) -> str:
+    """Deterministic split for key from a hash, independent of corpus order and size."""
+    h = hashlib.sha1(f"{seed}:{key}".encode()).digest()
+    u = int.from_bytes(h[:8], "big") / 2 ** 64
+    acc = 0.0
+    for name, ratio in zip(SPLITS, ratios):
+        acc += ratio
+        if u < acc:
+            return name
+    return SPLITS[-1]
+
+
+def _csv_set(value: str | None) -> set[str] | None:
+    if value is None:
+        return None
+    items = {v.strip() for v in value.split(",")}
+    # "none" / "0" / "" name the zero initial
+    return {"" if v.lower() in ("none", "0") else v for v in items}
+
+
+def query(
+    entries: dict[str, dict],
+    initials: set[str] | None = None,
+    finals: set[str] | None = None,
+    tones: set[int] | None = None,
+    min_duration: float | None = None,
+    max_duration: float | None = None,
+    split: str | None = None,
+    split_ratios: tuple[float, ...] = DEFAULT_SPLIT_RATIOS,
+    sample: int | None = None,
+    seed: int = 0,
+) -> dict[str, dict]:
+    """Filter entries; sample draws up to sample clips split evenly across the tones present."""
+    selected = {}
+    for name, e in entries.items():
+        if not e["tone"]:
+            continue
+        if initials is not None and e["initial"] not in initials:
+            continue
+        if finals is not None and e["final"] not in finals:
+            continue
+        if tones is not None and e["tone"] not in tones:
+            continue
+        dur = e.get("duration_s")
+        if min_duration is not None and (dur is None or dur < min_duration):
+            continue
+        if max_duration is not None and (dur is None or dur > max_duration):
+            continue
+        if split is not None and _split_of(e["pinyin"], seed, split_ratios) != split:
+            continue
+        selected[name] = e
+    if sample is not None and sample < len(selected):
+        rng = random.Random(seed)
+        by_tone: dict[int, list[str]] = {}
+        for name in sorted(selected):
+            by_tone.setdefault(selected[name]["tone"], []).append(name)
+        per_tone, extra = divmod(sample, len(by_tone))
+        picked: list[str] = []
+        leftovers: list[str] = []
+        for i, tone in enumerate(sorted(by_tone)):
+            names = by_tone[tone]
+            rng.shuffle(names)
+            k = per_tone + (1 if i < extra else 0)
+            picked.extend(names[:k])
+            leftovers.extend(names[k:])
+        if len(picked) < sample:  # a tone had too few clips; fill from the rest
+            rng.shuffle(leftovers)
+            picked.extend(leftovers[: sample - len(picked)])
+        selected = {name: selected[name] for name in sorted(picked)}
+    return selected
+
+
+def to_manifest(entries: dict[str, dict]) -> dict[str, int]:
+    """run_tone_eval manifest {filename: tone} for tones 1-4 (neutral tone 5 is skipped)."""
+    return {name: e["tone"] for name, e in entries.items() if 1 <= e["tone"] <= 4}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Index a cmn-<pinyin><tone> syllable corpus and write manifests.")
+    parser.add_argument("corpus", type=Path, help="Corpus directory (e.g. audio-cmn/64k/syllabs)")
+    parser.add_argument("--index", type=Path, default=None, help=f"Index JSON path (default: <corpus>/{INDEX_NAME})")
+    parser.add_argument("--initial", type=str, default=None, help="Comma-separated initials; 'none' = zero initial")
+    parser.add_argument("--final", type=str, default=None, help="Comma-separated finals (e.g. ai,ang,ü)")
+    parser.add_argument("--tone", type=str, default=None, help="Comma-separated tones (e.g. 3 or 2,3)")
+    parser.add_argument("--min-duration", type=float, default=None, help="Minimum clip duration in seconds")
+    parser.add_argument("--max-duration", type=float, default=None, help="Maximum clip duration in seconds")
+    parser.add_argument("--split", choices=SPLITS, default=None, help="Keep only this deterministic split")
+    parser.add_argument("--split-ratios", type=str, default="0.8,0.1,0.1", help="train,dev,test ratios (default: 0.8,0.1,0.1)")
+    parser.add_argument("--sample", type=int, default=None, help="Draw this many clips, stratified by tone")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --sample and --split (default: 0)")
+    parser.add_argument("--manifest-out", type=Path, default=None, help="Write the selection as a run_tone_eval manifest")
+    parser.add_argument("--workers", type=int, default=8, help="Threads for hashing / probing changed files")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "index_corpus")
+
+    corpus = args.corpus if args.corpus.is_absolute() else _ROOT / args.corpus
+    if not corpus.is_dir():
+        print(f"Not a directory: {corpus}", file=sys.stderr)
+        return 1
+    index_path = args.index or corpus / INDEX_NAME
+    index_path = index_path if index_path.is_absolute() else _ROOT / index_path
+    index, counts = update_index(corpus, index_path, args.workers)
+    entries = index["entries"]
+    print(
+        f"Index {index_path}: {len(entries)} files "
+        f"({counts['added']} added, {counts['changed']} changed, {counts['removed']} removed, {counts['unchanged']} unchanged)"
+    )
+
+    ratios = tuple(float(x) for x in args.split_ratios.split(","))
+    tones = {int(t) for t in args.tone.split(",")} if args.tone else None
+    selected = query(
+        entries,
+        initials=_csv_set(args.initial),
+        finals=_csv_set(args.final),
+        tones=tones,
+        min_duration=args.min_duration,
+        max_duration=args.max_duration,
+        split=args.split,
+        split_ratios=ratios,
+        sample=args.sample,
+        seed=args.seed,
+    )
+    per_tone = {t: sum(1 for e in selected.values() if e["tone"] == t) for t in range(1, 6)}
+    print(f"Selected {len(selected)} clips: " + ", ".join(f"T{t} {n}" for t, n in per_tone.items() if n))
+    if args.manifest_out is not None:
+        out = args.manifest_out if args.manifest_out.is_absolute() else _ROOT / args.manifest_out
+        out.parent.mkdir(parents=True, exist_ok=True)
+        manifest = to_manifest(selected)
+        out.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Manifest ({len(manifest)} clips): {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,10 @@
 """
 List all models from selected providers (OpenAI, Anthropic, Mistral, Google Gemini)
-that support audio input, using LiteLLM's supports_audio_input().
+that support audio input.
 
-Uses a hardcoded candidate list; the installed LiteLLM version may be behind the
-canonical list. For an up-to-date list from LiteLLM's GitHub, run instead:
+Uses a hardcoded candidate list, answered from the cached capability index
+(scripts/model_index.py); candidates missing from the index are checked with LiteLLM's
+supports_audio_input() in parallel. For the full up-to-date list from LiteLLM's GitHub, run:
   python scripts/fetch_audio_models_from_litellm.py
 
 Loads API keys from .env. Expected env vars: OPENAI_API_KEY, CLAUDE_KEY (→ ANTHROPIC_API_KEY),
@@ -12,6 +13,7 @@ MISTRAL_API_KEY, GEMINI_API_KEY.
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Load .env before importing litellm so keys are available
@@ -31,8 +33,11 @@ if os.environ.get("GEMINI_API_KEY") and not os.environ.get("GOOGLE_API_KEY"):
 
 import litellm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import model_index
+
 # Provider display names and candidate model IDs (from LiteLLM docs / model_prices_and_context_window)
-# We check each with supports_audio_input(); only those that return True are listed.
+# Each is looked up in the capability index; only those that support audio input are listed.
 PROVIDER_CANDIDATES = {
     "OpenAI": [
         "gpt-4o-audio-preview",
@@ -102,18 +107,29 @@ PROVIDER_PREFIX = {
 }
 
 
+def _litellm_supports_audio(model_str: str) -> bool:
+    try:
+        return bool(litellm.supports_audio_input(model=model_str))
+    except Exception:
+        return False
+
+
 def main() -> None:
-    print("Models that support audio input (litellm.supports_audio_input):\n")
-    for provider, candidates in PROVIDER_CANDIDATES.items():
-        prefix = PROVIDER_PREFIX.get(provider, "")
+    print("Models that support audio input (capability index, then litellm.supports_audio_input):\n")
+    index = model_index.load_index()
+    candidates = {
+        provider: [f"{PROVIDER_PREFIX.get(provider, '')}{model_id}" for model_id in ids]
+        for provider, ids in PROVIDER_CANDIDATES.items()
+    }
+    unknown = [m for ids in candidates.values() for m in ids if model_index.lookup(index, m) is None]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        fallback = dict(zip(unknown, pool.map(_litellm_supports_audio, unknown)))
+    for provider, model_strs in candidates.items():
         supported = []
-        for model_id in candidates:
-            model_str = f"{prefix}{model_id}" if prefix else model_id
-            try:
-                if litellm.supports_audio_input(model=model_str):
-                    supported.append(model_str)
-            except Exception:
-                pass
+        for model_str in model_strs:
+            record = model_index.lookup(index, model_str)
+            if (record["audio_input"] if record else fallback[model_str]):
+                supported.append(model_str)
         print(f"  {provider}")
         if supported:
             for m in sorted(supported):
@@ -0,0 +1,169 @@
+"""
+Fast local tone scoring from the F0 contour (no API calls).
+
+extract_f0 tracks pitch with a frame-wise autocorrelation, vectorized over all frames.
+contour_vector turns the voiced part into a fixed-length, speaker-normalized curve
+(semitones around the clip's median F0). classify_contour compares that curve with
+the ideal synthetic contours from generate_tones (f0_t1 .. f0_t4) and returns the
+closest tone with a softmax confidence.
+
+Usage:
+  python scripts/local_tone.py synthetic_tones/tone3.wav audio-cmn/64k/syllabs/cmn-cai4.mp3
+  python scripts/local_tone.py results/syllabs.pack     # every clip of a packed corpus
+"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import generate_tones
+
+F0_MIN = 70.0  # Hz
+F0_MAX = 400.0  # Hz
+FRAME_MS = 40
+HOP_MS = 10
+VOICING_THRESHOLD = 0.5  # normalized autocorrelation peak
+SILENCE_RATIO = 0.01  # frames below this fraction of the loudest frame's energy are unvoiced
+N_POINTS = 20  # length of the time-normalized contour
+TEMPERATURE = 0.3  # semitones; softmax scale for template RMS distances
+
+
+def load_audio(path: Path) -> tuple[np.ndarray, int]:
+    """Return (mono float32 samples in [-1, 1], sample_rate). WAV via scipy, anything else via librosa."""
+    path = Path(path)
+    if path.suffix.lower() == ".wav":
+        from scipy.io import wavfile
+        sr, data = wavfile.read(str(path))
+        return pcm_to_float(data), int(sr)
+    import librosa
+    samples, sr = librosa.load(str(path), sr=None, mono=True)
+    return samples.astype(np.float32, copy=False), int(sr)
+
+
+def load_audio_bytes(data, fmt: str) -> tuple[np.ndarray, int]:
+    """Like load_audio, for encoded bytes (or a memoryview) already in memory."""
+    if fmt == "wav":
+        from scipy.io import wavfile
+        sr, samples = wavfile.read(io.BytesIO(data))
+        return pcm_to_float(samples), int(sr)
+    import soundfile
+    samples, sr = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=False)
+    return pcm_to_float(samples), int(sr)
+
+
+def pcm_to_float(data: np.ndarray) -> np.ndarray:
+    """Integer or float PCM (any channel count) -> mono float32 in [-1, 1]."""
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    if np.issubdtype(data.dtype, np.integer):
+        scale = float(np.iinfo(data.dtype).max)
+        return (data / scale).astype(np.float32)
+    return data.astype(np.float32, copy=False)
+
+
+def extract_f0(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """F0 per hop (Hz); NaN where unvoiced or silent."""
+    frame = int(sample_rate * FRAME_MS / 1000)
+    hop = max(1, int(sample_rate * HOP_MS / 1000))
+    x = np.asarray(samples, dtype=np.float64)
+    if len(x) < frame:
+        x = np.pad(x, (0, frame - len(x)))
+    frames = sliding_window_view(x, frame)[::hop]
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    n_fft = 1 << (2 * frame - 1).bit_length()
+    spec = np.fft.rfft(frames, n_fft, axis=1)
+    ac = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, n_fft, axis=1)[:, :frame]
+    energy = ac[:, 0]
+    lag_min = max(1, int(sample_rate / F0_MAX))
+    lag_max = min(int(sample_rate / F0_MIN), frame - 2)
+    norm = ac[:, lag_min:lag_max + 2] / np.maximum(energy, 1e-12)[:, None]
+    idx = np.argmax(norm[:, :-1], axis=1)
+    rows = np.arange(len(idx))
+    peak = norm[rows, idx]
+    # Parabolic interpolation around the peak for sub-sample lag precision
+    left = norm[rows, np.maximum(idx - 1, 0)]
+    right = norm[rows, idx + 1]
+    denom = left - 2 * peak + right
+    shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+    lag = lag_min + idx + np.clip(shift, -0.5, 0.5)
+    f0 = sample_rate / lag
+    voiced = (peak >= VOICING_THRESHOLD) & (energy >= SILENCE_RATIO * energy.max())
+    f0[~voiced] = np.nan
+    return f0
+
+
+def contour_vector(f0: np.ndarray, n_points: int = N_POINTS) -> np.ndarray | None:
+    """Time-normalized contour in semitones around its median; None if under 3 voiced frames."""
+    voiced = np.flatnonzero(~np.isnan(f0))
+    if len(voiced) < 3:
+        return None
+    seg = f0[voiced[0]:voiced[-1] + 1]
+    pos = np.arange(len(seg))
+    ok = ~np.isnan(seg)
+    seg = np.interp(pos, pos[ok], seg[ok])  # fill unvoiced gaps inside the syllable
+    semitones = 12 * np.log2(seg / np.median(seg))
+    grid = np.linspace(0, len(seg) - 1, n_points)
+    vec = np.interp(grid, pos, semitones)
+    return vec - vec.mean()
+
+
+def template_contours(n_points: int = N_POINTS) -> np.ndarray:
+    """(4, n_points) ideal contours from generate_tones, normalized like contour_vector."""
+    t = generate_tones._time_axis(generate_tones.DURATION_MS, generate_tones.SAMPLE_RATE)
+    grid = np.linspace(0, len(t) - 1, n_points)
+    out = []
+    for f0_fn in (generate_tones.f0_t1, generate_tones.f0_t2, generate_tones.f0_t3, generate_tones.f0_t4):
+        st = 12 * np.log2(f0_fn(t) / np.median(f0_fn(t)))
+        vec = np.interp(grid, np.arange(len(t)), st)
+        out.append(vec - vec.mean())
+    return np.array(out)
+
+
+_TEMPLATES = template_contours()
+
+
+def classify_contour(vec: np.ndarray | None) -> tuple[int, float]:
+    """(tone 1-4, confidence in [0, 1]); (0, 0.0) when there is no usable contour."""
+    if vec is None:
+        return 0, 0.0
+    templates = _TEMPLATES if len(vec) == _TEMPLATES.shape[1] else template_contours(len(vec))
+    rms = np.sqrt(((templates - vec) ** 2).mean(axis=1))
+    logits = -rms / TEMPERATURE
+    probs = np.exp(logits - logits.max())
+    probs /= probs.sum()
+    best = int(np.argmax(probs))
+    return best + 1, float(probs[best])
+
+
+def classify_samples(samples: np.ndarray, sample_rate: int) -> tuple[int, float]:
+    return classify_contour(contour_vector(extract_f0(samples, sample_rate)))
+
+
+def classify_file(path: Path) -> tuple[int, float]:
+    samples, sr = load_audio(path)
+    return classify_samples(samples, sr)
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        return 1
+    for arg in sys.argv[1:]:
+        if arg.endswith(".pack"):
+            from packed_corpus import PackedCorpus
+            with PackedCorpus(Path(arg)) as pack:
+                for name in pack.names():
+                    tone, conf = classify_samples(*pack.pcm(name))
+                    print(f"{name}: tone {tone or '?'} (confidence {conf:.2f})")
+            continue
+        tone, conf = classify_file(Path(arg))
+        print(f"{arg}: tone {tone or '?'} (confidence {conf:.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
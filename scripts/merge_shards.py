@@ -0,0 +1,141 @@
+"""
+Merge the outputs of a sharded run_tone_eval.py run (--shard i/N) into one results CSV.
+
+Rows are deduplicated by (model, audio_file, run_id), plus prompt_id and sample_idx when
+those columns exist; when a key occurs more than once the row from the later input wins, so
+a re-run CSV listed last replaces earlier answers. The <csv>.shard.json sidecars written by
+each shard list its planned cells; the merge fails unless all N shards of the plan are
+present and every planned cell has a row. Output rows are sorted, so the merged file does
+not depend on shard completion order.
+
+Usage:
+  python scripts/merge_shards.py results/tone_eval_syllabs_index_shard*of4.csv
+  python scripts/merge_shards.py results/run_shard*of8.csv results/run_retry.csv --output results/run.csv
+  python scripts/merge_shards.py ... --allow-incomplete     # write what exists, report the gaps
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sharding import sidecar_path
+
+_ROOT = Path(__file__).resolve().parent.parent
+KEY_COLUMNS = ("run_id", "model", "audio_file", "prompt_id", "sample_idx")
+_SHARD_SUFFIX = re.compile(r"_shard\d+of\d+$")
+
+
+def row_key(row: dict) -> tuple[str, ...]:
+    return tuple(row.get(c) or "" for c in KEY_COLUMNS)
+
+
+def _sort_key(key: tuple[str, ...]) -> tuple:
+    *head, sample_idx = key
+    return (*head, int(sample_idx) if sample_idx.isdigit() else -1)
+
+
+def load_sidecars(paths: list[Path]) -> list[dict]:
+    """Shard plans of the inputs, one per shard index."""
+    sidecars: dict[int, dict] = {}
+    for path in paths:
+        side = sidecar_path(path)
+        if side.exists():
+            plan = json.loads(side.read_text(encoding="utf-8"))
+            sidecars[plan["shard"]] = plan
+    return [sidecars[i] for i in sorted(sidecars)]
+
+
+def merge_rows(paths: list[Path]) -> tuple[list[str], dict[tuple[str, ...], dict], int]:
+    """(fieldnames, {key: row}, duplicate count); later files win on duplicate keys."""
+    fieldnames: list[str] = []
+    merged: dict[tuple[str, ...], dict] = {}
+    duplicates = 0
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames.extend(c for c in reader.fieldnames or [] if c not in fieldnames)
+            for row in reader:
+                key = row_key(row)
+                duplicates += key in merged
+                merged[key] = row
+    return fieldnames, merged, duplicates
+
+
+def missing_cells(sidecars: list[dict], merged: dict[tuple[str, ...], dict]) -> tuple[list[int], list[tuple]]:
+    """(missing shard indices, planned (run_id, model, audio_file, sample_idx) without a row)."""
+    if not sidecars:
+        return [], []
+    n_shards = sidecars[0]["n_shards"]
+    seen = {s["shard"] for s in sidecars}
+    present = {(k[0], k[1], k[2], k[4]) for k in merged}
+    missing = []
+    for s in sidecars:
+        sample_ids = [str(i) for i in range(s["samples"])] if s["samples"] > 1 else [""]
+        for model, filename in s["cells"]:
+            for sample_idx in sample_ids:
+                if (s["run_id"], model, filename, sample_idx) not in present:
+                    missing.append((s["run_id"], model, filename, sample_idx))
+    return [i for i in range(n_shards) if i not in seen], missing
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Merge and check sharded run_tone_eval outputs.")
+    parser.add_argument("csvs", nargs="+", type=Path, help="Shard CSVs (and any re-run CSVs, last wins)")
+    parser.add_argument("--output", type=Path, default=None, help="Merged CSV (default: first input without _shard<i>of<N>)")
+    parser.add_argument("--allow-incomplete", action="store_true", help="Write the merged CSV even if cells or shards are missing")
+    args = parser.parse_args()
+
+    # A loose glob (run_shard*) also matches the .shard.json sidecars; they are not inputs
+    paths = [p if p.is_absolute() else _ROOT / p for p in args.csvs if p.suffix != ".json"]
+    for p in paths:
+        if not p.exists():
+            print(f"Error: file not found: {p}", file=sys.stderr)
+            return 1
+    sidecars = load_sidecars(paths)
+    plans = {s["plan_id"] for s in sidecars}
+    if len(plans) > 1:
+        print(f"Error: inputs come from different plans ({', '.join(sorted(plans))})", file=sys.stderr)
+        return 1
+    if len({s["n_shards"] for s in sidecars}) > 1:
+        print("Error: inputs disagree on the number of shards", file=sys.stderr)
+        return 1
+
+    fieldnames, merged, duplicates = merge_rows(paths)
+    missing_shards, missing = missing_cells(sidecars, merged)
+    empty = sum(1 for r in merged.values() if not (r.get("predicted_tone") or "").strip())
+    n_shards = sidecars[0]["n_shards"] if sidecars else 0
+    print(
+        f"{len(paths)} inputs, {len(sidecars)} of {n_shards} shard plans; {len(merged)} rows "
+        f"({duplicates} duplicates replaced, {empty} without a predicted tone)"
+    )
+    if missing_shards:
+        print(f"Missing shards: {', '.join(f'{i}/{n_shards}' for i in missing_shards)}")
+    if missing:
+        print(f"Missing {len(missing)} planned cells, e.g.:")
+        for run_id, model, filename, sample_idx in missing[:20]:
+            print(f"  {model} / {filename}" + (f" sample {sample_idx}" if sample_idx else "") + f" (run {run_id})")
+    incomplete = bool(missing_shards or missing)
+    if incomplete and not args.allow_incomplete:
+        print("Not writing an incomplete merge; re-run the missing shards or pass --allow-incomplete.", file=sys.stderr)
+        return 1
+
+    out = args.output
+    if out is None:
+        stem = paths[0].stem
+        out = paths[0].with_name(f"{_SHARD_SUFFIX.sub('', stem)}.csv" if _SHARD_SUFFIX.search(stem) else f"{stem}_merged.csv")
+    out = out if out.is_absolute() else _ROOT / out
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w.writeheader()
+        w.writerows(merged[k] for k in sorted(merged, key=_sort_key))
+    print(f"Wrote {len(merged)} rows to {out}" + (" (incomplete)" if incomplete else ""))
+    return 1 if incomplete else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""
+Local stand-in for the OpenAI and Gemini chat endpoints, for benchmarks and offline runs.
+
+Answers OpenAI-style POST .../chat/completions and Gemini-style POST
+.../models/<model>:generateContent with a fixed well-formed tone answer. Added delays model a
+remote provider: --latency-ms per request (model time), --connect-latency-ms once per new
+connection (the round trips of a TCP connect and TLS handshake), so connection reuse shows up
+in the timings, --bandwidth-mbps for request bodies (upload time), --token-latency-ms per
+reply token and --audio-latency-ms for OpenAI requests that ask for a spoken reply
+(modalities with "audio"; the reply then carries a silent WAV and the text as its transcript,
+like gpt-audio). Gemini requests for audio output are rejected with 400 as Gemini chat models do. Streamed replies (stream=true, :streamGenerateContent) are sent token by token as
+server-sent events; a blocking reply waits for all tokens. HTTP/1.1 keep-alive is supported;
+connections, requests, request body bytes and streamed tokens (and streams the client hung
+up on) are counted.
+
+The Gemini Files API is stood in for too: resumable uploads to /upload/v1beta/files, GET
+/v1beta/files/<id>, and generateContent parts that reference a file URI (rejected with 403,
+as Gemini does, when the file is unknown or older than --file-ttl-s).
+
+Usage:
+  python scripts/mock_provider.py --port 8765 --latency-ms 50 --connect-latency-ms 120
+  OPENAI_API_KEY=x OPENAI_BASE_URL=http://127.0.0.1:8765/v1 \\
+  GEMINI_API_KEY=x GEMINI_API_BASE=http://127.0.0.1:8765/v1beta \\
+    python scripts/run_tone_eval.py --models openai/gpt-4o-audio-preview,gemini/gemini-2.5-pro
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+import wave
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_ANSWER = "1) ma3\n2) 3"
+FILES_URI_PREFIX = "https://generativelanguage.googleapis.com/v1beta/files/"
+_TOKEN = re.compile(r"\s*\w+|\s*[^\w\s]|\s+")  # rough word / punctuation tokens for streaming
+DEFAULT_FILE_TTL_S = 48 * 3600.0
+SPEECH_S_PER_CHAR = 0.06  # length of the spoken reply per answer character
+SPEECH_RATE = 24000
+
+
+def speech_wav(text: str) -> bytes:
+    """Silent 16-bit mono WAV as long as text would take to say."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SPEECH_RATE)
+        w.writeframes(bytes(2 * int(len(text) * SPEECH_S_PER_CHAR * SPEECH_RATE)))
+    return buf.getvalue()
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    """Threaded server on 127.0.0.1; use as a context manager to run it in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_s: float = 0.0,
+        connect_latency_s: float = 0.0,
+        answer: str = DEFAULT_ANSWER,
+        bandwidth_bps: float = 0.0,
+        file_ttl_s: float = DEFAULT_FILE_TTL_S,
+        token_latency_s: float = 0.0,
+        audio_latency_s: float = 0.0,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency_s = latency_s
+        self.connect_latency_s = connect_latency_s
+        self.answer = answer
+        self.bandwidth_bps = bandwidth_bps
+        self.file_ttl_s = file_ttl_s
+        self.token_latency_s = token_latency_s
+        self.audio_latency_s = audio_latency_s
+        self.connections = 0
+        self.requests = 0
+        self.bytes_received = 0
+        self.uploads = 0
+        self.tokens_streamed = 0
+        self.streams_cancelled = 0
+        self.audio_replies = 0
+        self.files: dict[str, dict] = {}  # id -> file resource (+ "expires_at")
+        self._pending: dict[str, dict] = {}  # upload id -> started upload
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, connection: bool = False, body_bytes: int = 0) -> None:
+        with self._lock:
+            if connection:
+                self.connections += 1
+            else:
+                self.requests += 1
+                self.bytes_received += body_bytes
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.connections = self.requests = self.bytes_received = self.uploads = 0
+            self.tokens_streamed = self.streams_cancelled = self.audio_replies = 0
+
+    def count_audio_reply(self) -> None:
+        with self._lock:
+            self.audio_replies += 1
+
+    def count_stream(self, tokens: int, cancelled: bool) -> None:
+        with self._lock:
+            self.tokens_streamed += tokens
+            self.streams_cancelled += cancelled
+
+    def expire_files(self) -> None:
+        """Forget every uploaded file (as if their 48 h had passed)."""
+        with self._lock:
+            self.files.clear()
+
+    def start_upload(self, mime_type: str, size: int, display_name: str) -> str:
+        with self._lock:
+            upload_id = str(next(self._ids))
+            self._pending[upload_id] = {"mimeType": mime_type, "sizeBytes": str(size), "displayName": display_name}
+        return upload_id
+
+    def finish_upload(self, upload_id: str, data: bytes) -> dict | None:
+        with self._lock:
+            info = self._pending.pop(upload_id, None)
+            if info is None:
+                return None
+            file_id = f"mock{next(self._ids)}"
+            expires_at = time.time() + self.file_ttl_s
+            info.update(
+                name=f"files/{file_id}",
+                uri=FILES_URI_PREFIX + file_id,
+                sizeBytes=str(len(data)),
+                sha256Hash=hashlib.sha256(data).hexdigest(),
+                state="ACTIVE",
+                expirationTime=datetime.fromtimestamp(expires_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            )
+            self.files[file_id] = {**info, "expires_at": expires_at}
+            self.uploads += 1
+            return info
+
+    def file(self, file_id: str) -> dict | None:
+        with self._lock:
+            info = self.files.get(file_id)
+            if info is None or info["expires_at"] <= time.time():
+                self.files.pop(file_id, None)
+                return None
+            return {k: v for k, v in info.items() if k != "expires_at"}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:  # client closed a kept-alive connection (e.g. a cancelled stream)
+            pass
+
+    def setup(self):
+        super().setup()
+        self.server.count(connection=True)
+        if self.server.connect_latency_s:
+            time.sleep(self.server.connect_latency_s)
+
+    def _send_json(self, obj: dict, status: int = 200, headers: dict | None = None) -> None:
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, events) -> None:
+        """Send server-sent events (chunked), token_latency_s apart; stop when the client hangs up."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        try:
+            for i, event in enumerate(events):
+                if i and self.server.token_latency_s:
+                    time.sleep(self.server.token_latency_s)
+                data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                sent += 1
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            self.server.count_stream(sent, cancelled=True)
+            return
+        self.server.count_stream(sent, cancelled=False)
+
+    def _speak(self, answer: str) -> dict:
+        """message.audio of a spoken reply, after the synthesis delay."""
+        self.server.count_audio_reply()
+        if self.server.audio_latency_s:
+            time.sleep(self.server.audio_latency_s)
+        return {
+            "id": "audio_mock",
+            "data": base64.b64encode(speech_wav(answer)).decode(),
+            "expires_at": int(time.time()) + 3600,
+            "transcript": answer,
+        }
+
+    def _file_error(self, file_id: str) -> None:
+        self._send_json({"error": {
+            "code": 403,
+            "message": f"You do not have permission to access the File {file_id} or it may not exist.",
+            "status": "PERMISSION_DENIED",
+        }}, status=403)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.count()
+        if path.startswith("/v1beta/files/"):
+            info = self.server.file(path.rsplit("/", 1)[-1])
+            if info is None:
+                self._file_error(path.rsplit("/", 1)[-1])
+            else:
+                self._send_json(info)
+            return
+        self.send_error(404)
+
+    def _upload(self, raw: bytes) -> None:
+        query = parse_qs(urlsplit(self.path).query)
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        if command == "start":
+            meta = json.loads(raw or b"{}").get("file", {})
+            upload_id = self.server.start_upload(
+                self.headers.get("X-Goog-Upload-Header-Content-Type", "application/octet-stream"),
+                int(self.headers.get("X-Goog-Upload-Header-Content-Length") or 0),
+                meta.get("display_name") or meta.get("displayName", ""),
+            )
+            url = f"{self.server.url}/upload/v1beta/files?upload_id={upload_id}"
+            self._send_json({}, headers={"X-Goog-Upload-URL": url, "X-Goog-Upload-Status": "active"})
+            return
+        info = self.server.finish_upload(query.get("upload_id", [""])[0], raw) if "finalize" in command else None
+        if info is None:
+            self._send_json({"error": {"code": 400, "message": "Bad upload", "status": "INVALID_ARGUMENT"}}, status=400)
+            return
+        self._send_json({"file": info}, headers={"X-Goog-Upload-Status": "final"})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.count(body_bytes=len(raw))
+        if self.server.bandwidth_bps:
+            time.sleep(len(raw) * 8 / self.server.bandwidth_bps)
+        if self.path.startswith("/upload/v1beta/files"):
+            self._upload(raw)
+            return
+        body = json.loads(raw or b"{}")
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+        answer = self.server.answer
+        if ":generateContent" in self.path or ":streamGenerateContent" in self.path:
+            for content in body.get("contents", []):
+                for part in content.get("parts", []):
+                    ref = part.get("file_data") or part.get("fileData")
+                    uri = ref and (ref.get("file_uri") or ref.get("fileUri") or "")
+                    if uri and (not uri.startswith(FILES_URI_PREFIX) or self.server.file(uri[len(FILES_URI_PREFIX):]) is None):
+                        self._file_error(uri.rsplit("/", 1)[-1])
+                        return
+            model = self.path.rsplit("/", 1)[-1].split(":", 1)[0]
+            config = body.get("generationConfig") or body.get("generation_config") or {}
+            if "AUDIO" in [m.upper() for m in config.get("responseModalities") or config.get("response_modalities") or []]:
+                self._send_json({"error": {"code": 400, "message": "This model only supports text output.", "status": "INVALID_ARGUMENT"}}, status=400)
+                return
+            if ":streamGenerateContent" in self.path:
+                tokens = _TOKEN.findall(answer)
+                self._stream(
+                    {
+                        "candidates": [{
+                            "content": {"role": "model", "parts": [{"text": tok}]},
+                            "index": 0,
+                            **({"finishReason": "STOP"} if i == len(tokens) - 1 else {}),
+                        }],
+                        "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": i + 1, "totalTokenCount": 101 + i},
+                        "modelVersion": model,
+                    }
+                    for i, tok in enumerate(tokens)
+                )
+                return
+            reply = {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": answer}]}, "finishReason": "STOP", "index": 0}],
+                "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 8, "totalTokenCount": 108},
+                "modelVersion": model,
+            }
+        elif self.path.endswith("/chat/completions") and body.get("stream"):
+            base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "mock")}
+            tokens = _TOKEN.findall(answer)
+            if "audio" in (body.get("modalities") or []):
+                # Spoken replies stream the transcript alongside the audio
+                self._speak(answer)
+                deltas = [{"role": "assistant", "audio": {"id": "audio_mock", "transcript": tok}} for tok in tokens]
+            else:
+                deltas = [{"role": "assistant", "content": tok} for tok in tokens]
+            events = [{**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]} for delta in deltas]
+            events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self._stream(events + ["[DONE]"])
+            return
+        elif self.path.endswith("/chat/completions"):
+            if "audio" in (body.get("modalities") or []):
+                message = {"role": "assistant", "content": None, "audio": self._speak(answer)}
+            else:
+                message = {"role": "assistant", "content": answer}
+            choices = [{"index": i, "message": message, "finish_reason": "stop"} for i in range(int(body.get("n") or 1))]
+            reply = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": choices,
+                "usage": {"prompt_tokens": 100, "completion_tokens": 8, "total_tokens": 108},
+            }
+        else:
+            self.send_error(404)
+            return
+        if self.server.token_latency_s:
+            # A blocking reply arrives once every token is generated
+            time.sleep(self.server.token_latency_s * (len(_TOKEN.findall(answer)) - 1))
+        self._send_json(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve mock OpenAI / Gemini chat endpoints on 127.0.0.1.")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added delay per request (default: 0)")
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0, help="Added delay per new connection (default: 0)")
+    parser.add_argument("--answer", type=str, default=DEFAULT_ANSWER, help="Reply text of every completion")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="Simulated upload bandwidth for request bodies (default: unlimited)")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="Generation delay per reply token, streamed or not (default: 0)")
+    parser.add_argument("--audio-latency-ms", type=float, default=0.0, help="Speech synthesis delay for replies with audio output (default: 0)")
+    parser.add_argument("--file-ttl-s", type=float, default=DEFAULT_FILE_TTL_S, help="Lifetime of uploaded files (default: 48 h)")
+    args = parser.parse_args()
+    server = MockProviderServer(
+        args.port, args.latency_ms / 1000, args.connect_latency_ms / 1000, args.answer,
+        args.bandwidth_mbps * 1e6, args.file_ttl_s, args.token_latency_ms / 1000, args.audio_latency_ms / 1000,
+    )
+    print(f"Serving on {server.url} (OpenAI base {server.url}/v1, Gemini base {server.url}/v1beta); Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.requests} requests ({server.bytes_received} body bytes, {server.uploads} file uploads) over {server.connections} connections")
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
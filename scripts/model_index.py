@@ -0,0 +1,216 @@
+"""
+Persisted model capability index built from LiteLLM's model_prices_and_context_window.json.
+
+The raw JSON is cached in results/cache/ and refreshed at most every MAX_AGE_HOURS with a
+conditional GET (ETag / Last-Modified), so unchanged upstream data costs one 304. Without
+network the cached copy is used, and without a cache the bundled
+scripts/model_capabilities_fallback.json. Each model is recorded under both its LiteLLM id
+("openai/gpt-audio") and the bare key ("gpt-audio"), so lookups are a single dict get.
+
+Record fields: provider, mode, audio_input, audio_output, output_modalities,
+structured_output, native_streaming, max_output_tokens and per-token prices
+(input_cost_per_token, output_cost_per_token, input_cost_per_audio_token,
+output_cost_per_audio_token; None when unknown).
+
+Usage:
+  python scripts/model_index.py gemini/gemini-2.5-pro openai/gpt-audio-2025-08-28
+  python scripts/model_index.py --audio-only --refresh
+  python scripts/model_index.py --offline --write-fallback   # regenerate the bundled fallback
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+_ROOT = Path(__file__).resolve().parent.parent
+URL = "https://raw.githubusercontent.com/BerriAI/litellm/main/model_prices_and_context_window.json"
+CACHE_DIR = _ROOT / "results" / "cache"
+RAW_CACHE = CACHE_DIR / "litellm_models.json"
+META_CACHE = CACHE_DIR / "litellm_models.meta.json"
+INDEX_CACHE = CACHE_DIR / "model_index.json"
+FALLBACK_PATH = Path(__file__).resolve().parent / "model_capabilities_fallback.json"
+MAX_AGE_HOURS = 24.0
+
+PRICE_FIELDS = (
+    "input_cost_per_token",
+    "output_cost_per_token",
+    "input_cost_per_audio_token",
+    "output_cost_per_audio_token",
+)
+
+
+def model_id_for_litellm(key: str, provider: str) -> str:
+    """Return the model string to pass to litellm.completion()."""
+    if "/" in key:
+        return key
+    return f"{provider}/{key}"
+
+
+def make_record(entry: dict) -> dict:
+    modalities = entry.get("supported_output_modalities") or ["text"]
+    record = {
+        "provider": entry.get("litellm_provider") or "",
+        "mode": entry.get("mode") or "",
+        "audio_input": bool(entry.get("supports_audio_input")),
+        "audio_output": bool(entry.get("supports_audio_output")) or "audio" in modalities,
+        "output_modalities": list(modalities),
+        "structured_output": bool(entry.get("supports_response_schema")),
+        "native_streaming": bool(entry.get("supports_native_streaming", True)),
+        "max_output_tokens": entry.get("max_output_tokens"),
+    }
+    for field in PRICE_FIELDS:
+        record[field] = entry.get(field)
+    return record
+
+
+def build_index(raw: dict) -> dict[str, dict]:
+    """{model key: record} with both the LiteLLM id and the bare key for each model."""
+    index: dict[str, dict] = {}
+    for key, entry in raw.items():
+        if key == "sample_spec" or not isinstance(entry, dict):
+            continue
+        record = make_record(entry)
+        model_id = model_id_for_litellm(key, record["provider"])
+        record["id"] = model_id
+        index[model_id] = record
+        index.setdefault(key, record)
+    return index
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def fetch_raw(refresh: bool = False, offline: bool = False, max_age_hours: float = MAX_AGE_HOURS) -> tuple[dict | None, str]:
+    """Return (raw LiteLLM JSON or None, source description), using and updating the cache."""
+    cached = RAW_CACHE.exists()
+    if offline:
+        return (_read_json(RAW_CACHE), f"cache {RAW_CACHE}") if cached else (None, "offline, no cache")
+    age_h = (time.time() - RAW_CACHE.stat().st_mtime) / 3600 if cached else None
+    if cached and not refresh and age_h < max_age_hours:
+        return _read_json(RAW_CACHE), f"cache ({age_h:.1f} h old)"
+    meta = (_read_json(META_CACHE) or {}) if cached else {}
+    req = Request(URL)
+    if meta.get("etag"):
+        req.add_header("If-None-Match", meta["etag"])
+    if meta.get("last_modified"):
+        req.add_header("If-Modified-Since", meta["last_modified"])
+    try:
+        with urlopen(req, timeout=30) as r:
+            body = r.read()
+            headers = r.headers
+    except HTTPError as e:
+        if e.code == 304 and cached:
+            RAW_CACHE.touch()
+            return _read_json(RAW_CACHE), "cache (not modified upstream)"
+        return (_read_json(RAW_CACHE), f"cache (HTTP {e.code})") if cached else (None, f"HTTP {e.code}")
+    except (URLError, OSError) as e:
+        return (_read_json(RAW_CACHE), f"cache (offline: {e})") if cached else (None, f"offline: {e}")
+    raw = json.loads(body.decode())
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    RAW_CACHE.write_bytes(body)
+    META_CACHE.write_text(json.dumps({
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+    }))
+    INDEX_CACHE.unlink(missing_ok=True)
+    return raw, f"downloaded {URL}"
+
+
+def load_index(refresh: bool = False, offline: bool = False) -> dict[str, dict]:
+    """Capability index; the built index is cached and rebuilt only when the raw JSON changes."""
+    raw, _ = fetch_raw(refresh=refresh, offline=offline)
+    if raw is None:
+        return _read_json(FALLBACK_PATH) or {}
+    if INDEX_CACHE.exists() and INDEX_CACHE.stat().st_mtime >= RAW_CACHE.stat().st_mtime:
+        index = _read_json(INDEX_CACHE)
+        if index:
+            return index
+    index = build_index(raw)
+    INDEX_CACHE.write_text(json.dumps(index))
+    return index
+
+
+def lookup(index: dict[str, dict], model: str) -> dict | None:
+    return index.get(model)
+
+
+def validate_models(index: dict[str, dict], models: list[str]) -> tuple[list[str], list[str]]:
+    """(errors, warnings): errors for models known not to take audio input, warnings for unknown ones."""
+    errors, warnings = [], []
+    for m in models:
+        record = lookup(index, m)
+        if record is None:
+            warnings.append(f"{m}: not in the capability index")
+        elif not record["audio_input"]:
+            errors.append(f"{m}: does not support audio input")
+    return errors, warnings
+
+
+def estimate_cost(
+    index: dict[str, dict],
+    model: str,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    input_audio_tokens: int = 0,
+) -> float | None:
+    """USD for one call from per-token prices; None if the model or its prices are unknown."""
+    record = lookup(index, model)
+    if record is None or record["input_cost_per_token"] is None:
+        return None
+    audio_price = record["input_cost_per_audio_token"] or record["input_cost_per_token"]
+    return (
+        input_tokens * record["input_cost_per_token"]
+        + input_audio_tokens * audio_price
+        + output_tokens * (record["output_cost_per_token"] or 0.0)
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Show model capabilities from the cached LiteLLM index.")
+    parser.add_argument("models", nargs="*", help="Model ids to look up (default: all)")
+    parser.add_argument("--refresh", action="store_true", help="Revalidate the cache with upstream now")
+    parser.add_argument("--offline", action="store_true", help="Never touch the network")
+    parser.add_argument("--audio-only", action="store_true", help="Only list models with audio input")
+    parser.add_argument(
+        "--write-fallback",
+        action="store_true",
+        help=f"Write audio-input models from the current index to {FALLBACK_PATH.name}",
+    )
+    args = parser.parse_args()
+
+    index = load_index(refresh=args.refresh, offline=args.offline)
+    if not index:
+        print("No capability data available (no network, cache or fallback).", file=sys.stderr)
+        return 1
+    if args.write_fallback:
+        subset = {k: r for k, r in index.items() if r["audio_input"]}
+        FALLBACK_PATH.write_text(json.dumps(subset, indent=1, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Wrote {len(subset)} entries to {FALLBACK_PATH}")
+        return 0
+    names = args.models or sorted({r["id"] for r in index.values()})
+    for name in names:
+        record = lookup(index, name)
+        if record is None:
+            print(f"{name}: unknown")
+            continue
+        if args.audio_only and not record["audio_input"]:
+            continue
+        price = record["input_cost_per_token"]
+        print(
+            f"{record['id']}: audio_in={record['audio_input']} out={'+'.join(record['output_modalities'])} "
+            f"structured={record['structured_output']} in=${price if price is not None else '?'}/tok"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
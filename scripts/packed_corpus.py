@@ -0,0 +1,333 @@
+"""
+Packed corpus container: many clips in one data file plus a JSON index.
+
+<name>.pack holds the encoded clips (MP3/WAV bytes as on disk) and, optionally, decoded
+16-bit mono PCM; <name>.pack.index.json maps each clip name to its byte offsets, format,
+tone label, SHA-1 and any extra metadata. Readers memory-map the data file, so
+PackedCorpus.data(name) is a zero-copy memoryview slice and PackedCorpus.pcm_int16(name)
+a NumPy view onto the mapping. One open/mmap replaces an open/read/stat per clip.
+
+Usage:
+  python scripts/packed_corpus.py pack audio-cmn/64k/syllabs/index.json results/syllabs.pack --pcm
+  python scripts/packed_corpus.py pack synthetic_tones/manifest.json results/synthetic.pack --audio-dir synthetic_tones
+  python scripts/packed_corpus.py ls results/syllabs.pack
+  python scripts/packed_corpus.py extract results/syllabs.pack /tmp/out cmn-cai1.mp3
+Readers: run_tone_eval.py --pack, local_tone.py <file.pack>; writer: generate_tones.py --pack.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+
+_ROOT = Path(__file__).resolve().parent.parent
+PACK_VERSION = 1
+PCM_ALIGN = 16  # PCM blocks start on this byte boundary so np.frombuffer views are aligned
+
+
+def index_path_for(pack_path: Path) -> Path:
+    return pack_path.with_name(pack_path.name + ".index.json")
+
+
+class PackWriter:
+    """Append clips to a pack; the index is written atomically on close()."""
+
+    def __init__(self, pack_path: Path, append: bool = False):
+        self.path = Path(pack_path)
+        self.index_path = index_path_for(self.path)
+        self.entries: dict[str, dict] = {}
+        if append and self.path.exists() and self.index_path.exists():
+            self.entries = json.loads(self.index_path.read_text(encoding="utf-8"))["entries"]
+            self._f = open(self.path, "ab")
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = open(self.path, "wb")
+        self._pos = self._f.seek(0, 2)
+
+    def _write(self, data, align: int = 1) -> int:
+        pad = -self._pos % align
+        if pad:
+            self._f.write(b"\0" * pad)
+            self._pos += pad
+        offset = self._pos
+        self._f.write(data)
+        self._pos += len(memoryview(data).cast("B"))
+        return offset
+
+    def add(
+        self,
+        name: str,
+        data: bytes,
+        fmt: str,
+        tone: int = 0,
+        pcm: np.ndarray | None = None,
+        sample_rate: int | None = None,
+        **meta,
+    ) -> None:
+        """Store encoded bytes (and int16 mono PCM if given) under name; later adds replace earlier ones."""
+        entry = {
+            "offset": self._write(data),
+            "length": len(data),
+            "format": fmt,
+            "tone": tone,
+            "sha1": hashlib.sha1(data).hexdigest(),
+        }
+        if pcm is not None:
+            pcm16 = np.ascontiguousarray(pcm_to_int16(pcm))
+            entry["pcm"] = {
+                "offset": self._write(pcm16.data, PCM_ALIGN),
+                "samples": int(pcm16.shape[0]),
+                "dtype": "int16",
+                "sample_rate": int(sample_rate),
+            }
+        entry.update(meta)
+        self.entries[name] = entry
+
+    def close(self) -> None:
+        self._f.close()
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": PACK_VERSION, "entries": self.entries}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        tmp.replace(self.index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pcm_to_int16(samples: np.ndarray) -> np.ndarray:
+    """Mono int16 from int16 or float [-1, 1] samples (multi-channel is averaged)."""
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if samples.dtype == np.int16:
+        return samples
+    if np.issubdtype(samples.dtype, np.integer):
+        return (samples / np.iinfo(samples.dtype).max * 32767).astype(np.int16)
+    return (np.clip(samples, -1, 1) * 32767).astype(np.int16)
+
+
+class PackedCorpus:
+    """Memory-mapped reader for a pack written by PackWriter."""
+
+    def __init__(self, pack_path: Path):
+        self.path = Path(pack_path)
+        index = json.loads(index_path_for(self.path).read_text(encoding="utf-8"))
+        self.entries: dict[str, dict] = index["entries"]
+        self._file = open(self.path, "rb")
+        size = self.path.stat().st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mm) if self._mm is not None else memoryview(b"")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def names(self) -> list[str]:
+        return list(self.entries)
+
+    def entry(self, name: str) -> dict:
+        return self.entries[name]
+
+    def manifest(self) -> dict[str, int]:
+        """run_tone_eval manifest {name: tone} for tones 1-4."""
+        return {n: e["tone"] for n, e in self.entries.items() if 1 <= e.get("tone", 0) <= 4}
+
+    def data(self, name: str) -> memoryview:
+        """Encoded clip bytes as a zero-copy view into the mapping."""
+        e = self.entries[name]
+        return self._view[e["offset"]:e["offset"] + e["length"]]
+
+    def pcm(self, name: str) -> tuple[np.ndarray, int]:
+        """(float32 mono samples, sample_rate). Stored PCM is read through the mapping;
+        otherwise the encoded bytes are decoded."""
+        e = self.entries[name]
+        p = e.get("pcm")
+        if p is None:
+            import local_tone
+            return local_tone.load_audio_bytes(self.data(name), e["format"])
+        raw = np.frombuffer(self._mm, dtype=p["dtype"], count=p["samples"], offset=p["offset"])
+        return raw.astype(np.float32) / 32767, p["sample_rate"]
+
+    def pcm_int16(self, name: str) -> tuple[np.ndarray, int] | None:
+        """Stored int16 PCM as a read-only view (no copy); None if the pack has no PCM for name."""
+        p = self.entries[name].get("pcm")
+        if p is None:
+            return None
+        return np.frombuffer(self._mm, dtype=p["dtype"], count=p["samples"], offset=p["offset"]), p["sample_rate"]
+
+    def close(self) -> None:
+        try:
+            self._view.release()
+            if self._mm is not None:
+                self._mm.close()
+        except BufferError:
+            pass  # caller still holds views into the mapping; it is unmapped once they are freed
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_labels(manifest_path: Path) -> dict[str, int]:
+    """{filename: tone} from a manifest, or every entry of an index_corpus index (neutral tone included)."""
+    with open(manifest_path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data.get("entries"), dict):
+        return {name: e.get("tone", 0) for name, e in data["entries"].items()}
+    return data
+
+
+def corpus_clips(corpus: Path, audio_dir: Path | None = None) -> list[dict]:
+    """[{name, tone, speaker, stamp, source}] for tones 1-4 of a manifest, index or pack.
+
+    stamp identifies the clip's content for caches (SHA-1 when recorded, else size:mtime);
+    source is the clip name for a pack, else the file path (as map_clips takes them)."""
+    clips = []
+    if corpus.suffix == ".pack":
+        with PackedCorpus(corpus) as pack:
+            for name, e in pack.entries.items():
+                if 1 <= e.get("tone", 0) <= 4:
+                    clips.append({"name": name, "tone": e["tone"], "speaker": str(e.get("speaker", "")), "stamp": e["sha1"], "source": name})
+        return clips
+    data = json.loads(corpus.read_text(encoding="utf-8"))
+    entries = data.get("entries") if isinstance(data.get("entries"), dict) else {}
+    labels = load_labels(corpus)
+    root = audio_dir or (Path(data["root"]) if data.get("root") else corpus.parent)
+    for name, tone in labels.items():
+        path = root / name
+        if not (1 <= tone <= 4) or not path.exists():
+            continue
+        e = entries.get(name, {})
+        stamp = e.get("sha1")
+        if stamp is None:
+            st = path.stat()
+            stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        clips.append({"name": name, "tone": tone, "speaker": str(e.get("speaker", "")), "stamp": stamp, "source": str(path)})
+    return clips
+
+
+_WORKER_PACK: PackedCorpus | None = None
+
+
+def _open_worker_pack(pack_path: str) -> None:
+    global _WORKER_PACK
+    _WORKER_PACK = PackedCorpus(Path(pack_path))
+
+
+def _clip_job(fn, source):
+    """fn(samples, sample_rate) of one clip: a file path, a clip name in the worker's pack, or (samples, sample_rate)."""
+    if isinstance(source, tuple):
+        samples, sr = source
+    elif _WORKER_PACK is not None:
+        samples, sr = _WORKER_PACK.pcm(source)
+    else:
+        import local_tone
+        samples, sr = local_tone.load_audio(Path(source))
+    return fn(samples, sr)
+
+
+def map_clips(fn, sources: list, workers: int, pack: Path | None = None) -> list:
+    """[fn(samples, sample_rate)] of many clips on a process pool, in order. fn must be a
+    module-level function; sources are as for _clip_job, and pack is opened once per worker."""
+    if not sources:
+        return []
+    init, initargs = (_open_worker_pack, (str(pack),)) if pack is not None else (None, ())
+    with ProcessPoolExecutor(workers, initializer=init, initargs=initargs) as pool:
+        return list(pool.map(partial(_clip_job, fn), sources, chunksize=max(1, len(sources) // (workers * 8))))
+
+
+def pack_manifest(
+    manifest_path: Path,
+    audio_dir: Path,
+    pack_path: Path,
+    with_pcm: bool = False,
+    append: bool = False,
+) -> int:
+    """Pack every clip of a run_tone_eval manifest (or index_corpus index); return clips written."""
+    manifest = load_labels(manifest_path)
+    n = 0
+    with PackWriter(pack_path, append=append) as writer:
+        for name in sorted(manifest):
+            path = audio_dir / name
+            if not path.exists():
+                continue
+            with profiling.span("read", file=name):
+                data = path.read_bytes()
+            pcm = sr = None
+            if with_pcm:
+                import local_tone
+                with profiling.span("decode", file=name):
+                    pcm, sr = local_tone.load_audio_bytes(data, path.suffix.lower().lstrip("."))
+            with profiling.span("write", file=name):
+                writer.add(name, data, path.suffix.lower().lstrip("."), manifest[name], pcm, sr)
+            n += 1
+    return n
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Create, list and extract packed corpora.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("pack", help="Pack the clips of a manifest or corpus index")
+    p.add_argument("manifest", type=Path, help="run_tone_eval manifest or index_corpus index")
+    p.add_argument("pack", type=Path, help="Output .pack path")
+    p.add_argument("--audio-dir", type=Path, default=None, help="Clip directory (default: index root, else manifest directory)")
+    p.add_argument("--pcm", action="store_true", help="Also store decoded 16-bit PCM for local classifiers")
+    p.add_argument("--append", action="store_true", help="Add to an existing pack instead of overwriting it")
+    p = sub.add_parser("ls", help="List clips in a pack")
+    p.add_argument("pack", type=Path)
+    p = sub.add_parser("extract", help="Write clips from a pack back to files")
+    p.add_argument("pack", type=Path)
+    p.add_argument("dest", type=Path)
+    p.add_argument("names", nargs="*", help="Clip names (default: all)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "packed_corpus")
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    if args.cmd == "pack":
+        manifest_path = resolve(args.manifest)
+        root = json.loads(manifest_path.read_text(encoding="utf-8")).get("root") if args.audio_dir is None else None
+        audio_dir = args.audio_dir or (Path(root) if root else manifest_path.parent)
+        n = pack_manifest(manifest_path, resolve(audio_dir), resolve(args.pack), args.pcm, args.append)
+        print(f"Packed {n} clips into {resolve(args.pack)}")
+        return 0
+
+    with PackedCorpus(resolve(args.pack)) as pack:
+        if args.cmd == "ls":
+            for name, e in pack.entries.items():
+                pcm = f", pcm {e['pcm']['samples']} @ {e['pcm']['sample_rate']} Hz" if "pcm" in e else ""
+                print(f"{name}: tone {e['tone']}, {e['format']} {e['length']} bytes{pcm}")
+            print(f"{len(pack)} clips")
+        else:
+            dest = resolve(args.dest)
+            dest.mkdir(parents=True, exist_ok=True)
+            for name in args.names or pack.names():
+                (dest / name).parent.mkdir(parents=True, exist_ok=True)
+                (dest / name).write_bytes(pack.data(name))
+            print(f"Extracted {len(args.names or pack.names())} clips to {dest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Pinyin helpers shared by the corpus indexer and the error analyses.
+
+split_pinyin("zhuang") -> ("zh", "uang"). Syllables spelled with y/w are zero-initial, and
+their final is written out in its underlying form (yi -> i, ya -> ia, yu -> ü, wu -> u,
+wo -> uo), so "zero-initial" groups line up with a, e, o, ai, ... syllables.
+"""
+
+import re
+
+INITIALS = (
+    "zh", "ch", "sh",
+    "b", "p", "m", "f", "d", "t", "n", "l", "g", "k", "h", "j", "q", "x", "r", "z", "c", "s",
+)
+ZERO_INITIAL = ""
+
+_SYLLABLE = re.compile(r"^([a-zü]+?)([1-5])$")
+_FILENAME = re.compile(r"^cmn-([a-zü]+?)([1-5])\.[a-z0-9]+$", re.I)
+
+
+def normalize(pinyin: str) -> str:
+    """Lowercase; 'v' and 'u:' spellings of ü become ü."""
+    return pinyin.strip().lower().replace("u:", "ü").replace("v", "ü")
+
+
+def parse_syllable(text: str) -> tuple[str, int] | None:
+    """'cai4' -> ('cai', 4); None if text is not one pinyin syllable with a tone digit."""
+    m = _SYLLABLE.match(normalize(text))
+    if not m:
+        return None
+    return m.group(1), int(m.group(2))
+
+
+def parse_filename(name: str) -> tuple[str, int] | None:
+    """'cmn-cai4.mp3' -> ('cai', 4); None for other names."""
+    m = _FILENAME.match(name)
+    if not m:
+        return None
+    return normalize(m.group(1)), int(m.group(2))
+
+
+def split_pinyin(syllable: str) -> tuple[str, str]:
+    """(initial, final) of a toneless syllable; initial is '' for zero-initial syllables."""
+    s = normalize(syllable)
+    if s.startswith("y"):
+        rest = s[1:]
+        if rest.startswith("u"):  # yu, yue, yuan, yun
+            return ZERO_INITIAL, "ü" + rest[1:]
+        if rest.startswith("i"):  # yi, yin, ying
+            return ZERO_INITIAL, rest
+        return ZERO_INITIAL, "i" + rest  # ya, ye, yao, you, yan, yang, yong
+    if s.startswith("w"):
+        rest = s[1:]
+        if rest.startswith("u"):  # wu
+            return ZERO_INITIAL, rest
+        return ZERO_INITIAL, "u" + rest  # wa, wo, wai, wei, wan, wen, wang, weng
+    for initial in INITIALS:
+        if s.startswith(initial) and len(s) > len(initial):
+            final = s[len(initial):]
+            # j/q/x + u is ü
+            if initial in ("j", "q", "x") and final.startswith("u"):
+                final = "ü" + final[1:]
+            return initial, final
+    return ZERO_INITIAL, s
@@ -3,8 +3,21 @@ Create pitch contour visualizations from the synthetic tone definitions.
 
 Plots F0 (Hz) vs time (ms) for the four Mandarin tones. Output is suitable
 for blog posts or documentation.
+
+With --corpus (a run_tone_eval manifest, an index_corpus index or a .pack), F0 contours
+are extracted from every clip (local_tone.extract_f0), time-normalized over the voiced
+part and speaker-normalized (semitone z-score per speaker; clips without a "speaker"
+entry field count as one speaker), then binned per tone into a 2-D density image with
+the ideal synthetic contour on top. Contours are cached in results/cache/contours_<name>.npz
+keyed on each clip's hash (or size and mtime), so re-plots only extract new clips.
+
+Usage:
+  python scripts/plot_pitch_contours.py
+  python scripts/plot_pitch_contours.py --corpus audio-cmn/64k/syllabs/index.json
+  python scripts/plot_pitch_contours.py --corpus results/syllabs.pack --normalize clip --workers 8
 """
 
+import argparse
 import sys
 from pathlib import Path
 
@@ -25,9 +38,22 @@ from generate_tones import (
 
 import matplotlib.pyplot as plt
 
+import local_tone
+import profiling
+from packed_corpus import corpus_clips, map_clips
+
 # Output
-FIGURES_DIR = Path(__file__).resolve().parent.parent / "figures"
+_ROOT = Path(__file__).resolve().parent.parent
+FIGURES_DIR = _ROOT / "figures"
 PITCH_CONTOURS_PNG = FIGURES_DIR / "pitch_contours.png"
+CACHE_DIR = _ROOT / "results" / "cache"
+
+# Corpus density plots
+N_TIME = 50  # points per time-normalized contour (= x bins)
+Y_BINS = 120
+Y_RANGE = {"speaker": (-3.5, 3.5), "clip": (-6.0, 6.0)}  # z-score / semitones
+CHUNK_ROWS = 20000  # contours binned per step; bounds the temporary index arrays
+TONE_TITLES = ["T1: High level", "T2: Rising", "T3: Dipping", "T4: Falling"]
 
 
 def get_time_axis_ms() -> np.ndarray:
@@ -68,8 +94,169 @@ def plot_pitch_contours(save_path: Path | None = None) -> None:
     plt.close(fig)
 
 
+def time_normalized_contour(f0: np.ndarray, n_points: int = N_TIME) -> np.ndarray | None:
+    """Voiced span of f0 resampled to n_points, in semitones re 100 Hz; None if under 3 voiced frames."""
+    voiced = np.flatnonzero(~np.isnan(f0))
+    if len(voiced) < 3:
+        return None
+    seg = f0[voiced[0]:voiced[-1] + 1]
+    pos = np.arange(len(seg))
+    ok = ~np.isnan(seg)
+    seg = np.interp(pos, pos[ok], seg[ok])
+    return np.interp(np.linspace(0, len(seg) - 1, n_points), pos, 12 * np.log2(seg / 100.0))
+
+
+def _clip_contour(samples: np.ndarray, sample_rate: int) -> np.ndarray | None:
+    return time_normalized_contour(local_tone.extract_f0(samples, sample_rate))
+
+
+def load_contours(
+    corpus: Path,
+    clips: list[dict],
+    workers: int,
+    cache_path: Path | None = None,
+) -> np.ndarray:
+    """(len(clips), N_TIME) float32 contours in semitones re 100 Hz; NaN rows for unvoiced clips.
+
+    Rows found in cache_path under the same (name, stamp) are reused; the cache is rewritten
+    when anything was extracted."""
+    cached: dict[tuple[str, str], np.ndarray] = {}
+    if cache_path is not None and cache_path.exists():
+        with np.load(cache_path) as z:
+            if z["contours"].shape[1] == N_TIME:
+                cached = {(n, s): row for n, s, row in zip(z["names"], z["stamps"], z["contours"])}
+    out = np.full((len(clips), N_TIME), np.nan, dtype=np.float32)
+    todo = []
+    for i, c in enumerate(clips):
+        row = cached.get((c["name"], c["stamp"]))
+        if row is not None:
+            out[i] = row
+        else:
+            todo.append(i)
+    print(f"Contours: {len(clips) - len(todo)} cached, {len(todo)} to extract")
+    if todo:
+        pack = corpus if corpus.suffix == ".pack" else None
+        with profiling.span("extract", clips=len(todo)):
+            vecs = map_clips(_clip_contour, [clips[i]["source"] for i in todo], workers, pack)
+        for i, vec in zip(todo, vecs):
+            if vec is not None:
+                out[i] = vec
+    if todo and cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            cache_path,
+            names=np.array([c["name"] for c in clips]),
+            stamps=np.array([c["stamp"] for c in clips]),
+            contours=out,
+        )
+    return out
+
+
+def normalize_contours(contours: np.ndarray, speakers: np.ndarray, mode: str) -> np.ndarray:
+    """"speaker": z-score against each speaker's mean and std over all their contour points;
+    "clip": semitones relative to each clip's own mean."""
+    if mode == "clip":
+        return contours - np.nanmean(contours, axis=1, keepdims=True)
+    codes = np.unique(speakers, return_inverse=True)[1]
+    ok = ~np.isnan(contours)
+    n = np.bincount(codes, weights=ok.sum(axis=1))
+    total = np.bincount(codes, weights=np.where(ok, contours, 0).sum(axis=1))
+    mean = total / np.maximum(n, 1)
+    centered = contours - mean[codes][:, None]
+    var = np.bincount(codes, weights=np.where(ok, centered ** 2, 0).sum(axis=1)) / np.maximum(n, 1)
+    return centered / np.maximum(np.sqrt(var), 1e-6)[codes][:, None]
+
+
+def density_histogram(contours: np.ndarray, y_range: tuple[float, float], y_bins: int = Y_BINS) -> np.ndarray:
+    """(y_bins, n_time) counts of contour points, binned CHUNK_ROWS contours at a time."""
+    n_time = contours.shape[1]
+    lo, hi = y_range
+    counts = np.zeros(n_time * y_bins, dtype=np.int64)
+    cols = np.arange(n_time) * y_bins
+    for start in range(0, len(contours), CHUNK_ROWS):
+        chunk = contours[start:start + CHUNK_ROWS]
+        yi = np.floor((chunk - lo) / (hi - lo) * y_bins)
+        ok = (yi >= 0) & (yi < y_bins)  # NaN compares False
+        flat = (yi + cols)[ok].astype(np.int64)
+        counts += np.bincount(flat, minlength=counts.size)
+    return counts.reshape(n_time, y_bins).T
+
+
+def reference_contours(mode: str, n_points: int = N_TIME) -> np.ndarray:
+    """(4, n_points) ideal synthetic contours, normalized like the corpus (the four as one speaker)."""
+    t = get_time_axis_ms() / 1000
+    ref = np.array([
+        time_normalized_contour(f0_fn(t), n_points)
+        for f0_fn in (f0_t1, f0_t2, f0_t3, f0_t4)
+    ])
+    return normalize_contours(ref, np.zeros(4, dtype=int), mode)
+
+
+def plot_corpus_density(
+    corpus: Path,
+    save_path: Path,
+    audio_dir: Path | None = None,
+    mode: str = "speaker",
+    workers: int = 4,
+    cache_path: Path | None = None,
+) -> None:
+    clips = corpus_clips(corpus, audio_dir)
+    contours = load_contours(corpus, clips, workers, cache_path)
+    tones = np.array([c["tone"] for c in clips], dtype=int)
+    speakers = np.array([c["speaker"] for c in clips])
+    with profiling.span("normalize"):
+        voiced = ~np.isnan(contours).all(axis=1)
+        norm = normalize_contours(contours[voiced], speakers[voiced], mode)
+        tones = tones[voiced]
+    ref = reference_contours(mode)
+    y_range = Y_RANGE[mode]
+    x = np.linspace(0, 100, N_TIME)
+    fig, axes = plt.subplots(2, 2, figsize=(10, 8), sharex=True, sharey=True)
+    for k, ax in enumerate(axes.flatten()):
+        with profiling.span("histogram", tone=k + 1):
+            counts = density_histogram(norm[tones == k + 1], y_range)
+        # Each time column sums to 1, so the image shows where contours sit at that point in time
+        density = counts / np.maximum(counts.sum(axis=0, keepdims=True), 1)
+        ax.imshow(
+            density, origin="lower", aspect="auto", cmap="magma",
+            extent=(0, 100, *y_range), vmax=np.quantile(density, 0.995) or None,
+        )
+        ax.plot(x, ref[k], color="C0", linewidth=2, label="ideal (synthetic)")
+        ax.set_title(f"{TONE_TITLES[k]} (n = {int((tones == k + 1).sum())})", fontsize=12)
+        ax.set_ylabel("F0 (speaker z-score)" if mode == "speaker" else "F0 (semitones re clip mean)")
+    for ax in axes[1]:
+        ax.set_xlabel("Time (% of voiced duration)")
+    axes[0, 0].legend(loc="upper right", fontsize=9)
+    fig.suptitle(f"Pitch contour density: {corpus.name} ({int(voiced.sum())} of {len(clips)} clips voiced)", fontsize=14)
+    plt.tight_layout()
+    with profiling.span("render"):
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        plt.savefig(save_path, dpi=150, bbox_inches="tight")
+    print(f"Saved: {save_path}")
+    plt.close(fig)
+
+
 def main() -> None:
-    plot_pitch_contours(save_path=PITCH_CONTOURS_PNG)
+    parser = argparse.ArgumentParser(description="Plot ideal tone contours, or corpus contour densities with --corpus.")
+    parser.add_argument("--corpus", type=Path, default=None, help="Manifest, index_corpus index or .pack to plot as density images")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Clip directory for a manifest (default: index root, else manifest directory)")
+    parser.add_argument("--normalize", choices=sorted(Y_RANGE), default="speaker", help="Speaker z-score (default) or per-clip semitones")
+    parser.add_argument("--workers", type=int, default=4, help="Processes for F0 extraction (default: 4)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-extract every contour")
+    parser.add_argument("--output", type=Path, default=None, help="PNG path (default: figures/pitch_contours[_<corpus>_density].png)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "plot_pitch_contours")
+
+    if args.corpus is None:
+        plot_pitch_contours(save_path=args.output or PITCH_CONTOURS_PNG)
+        return
+    corpus = args.corpus if args.corpus.is_absolute() else _ROOT / args.corpus
+    audio_dir = args.audio_dir if args.audio_dir is None or args.audio_dir.is_absolute() else _ROOT / args.audio_dir
+    name = corpus.parent.name if corpus.stem in ("index", "manifest") else corpus.stem
+    out = args.output or FIGURES_DIR / f"pitch_contours_{name}_density.png"
+    cache_path = None if args.no_cache else CACHE_DIR / f"contours_{name}.npz"
+    plot_corpus_density(corpus, out, audio_dir, args.normalize, args.workers, cache_path)
 
 
 if __name__ == "__main__":
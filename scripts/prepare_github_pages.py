@@ -6,12 +6,20 @@ and copies the conversation .md into docs/.
 Figures are optimized when copied: resized to max width (default 1440px for retina)
 and saved with compression. Per-image options (crop, max_width) can be set in
 FIGURE_OPTIONS below — e.g. crop=(left, top, right, bottom) in pixels.
+
+Pass --profile to time the load / resize / save / copy stages (see scripts/profiling.py).
 """
 
+import argparse
+import shutil
+import sys
 from pathlib import Path
 
 from PIL import Image
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+
 ROOT = Path(__file__).resolve().parent.parent
 DOCS = ROOT / "docs"
 FIGURES_SRC = ROOT / "figures"
@@ -43,11 +51,13 @@ DEFAULT_MAX_WIDTH = 1440
 
 
 def optimize_and_copy_figure(src: Path, dest: Path, options: dict) -> None:
-    img = Image.open(src)
-    if src.suffix.lower() in (".jpg", ".jpeg"):
-        img = img.convert("RGB")
-    elif img.mode not in ("RGB", "RGBA"):
-        img = img.convert("RGBA")
+    with profiling.span("load", file=src.name):
+        img = Image.open(src)
+        img.load()
+        if src.suffix.lower() in (".jpg", ".jpeg"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
     w, h = img.size
 
     if "crop" in options:
@@ -59,13 +69,15 @@ def optimize_and_copy_figure(src: Path, dest: Path, options: dict) -> None:
     if w > max_w:
         ratio = max_w / w
         new_size = (max_w, int(h * ratio))
-        img = img.resize(new_size, Image.Resampling.LANCZOS)
+        with profiling.span("resize", file=src.name):
+            img = img.resize(new_size, Image.Resampling.LANCZOS)
 
     dest.parent.mkdir(parents=True, exist_ok=True)
-    if src.suffix.lower() in (".jpg", ".jpeg"):
-        img.convert("RGB").save(dest, "JPEG", quality=88, optimize=True)
-    else:
-        img.save(dest, "PNG", optimize=True)
+    with profiling.span("save", file=src.name):
+        if src.suffix.lower() in (".jpg", ".jpeg"):
+            img.convert("RGB").save(dest, "JPEG", quality=88, optimize=True)
+        else:
+            img.save(dest, "PNG", optimize=True)
 
 
 def copy_figures(src_dir: Path, dest_dir: Path, names: list[str]) -> tuple[list[str], list[str]]:
@@ -82,7 +94,7 @@ def copy_figures(src_dir: Path, dest_dir: Path, names: list[str]) -> tuple[list[
         except Exception:
             # Fallback: copy as-is if Pillow fails (e.g. not an image)
             dest.parent.mkdir(parents=True, exist_ok=True)
-            dest.write_bytes(src.read_bytes())
+            shutil.copyfile(src, dest)
             copied.append(name)
     return copied, missing
 
@@ -94,7 +106,8 @@ def copy_files(src_dir: Path, dest_dir: Path, names: list[str]) -> tuple[list[st
         src = src_dir / name
         if src.exists():
             dest = dest_dir / name
-            dest.write_bytes(src.read_bytes())
+            with profiling.span("copy", file=name):
+                shutil.copyfile(src, dest)  # kernel-side copy, no read into Python
             copied.append(name)
         else:
             missing.append(str(src))
@@ -102,6 +115,11 @@ def copy_files(src_dir: Path, dest_dir: Path, names: list[str]) -> tuple[list[st
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Copy figures, audio and conversation log into docs/.")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "prepare_github_pages")
+
     print("Preparing docs/ for GitHub Pages...")
     all_missing = []
 
@@ -120,7 +138,7 @@ def main() -> None:
     conv_md = "cursor_testing_llms_for_mandarin_tone_r.md"
     conv_src = ROOT / conv_md
     if conv_src.exists():
-        (DOCS / conv_md).write_bytes(conv_src.read_bytes())
+        shutil.copyfile(conv_src, DOCS / conv_md)
         print(f"  conversation: {conv_md} -> docs/")
     else:
         all_missing.append(str(conv_src))
@@ -0,0 +1,168 @@
+"""
+Per-stage timing behind the scripts' common --profile option.
+
+Code marks stages with `with profiling.span("encode"): ...`; this is a no-op unless a
+script called profiling.start() (i.e. ran with --profile or --profile-output PATH). Each span records wall and
+CPU time and is written as Chrome trace-event JSON (open in chrome://tracing or
+https://ui.perfetto.dev). With --cprofile the run is also wrapped in cProfile and the
+stats are saved next to the trace. A table of the top stages is printed at exit.
+
+Usage (any script that calls add_profile_args):
+  python scripts/run_tone_eval.py --profile
+  python scripts/prepare_github_pages.py --profile-output results/profile/pages.trace.json --cprofile
+"""
+
+import argparse
+import atexit
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+PROFILE_DIR = _ROOT / "results" / "profile"
+
+
+class Profiler:
+    """Collects timed spans as Chrome trace 'complete' (ph=X) events."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+        self._cpu0 = time.process_time()
+
+    @contextlib.contextmanager
+    def span(self, stage: str, **args):
+        start = time.perf_counter_ns()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            cpu_ms = (time.thread_time() - cpu_start) * 1000
+            end = time.perf_counter_ns()
+            event = {
+                "name": stage,
+                "cat": self.name,
+                "ph": "X",
+                "ts": (start - self._t0) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"cpu_ms": round(cpu_ms, 3), **args},
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def stage_totals(self) -> dict[str, dict[str, float]]:
+        """Per stage: count, total wall ms, total CPU ms."""
+        totals: dict[str, dict[str, float]] = {}
+        with self._lock:
+            events = list(self.events)
+        for e in events:
+            t = totals.setdefault(e["name"], {"count": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            t["count"] += 1
+            t["wall_ms"] += e["dur"] / 1000
+            t["cpu_ms"] += e["args"]["cpu_ms"]
+        return totals
+
+    def summary(self, top: int = 10) -> str:
+        run_ms = (time.perf_counter_ns() - self._t0) / 1e6
+        cpu_ms = (time.process_time() - self._cpu0) * 1000
+        totals = sorted(self.stage_totals().items(), key=lambda kv: -kv[1]["wall_ms"])[:top]
+        lines = [
+            f"Profile ({self.name}): wall {run_ms:.1f} ms, process CPU {cpu_ms:.1f} ms",
+            f"{'stage':<16} {'count':>7} {'wall ms':>11} {'mean ms':>9} {'cpu ms':>11} {'% wall':>7}",
+        ]
+        for stage, t in totals:
+            mean = t["wall_ms"] / t["count"] if t["count"] else 0.0
+            pct = 100 * t["wall_ms"] / run_ms if run_ms else 0.0
+            lines.append(
+                f"{stage:<16} {t['count']:>7d} {t['wall_ms']:>11.1f} {mean:>9.2f} {t['cpu_ms']:>11.1f} {pct:>6.1f}%"
+            )
+        return "\n".join(lines)
+
+    def write_trace(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+        meta = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}}
+        path.write_text(json.dumps({"traceEvents": [meta] + events, "displayTimeUnit": "ms"}), encoding="utf-8")
+
+
+_active: Profiler | None = None
+_cprofile: cProfile.Profile | None = None
+_trace_path: Path | None = None
+
+
+def span(stage: str, **args):
+    """Context manager timing one stage; does nothing when profiling is off."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.span(stage, **args)
+
+
+def add_profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-stage wall/CPU spans to a Chrome trace JSON (results/profile/<script>_<time>.trace.json)",
+    )
+    parser.add_argument(
+        "--profile-output",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Trace path for --profile (implies --profile)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="With --profile, also run cProfile and save .prof stats next to the trace",
+    )
+
+
+def start(args: argparse.Namespace, name: str) -> Profiler | None:
+    """Enable profiling if --profile or --profile-output was given; results are written and summarized at exit."""
+    global _active, _cprofile, _trace_path
+    output = getattr(args, "profile_output", None)
+    if not getattr(args, "profile", False) and output is None:
+        return None
+    _active = Profiler(name)
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        _trace_path = PROFILE_DIR / f"{name}_{stamp}.trace.json"
+    else:
+        _trace_path = output if output.is_absolute() else Path.cwd() / output
+    if args.cprofile:
+        _cprofile = cProfile.Profile()
+        _cprofile.enable()
+    atexit.register(finish)
+    return _active
+
+
+def finish() -> None:
+    """Stop profiling, write the trace (and cProfile stats) and print the summary table."""
+    global _active, _cprofile
+    if _active is None:
+        return
+    profiler, _active = _active, None
+    profiler.write_trace(_trace_path)
+    print(f"\n{profiler.summary()}")
+    print(f"Trace: {_trace_path}")
+    if _cprofile is not None:
+        _cprofile.disable()
+        prof_path = _trace_path.with_suffix(".prof")
+        _cprofile.dump_stats(str(prof_path))
+        buf = io.StringIO()
+        pstats.Stats(_cprofile, stream=buf).sort_stats("cumulative").print_stats(15)
+        _cprofile = None
+        print(buf.getvalue())
+        print(f"cProfile stats: {prof_path}")
@@ -0,0 +1,215 @@
+"""
+Provider adapters: one place per provider family for request shape, reply text and capabilities.
+
+Every remote model gets an adapter from adapter_for(model). Adapters are chosen by the provider in
+the capability index (scripts/model_index.py), or by the model prefix if the model is not indexed.
+Each adapter:
+  - builds the cheapest valid request: request_kwargs() returns the extra litellm.completion
+    kwargs for a text answer to an audio prompt;
+  - extracts the reply text in one defined way: extract_text(message) for a completion message
+    and chunk_text(chunk) for a streamed chunk;
+  - declares its capabilities: streaming, json_output, batching (`n` choices in one request) and
+    max_audio_s (longest documented audio input; None when only the context window limits it).
+
+OpenAI audio models can answer in text only, so no spoken reply is requested and paid for.
+Audio output tokens cost several times more than text tokens, and synthesising them adds latency.
+If a model rejects a text-only request (an error about modalities), the adapter switches that
+model to the old text+audio shape (alloy voice, WAV) and the request is retried. Gemini chat
+models get no extra kwargs, since they reject audio output ("only supports text output").
+
+Register an adapter for another provider with register("provider", AdapterClass).
+
+Usage:
+  python scripts/providers.py openai/gpt-audio gemini/gemini-2.5-pro mistral/voxtral-small-latest
+  python scripts/providers.py --offline
+"""
+
+import argparse
+import sys
+import threading
+from functools import cached_property
+from pathlib import Path
+
+import litellm
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import model_index
+
+
+class ProviderAdapter:
+    """Default adapter: plain chat completion, text in message.content."""
+
+    provider = ""
+    # Request shapes this adapter can send, cheapest first; shape is the one in use
+    SHAPES = ("text",)
+    max_audio_s: float | None = None
+
+    def __init__(self, model: str, record: dict | None = None):
+        self.model = model
+        self.record = record
+        self.shape = self.SHAPES[0]
+
+    @cached_property
+    def _params(self) -> list[str]:
+        try:
+            return litellm.get_supported_openai_params(model=self.model) or []
+        except Exception:
+            return []
+
+    @cached_property
+    def streaming(self) -> bool:
+        native = self.record["native_streaming"] if self.record else True
+        return native and "stream" in self._params
+
+    @cached_property
+    def json_output(self) -> bool:
+        if self.record is not None:
+            return self.record["structured_output"]
+        return "response_format" in self._params
+
+    @cached_property
+    def batching(self) -> bool:
+        return "n" in self._params
+
+    def capabilities(self) -> dict:
+        return {
+            "streaming": self.streaming,
+            "json_output": self.json_output,
+            "batching": self.batching,
+            "max_audio_s": self.max_audio_s,
+        }
+
+    def request_kwargs(self, shape: str | None = None) -> dict:
+        """Extra litellm.completion kwargs for shape (default: the current shape)."""
+        return {}
+
+    def extract_text(self, message) -> str:
+        return (getattr(message, "content", None) or "").strip()
+
+    def chunk_text(self, chunk) -> str:
+        if not chunk.choices:
+            return ""
+        return getattr(chunk.choices[0].delta, "content", None) or ""
+
+    def rejected_shape(self, e: Exception, shape: str) -> bool:
+        """Whether e is the provider refusing a request sent with shape. If so, the adapter has
+        moved past shape (possibly for a concurrent request already) and the request should be
+        sent again with request_kwargs()."""
+        return False
+
+
+class OpenAIAdapter(ProviderAdapter):
+    """OpenAI chat audio models: text-only output, with text+audio as fallback for models that insist."""
+
+    provider = "openai"
+    SHAPES = ("text", "text+audio")
+    AUDIO_REPLY = {"modalities": ["text", "audio"], "audio": {"voice": "alloy", "format": "wav"}}
+
+    def request_kwargs(self, shape: str | None = None) -> dict:
+        # Text-only output is the default; only the fallback shape asks for a spoken reply
+        if (shape or self.shape) == "text+audio":
+            return {"modalities": list(self.AUDIO_REPLY["modalities"]), "audio": dict(self.AUDIO_REPLY["audio"])}
+        return {}
+
+    def extract_text(self, message) -> str:
+        content = (getattr(message, "content", None) or "").strip()
+        audio = getattr(message, "audio", None)
+        if not content and audio is not None:
+            content = (getattr(audio, "transcript", None) or "").strip()
+        return content
+
+    def chunk_text(self, chunk) -> str:
+        if not chunk.choices:
+            return ""
+        delta = chunk.choices[0].delta
+        text = getattr(delta, "content", None) or ""
+        audio = getattr(delta, "audio", None)
+        if not text and audio:
+            text = (audio.get("transcript") if isinstance(audio, dict) else getattr(audio, "transcript", None)) or ""
+        return text
+
+    def rejected_shape(self, e: Exception, shape: str) -> bool:
+        if shape != "text" or not isinstance(e, litellm.BadRequestError) or "modalit" not in str(e).lower():
+            return False
+        self.shape = "text+audio"
+        return True
+
+
+class GeminiAdapter(ProviderAdapter):
+    """Gemini chat models (Google AI Studio and Vertex AI): text output only."""
+
+    provider = "gemini"
+    max_audio_s = 9.5 * 3600  # documented limit of audio per prompt
+
+
+class MistralAdapter(ProviderAdapter):
+    """Voxtral chat models."""
+
+    provider = "mistral"
+    max_audio_s = 40 * 60  # documented limit for audio understanding (transcription: 30 min)
+
+
+ADAPTERS: dict[str, type[ProviderAdapter]] = {
+    "openai": OpenAIAdapter,
+    "gemini": GeminiAdapter,
+    "vertex_ai": GeminiAdapter,
+    "vertex_ai-language-models": GeminiAdapter,
+    "mistral": MistralAdapter,
+}
+
+_index: dict[str, dict] | None = None
+_adapters: dict[str, ProviderAdapter] = {}
+_lock = threading.Lock()
+
+
+def capabilities() -> dict[str, dict]:
+    """Capability index (scripts/model_index.py), loaded once per process."""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = model_index.load_index()
+        return _index
+
+
+def register(provider: str, adapter: type[ProviderAdapter]) -> None:
+    """Use adapter for models of provider (as in the index, or the model prefix) from now on."""
+    with _lock:
+        ADAPTERS[provider] = adapter
+        _adapters.clear()
+
+
+def adapter_for(model: str) -> ProviderAdapter:
+    """The adapter of model (one instance per model, so shape fallbacks are remembered)."""
+    adapter = _adapters.get(model)
+    if adapter is not None:
+        return adapter
+    record = model_index.lookup(capabilities(), model)
+    with _lock:
+        if model not in _adapters:
+            provider = record["provider"] if record else model.split("/", 1)[0]
+            _adapters[model] = ADAPTERS.get(provider, ProviderAdapter)(model, record)
+        return _adapters[model]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Show the provider adapter and capabilities of each model.")
+    parser.add_argument("models", nargs="*", help="Model ids (default: every audio-input chat model in the index)")
+    parser.add_argument("--offline", action="store_true", help="Never touch the network for the capability index")
+    args = parser.parse_args()
+
+    global _index
+    _index = model_index.load_index(offline=args.offline)
+    names = args.models or sorted({r["id"] for r in _index.values() if r["audio_input"] and r["mode"] == "chat"})
+    for name in names:
+        adapter = adapter_for(name)
+        caps = adapter.capabilities()
+        max_audio = f"{caps['max_audio_s'] / 60:g} min" if caps["max_audio_s"] else "context"
+        print(
+            f"{name}: {type(adapter).__name__} shape={adapter.shape} stream={caps['streaming']} "
+            f"json={caps['json_output']} n={caps['batching']} max_audio={max_audio}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
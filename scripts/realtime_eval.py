@@ -0,0 +1,542 @@
+"""
+Stream audio into realtime / live model endpoints and time the answer after end of speech.
+
+run_tone_eval.py sends a finished clip in one blocking request, so the whole upload and the
+model's reading of the clip start only after the speaker stops. Here every model gets one
+persistent WebSocket session (OpenAI Realtime for openai/gpt-realtime*, Gemini Live
+BidiGenerateContent for gemini/*live*). 16-bit PCM is streamed to it in --chunk-ms chunks
+while the syllable is being spoken, from the microphone (--record) or from files played at
+real-time pace. When the audio ends the turn is closed and the answer is read back over the
+same session. Manual turn-taking is used (no server VAD), so end of speech is exactly the
+moment the last chunk was sent.
+
+For each turn the time from end of speech to the first text and to the complete answer is
+recorded. With --batch-models the same clips also go through the batch path
+(run_tone_eval.run_encoded: WAV encode plus one completion), timed from the same end of
+speech. A latency table per path is printed at the end.
+
+--stand-in runs everything against local servers: a WebSocket stand-in speaking both
+protocols and mock_provider.py for the batch path. Both wait --stand-in-latency-ms before
+answering, and the stand-in "hears" the tone with local/contour on the PCM it received.
+
+Usage:
+  python scripts/realtime_eval.py --record --turns 5 --models openai/gpt-realtime
+  python scripts/realtime_eval.py --manifest synthetic_tones/manifest.json --batch-models gemini/gemini-2.5-pro
+  python scripts/realtime_eval.py --pack results/syllabs.pack --limit 20 --stand-in --batch-models gemini/gemini-2.5-pro
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+from scipy.signal import resample_poly
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import local_tone
+import profiling
+import run_tone_eval
+from mock_provider import MockProviderServer
+from packed_corpus import PackedCorpus
+from run_tone_eval import TONE_DEFINITIONS, parse_heard_pinyin, parse_predicted_tone
+
+_ROOT = Path(__file__).resolve().parent.parent
+OPENAI_REALTIME_URL = "wss://api.openai.com/v1/realtime"
+GEMINI_LIVE_URL = "wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1beta.GenerativeService.BidiGenerateContent"
+REALTIME_MODELS = [
+    "openai/gpt-realtime",
+    "gemini/gemini-live-2.5-flash-preview-native-audio-09-2025",
+]
+DEFAULT_CHUNK_MS = 40
+DEFAULT_OUTPUT = run_tone_eval.RESULTS_DIR / "realtime_eval.csv"
+FIELDNAMES = [
+    "model", "path", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response",
+    "speech_s", "first_text_s", "answer_s",
+]
+
+
+async def receive_json(ws: aiohttp.ClientWebSocketResponse) -> dict:
+    """Next JSON message (Gemini Live sends JSON in binary frames)."""
+    msg = await ws.receive()
+    if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+        return json.loads(msg.data)
+    raise ConnectionError(f"realtime session closed ({msg.type.name}: {msg.extra or ''})")
+
+
+class RealtimeSession:
+    """One persistent WebSocket session to a model; subclasses speak the provider protocol.
+
+    A turn is start_turn(), send_audio() per PCM chunk, then end_turn(), which closes the
+    turn and returns {text, first_text_s, answer_s} timed from its own start."""
+
+    rate = 16000
+
+    def __init__(self, http: aiohttp.ClientSession, model: str, prompt: str, url: str):
+        self.http = http
+        self.model = model
+        self.name = model.split("/", 1)[1] if "/" in model else model
+        self.prompt = prompt
+        self.url = url
+        self.ws: aiohttp.ClientWebSocketResponse | None = None
+
+    async def open(self) -> None:
+        raise NotImplementedError
+
+    async def start_turn(self) -> None:
+        pass
+
+    async def send_audio(self, pcm: bytes) -> None:
+        raise NotImplementedError
+
+    async def end_turn(self) -> dict:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class OpenAIRealtimeSession(RealtimeSession):
+    """OpenAI Realtime: input_audio_buffer.append / commit, then response.create."""
+
+    rate = 24000
+
+    async def open(self) -> None:
+        self.ws = await self.http.ws_connect(
+            f"{self.url}?model={self.name}",
+            headers={"Authorization": f"Bearer {os.environ.get('OPENAI_API_KEY', '')}"},
+        )
+        await self._expect("session.created")
+        await self.ws.send_json({
+            "type": "session.update",
+            "session": {
+                "type": "realtime",
+                "output_modalities": ["text"],
+                "instructions": self.prompt,
+                "audio": {"input": {"format": {"type": "audio/pcm", "rate": self.rate}, "turn_detection": None}},
+            },
+        })
+        await self._expect("session.updated")
+
+    async def _expect(self, event_type: str) -> dict:
+        while True:
+            event = await receive_json(self.ws)
+            if event["type"] == "error":
+                raise RuntimeError(event.get("error", {}).get("message", "realtime error"))
+            if event["type"] == event_type:
+                return event
+
+    async def send_audio(self, pcm: bytes) -> None:
+        await self.ws.send_json({"type": "input_audio_buffer.append", "audio": base64.b64encode(pcm).decode()})
+
+    async def end_turn(self) -> dict:
+        start = time.perf_counter()
+        await self.ws.send_json({"type": "input_audio_buffer.commit"})
+        await self.ws.send_json({"type": "response.create"})
+        parts, first, items = [], None, []
+        while True:
+            event = await receive_json(self.ws)
+            kind = event["type"]
+            if kind in ("response.output_text.delta", "response.text.delta"):
+                first = first or time.perf_counter()
+                parts.append(event["delta"])
+            elif kind == "input_audio_buffer.committed":
+                items.append(event["item_id"])
+            elif kind == "response.done":
+                items.extend(o["id"] for o in event["response"].get("output", []) if "id" in o)
+                break
+            elif kind == "error":
+                raise RuntimeError(event.get("error", {}).get("message", "realtime error"))
+        done = time.perf_counter()
+        # Keep the session to one clip: drop this turn from the conversation before the next
+        for item_id in items:
+            await self.ws.send_json({"type": "conversation.item.delete", "item_id": item_id})
+        return {"text": "".join(parts), "first_text_s": (first or done) - start, "answer_s": done - start}
+
+
+class GeminiLiveSession(RealtimeSession):
+    """Gemini Live: realtimeInput activityStart / audio / activityEnd, manual activity detection."""
+
+    rate = 16000
+
+    async def open(self) -> None:
+        key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY", "")
+        self.ws = await self.http.ws_connect(f"{self.url}?key={key}")
+        # Native-audio models only answer in audio; their transcript is the text answer
+        native = "native-audio" in self.name
+        setup = {
+            "model": f"models/{self.name}",
+            "generationConfig": {"responseModalities": ["AUDIO" if native else "TEXT"]},
+            "systemInstruction": {"parts": [{"text": self.prompt}]},
+            "realtimeInputConfig": {"automaticActivityDetection": {"disabled": True}},
+        }
+        if native:
+            setup["outputAudioTranscription"] = {}
+        await self.ws.send_json({"setup": setup})
+        while "setupComplete" not in await receive_json(self.ws):
+            pass
+
+    async def start_turn(self) -> None:
+        await self.ws.send_json({"realtimeInput": {"activityStart": {}}})
+
+    async def send_audio(self, pcm: bytes) -> None:
+        await self.ws.send_json({
+            "realtimeInput": {"audio": {"data": base64.b64encode(pcm).decode(), "mimeType": f"audio/pcm;rate={self.rate}"}}
+        })
+
+    async def end_turn(self) -> dict:
+        start = time.perf_counter()
+        await self.ws.send_json({"realtimeInput": {"activityEnd": {}}})
+        parts, first = [], None
+        while True:
+            content = (await receive_json(self.ws)).get("serverContent")
+            if not content:
+                continue
+            texts = [p["text"] for p in content.get("modelTurn", {}).get("parts", []) if "text" in p]
+            if "outputTranscription" in content:
+                texts.append(content["outputTranscription"].get("text", ""))
+            if any(texts):
+                first = first or time.perf_counter()
+                parts.extend(texts)
+            if content.get("turnComplete"):
+                break
+        done = time.perf_counter()
+        return {"text": "".join(parts), "first_text_s": (first or done) - start, "answer_s": done - start}
+
+
+def session_for(http: aiohttp.ClientSession, model: str, prompt: str, base_url: str | None = None) -> RealtimeSession:
+    """Realtime session class for model's provider; base_url replaces the provider endpoint."""
+    provider = model.split("/", 1)[0]
+    if provider == "openai":
+        return OpenAIRealtimeSession(http, model, prompt, f"{base_url}/v1/realtime" if base_url else OPENAI_REALTIME_URL)
+    if provider == "gemini":
+        return GeminiLiveSession(http, model, prompt, f"{base_url}/ws/live" if base_url else GEMINI_LIVE_URL)
+    raise ValueError(f"{model}: no realtime protocol for provider {provider!r}")
+
+
+def to_pcm16(samples: np.ndarray, sr: int, rate: int) -> bytes:
+    """Mono float samples at sr -> little-endian 16-bit PCM at rate."""
+    if sr != rate:
+        g = np.gcd(sr, rate)
+        samples = resample_poly(samples, rate // g, sr // g)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+async def play_file(samples: np.ndarray, sr: int, chunk_ms: int, queues: list, rates: list[int]) -> float:
+    """Feed each session queue its PCM chunks at real-time pace; return the end-of-speech time."""
+    pcm = {rate: to_pcm16(samples, sr, rate) for rate in set(rates)}
+    n_chunks = -(-len(samples) * 1000 // (sr * chunk_ms))
+    start = time.perf_counter()
+    for k in range(n_chunks):
+        for q, rate in zip(queues, rates):
+            step = rate * chunk_ms // 1000 * 2
+            q.put_nowait(pcm[rate][k * step:(k + 1) * step])
+        # Chunk k is "spoken" by the end of its interval
+        await asyncio.sleep(max(0.0, start + (k + 1) * chunk_ms / 1000 - time.perf_counter()))
+    for q in queues:
+        q.put_nowait(None)
+    return time.perf_counter()
+
+
+async def play_microphone(duration: float, chunk_ms: int, queues: list, rates: list[int], captured: list) -> float:
+    """Stream the microphone to every session queue for duration seconds; return the end-of-speech time.
+    The float samples at 16 kHz are appended to captured (for the batch path)."""
+    try:
+        import sounddevice as sd
+    except ImportError as e:
+        raise SystemExit("Recording requires the sounddevice package. Install with: pip install sounddevice") from e
+    loop = asyncio.get_running_loop()
+    mic_rate = 48000
+    blocks: asyncio.Queue = asyncio.Queue()
+
+    def callback(indata, frames, time_info, status):
+        loop.call_soon_threadsafe(blocks.put_nowait, indata[:, 0].copy())
+
+    frames_left = int(duration * mic_rate)
+    print(f"Speak now ({duration} s) ...", flush=True)
+    with sd.InputStream(samplerate=mic_rate, channels=1, dtype="float32", blocksize=mic_rate * chunk_ms // 1000, callback=callback):
+        while frames_left > 0:
+            block = (await blocks.get())[:frames_left]
+            frames_left -= len(block)
+            captured.append(block)
+            for q, rate in zip(queues, rates):
+                q.put_nowait(to_pcm16(block, mic_rate, rate))
+    end = time.perf_counter()
+    for q in queues:
+        q.put_nowait(None)
+    captured[:] = [resample_poly(np.concatenate(captured), 1, 3).astype(np.float32)]  # 48 kHz -> 16 kHz
+    return end
+
+
+async def stream_turn(session: RealtimeSession, queue: asyncio.Queue) -> dict:
+    """Send the queued chunks as one turn, then close it and read the answer."""
+    await session.start_turn()
+    while (chunk := await queue.get()) is not None:
+        await session.send_audio(chunk)
+    with profiling.span("answer", model=session.model):
+        result = await session.end_turn()
+    result["turn_end"] = time.perf_counter()
+    return result
+
+
+class StandInServer:
+    """Local WebSocket stand-in for OpenAI Realtime (/v1/realtime) and Gemini Live (/ws/live).
+
+    It follows each protocol's event sequence, waits latency_s after the end of a turn, and answers
+    with the tone local/contour hears in the received PCM (in two text deltas)."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.turns = 0
+        self.runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/v1/realtime", self._openai)
+        app.router.add_get("/ws/live", self._gemini)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+    async def _answer(self, pcm: bytearray, rate: int) -> list[str]:
+        self.turns += 1
+        samples = np.frombuffer(bytes(pcm), dtype="<i2").astype(np.float32) / 32768
+        tone, _ = await asyncio.to_thread(local_tone.classify_samples, samples, rate) if len(samples) else (0, 0.0)
+        await asyncio.sleep(self.latency_s)
+        return ["1) (stand-in) ", f"2) {tone}"]
+
+    async def _openai(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({"type": "session.created", "session": {}})
+        rate, pcm, n = 24000, bytearray(), 0
+        async for msg in ws:
+            event = json.loads(msg.data)
+            kind = event["type"]
+            if kind == "session.update":
+                rate = event["session"]["audio"]["input"]["format"].get("rate", rate)
+                await ws.send_json({"type": "session.updated", "session": event["session"]})
+            elif kind == "input_audio_buffer.append":
+                pcm += base64.b64decode(event["audio"])
+            elif kind == "input_audio_buffer.commit":
+                n += 1
+                await ws.send_json({"type": "input_audio_buffer.committed", "item_id": f"item_in_{n}"})
+            elif kind == "response.create":
+                for delta in await self._answer(pcm, rate):
+                    await ws.send_json({"type": "response.output_text.delta", "delta": delta})
+                pcm = bytearray()
+                await ws.send_json({"type": "response.done", "response": {"output": [{"id": f"item_out_{n}"}]}})
+            elif kind == "conversation.item.delete":
+                await ws.send_json({"type": "conversation.item.deleted", "item_id": event["item_id"]})
+        return ws
+
+    async def _gemini(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        rate, pcm, transcribe = 16000, bytearray(), False
+
+        async def send(obj: dict) -> None:
+            await ws.send_bytes(json.dumps(obj).encode())
+
+        async for msg in ws:
+            message = json.loads(msg.data)
+            if "setup" in message:
+                transcribe = "outputAudioTranscription" in message["setup"]
+                await send({"setupComplete": {}})
+                continue
+            realtime = message.get("realtimeInput", {})
+            if "activityStart" in realtime:
+                pcm = bytearray()
+            elif "audio" in realtime:
+                rate = int(realtime["audio"]["mimeType"].rsplit("=", 1)[-1])
+                pcm += base64.b64decode(realtime["audio"]["data"])
+            elif "activityEnd" in realtime:
+                for text in await self._answer(pcm, rate):
+                    content = {"outputTranscription": {"text": text}} if transcribe else {"modelTurn": {"parts": [{"text": text}]}}
+                    await send({"serverContent": content})
+                await send({"serverContent": {"turnComplete": True}})
+        return ws
+
+
+def batch_answer(model: str, samples: np.ndarray, sr: int) -> dict:
+    """The batch path after end of speech: WAV-encode the clip, one completion."""
+    start = time.perf_counter()
+    pred, pinyin, raw = run_tone_eval.run_encoded(model, *run_tone_eval.encode_audio(samples, sample_rate=sr))
+    elapsed = time.perf_counter() - start
+    return {"text": raw, "first_text_s": elapsed, "answer_s": elapsed}
+
+
+def latency_report(rows: list[dict]) -> str:
+    paths = list(dict.fromkeys((r["model"], r["path"]) for r in rows))
+    width = max([len("model")] + [len(m) for m, _ in paths])
+    lines = [f"{'model':<{width}}  {'path':8s}  {'turns':>5}  {'first text':>10}  {'answer p50':>10}  {'answer p90':>10}  {'accuracy':>8}"]
+    for model, path in paths:
+        sel = [r for r in rows if r["model"] == model and r["path"] == path]
+        answer = sorted(r["answer_s"] for r in sel)
+        labelled = [r for r in sel if r["true_tone"]]
+        acc = f"{sum(r['predicted_tone'] == str(r['true_tone']) for r in labelled) / len(labelled):8.3f}" if labelled else f"{'-':>8}"
+        lines.append(
+            f"{model:<{width}}  {path:8s}  {len(sel):>5}  {statistics.median(r['first_text_s'] for r in sel) * 1000:8.0f}ms"
+            f"  {statistics.median(answer) * 1000:8.0f}ms  {answer[min(len(answer) - 1, int(0.9 * len(answer)))] * 1000:8.0f}ms  {acc}"
+        )
+    return "end of speech -> answer:\n" + "\n".join(lines)
+
+
+async def run(args, models: list[str], batch_models: list[str], clips: list[tuple[str, int, object]]) -> list[dict]:
+    """Evaluate every clip on every realtime model (streamed concurrently) and batch model.
+    clips: (name, true_tone, loader) with loader() -> (samples, sr), or None for a microphone turn."""
+    rows = []
+    stand_in = StandInServer(args.stand_in_latency_ms / 1000) if args.stand_in else None
+    base_url = None
+    if stand_in is not None:
+        await stand_in.__aenter__()
+        base_url = stand_in.url
+    try:
+        async with aiohttp.ClientSession() as http:
+            sessions = [session_for(http, m, TONE_DEFINITIONS, base_url) for m in models]
+            with profiling.span("connect"):
+                await asyncio.gather(*(s.open() for s in sessions))
+            try:
+                for idx, (name, true_tone, loader) in enumerate(clips, start=1):
+                    queues = [asyncio.Queue() for _ in sessions]
+                    rates = [s.rate for s in sessions]
+                    turns = asyncio.gather(*(stream_turn(s, q) for s, q in zip(sessions, queues)))
+                    start = time.perf_counter()
+                    if loader is None:
+                        captured: list = []
+                        speech_end = await play_microphone(args.duration, args.chunk_ms, queues, rates, captured)
+                        samples, sr = captured[0], 16000
+                    else:
+                        samples, sr = loader()
+                        speech_end = await play_file(samples, sr, args.chunk_ms, queues, rates)
+                    results = await turns
+                    speech_s = speech_end - start
+                    answers = []
+                    for s, r in zip(sessions, results):
+                        # Timed from end of speech (the turn closes once the queue drains)
+                        answers.append((s.model, "realtime", {
+                            "text": r["text"],
+                            "first_text_s": r["turn_end"] - r["answer_s"] + r["first_text_s"] - speech_end,
+                            "answer_s": r["turn_end"] - speech_end,
+                        }))
+                    for m in batch_models:
+                        answers.append((m, "batch", await asyncio.to_thread(batch_answer, m, samples, sr)))
+                    for model, path, r in answers:
+                        rows.append({
+                            "model": model,
+                            "path": path,
+                            "audio_file": name,
+                            "true_tone": true_tone,
+                            "predicted_tone": parse_predicted_tone(r["text"]),
+                            "heard_pinyin": parse_heard_pinyin(r["text"]),
+                            "raw_response": r["text"].replace("\n", " ").strip(),
+                            "speech_s": round(speech_s, 4),
+                            "first_text_s": round(r["first_text_s"], 4),
+                            "answer_s": round(r["answer_s"], 4),
+                        })
+                    summary = ", ".join(f"{m} ({p}) {r['answer_s'] * 1000:.0f} ms" for m, p, r in answers)
+                    print(f"  [{idx}/{len(clips)}] {name}: {summary}", flush=True)
+            finally:
+                await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+    finally:
+        if stand_in is not None:
+            await stand_in.__aexit__(None, None, None)
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stream audio to realtime model sessions; time end of speech to answer.")
+    parser.add_argument("--models", type=str, default=None, help="Comma-separated realtime models (default: " + ",".join(REALTIME_MODELS) + ")")
+    parser.add_argument("--batch-models", type=str, default="", help="Comma-separated run_tone_eval models to time on the same clips")
+    parser.add_argument("--record", action="store_true", help="Stream from the microphone (requires sounddevice)")
+    parser.add_argument("--turns", type=int, default=3, help="With --record: number of syllables to record (default: 3)")
+    parser.add_argument("--duration", type=float, default=1.5, help="With --record: seconds per turn (default: 1.5)")
+    parser.add_argument("--audio-file", type=Path, default=None, help="Stream one audio file")
+    parser.add_argument("--manifest", type=Path, default=None, help="Manifest or corpus index (default: synthetic_tones/manifest.json, or the --pack labels)")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Clip directory (default: index root, else synthetic_tones)")
+    parser.add_argument("--pack", type=Path, default=None, help="Read clips from a packed corpus")
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N clips")
+    parser.add_argument("--chunk-ms", type=int, default=DEFAULT_CHUNK_MS, help=f"PCM chunk length in ms (default: {DEFAULT_CHUNK_MS})")
+    parser.add_argument("--stand-in", action="store_true", help="Use local stand-in servers instead of the providers")
+    parser.add_argument("--stand-in-latency-ms", type=float, default=150.0, help="Stand-in answer delay after a turn / request (default: 150)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Output CSV (default: results/realtime_eval.csv)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "realtime_eval")
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    models = [m.strip() for m in args.models.split(",")] if args.models else REALTIME_MODELS
+    batch_models = [m.strip() for m in args.batch_models.split(",") if m.strip()]
+    for m in models:
+        if m.split("/", 1)[0] not in ("openai", "gemini"):
+            parser.error(f"{m}: only openai/ (Realtime) and gemini/ (Live) models can be streamed")
+
+    if args.record:
+        clips = [(f"recording_{i + 1}", 0, None) for i in range(args.turns)]
+    elif args.audio_file is not None:
+        path = resolve(args.audio_file)
+        clips = [(path.name, 0, lambda: local_tone.load_audio(path))]
+    else:
+        pack = PackedCorpus(resolve(args.pack)) if args.pack is not None else None
+        manifest_path = resolve(args.manifest or run_tone_eval.DEFAULT_MANIFEST)
+        manifest = pack.manifest() if pack is not None and args.manifest is None else run_tone_eval.load_manifest(manifest_path)
+        if pack is not None:
+            clips = [(f, manifest[f], lambda f=f: pack.pcm(f)) for f in sorted(manifest) if f in pack]
+        else:
+            audio_dir = resolve(args.audio_dir or run_tone_eval.manifest_audio_dir(manifest_path) or run_tone_eval.DEFAULT_AUDIO_DIR)
+            clips = [
+                (f, manifest[f], lambda f=f: local_tone.load_audio(audio_dir / f))
+                for f in sorted(manifest) if (audio_dir / f).exists()
+            ]
+    clips = clips[:args.limit] if args.limit else clips
+    if not clips:
+        print("No clips found.", file=sys.stderr)
+        return 1
+
+    mock = None
+    if args.stand_in and batch_models:
+        # The batch path goes to mock_provider.py with the same answer delay
+        mock = MockProviderServer(latency_s=args.stand_in_latency_ms / 1000).__enter__()
+        os.environ.update(
+            OPENAI_API_KEY="stand-in", OPENAI_BASE_URL=f"{mock.url}/v1",
+            GEMINI_API_KEY="stand-in", GEMINI_API_BASE=f"{mock.url}/v1beta",
+        )
+    print(f"{len(clips)} turns × {len(models)} realtime + {len(batch_models)} batch models" + (" (stand-in)" if args.stand_in else ""))
+    try:
+        rows = asyncio.run(run(args, models, batch_models, clips))
+    finally:
+        if mock is not None:
+            mock.__exit__(None, None, None)
+
+    out_csv = resolve(args.output)
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with profiling.span("write"), open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        w.writeheader()
+        w.writerows(rows)
+    print(f"Wrote {len(rows)} rows to {out_csv}\n")
+    print(latency_report(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Re-apply the current reply parsers (tone_parsing.py) to stored results without calling any API.
+
+Every results CSV keeps the model's answer in raw_response, so when parse_predicted_tone or
+parse_heard_pinyin improves, the predicted_tone and heard_pinyin columns can be recomputed
+offline. Each file is streamed in chunks of --chunk-rows rows; the raw responses of a chunk are
+parsed in a worker process while later chunks are read, with at most --prefetch chunks in
+flight, so memory stays bounded for multi-million-row histories. Output rows keep their order
+and every other column.
+
+Rows that were not parsed from a model reply are copied unchanged: local scorers (model or
+cascade stage local/...) and API errors (raw_response starting with "litellm.").
+
+A diff summary per model is printed: rows whose predicted tone or pinyin changed, answers
+recovered (was empty, now parsed) or lost, and accuracy before and after when true_tone is
+present.
+
+Usage:
+  python scripts/reparse_results.py results/tone_eval.csv                  # -> results/tone_eval_reparsed.csv
+  python scripts/reparse_results.py results/*.csv --in-place --workers 8
+  python scripts/reparse_results.py results/big_history.csv --dry-run --examples 20
+"""
+
+import argparse
+import csv
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+from tone_parsing import parse_heard_pinyin, parse_predicted_tone
+
+_ROOT = Path(__file__).resolve().parent.parent
+CHUNK_ROWS = 20_000
+LOCAL_PREFIX = "local/"
+ERROR_PREFIX = "litellm."
+DIFF_COLUMNS = ("rows", "tone_changed", "pinyin_changed", "recovered", "lost", "correct_before", "correct_after", "labelled")
+
+
+def parse_chunk(raws: list[str | None]) -> list[tuple[str, str] | None]:
+    """(predicted_tone, heard_pinyin) per raw response; None for rows to copy unchanged.
+    Replies repeat a lot (short answers, refusals), so each distinct text is parsed once."""
+    parsed: dict[str | None, tuple[str, str] | None] = {None: None}
+    out = []
+    for raw in raws:
+        result = parsed.get(raw, parsed)
+        if result is parsed:
+            result = parsed[raw] = (parse_predicted_tone(raw), parse_heard_pinyin(raw))
+        out.append(result)
+    return out
+
+
+def read_chunks(reader, raw_col: int, model_col: int | None, stage_col: int | None, chunk_rows: int):
+    """(rows, raw responses) chunks from a csv.reader; raw is None for rows not to re-parse."""
+    rows, raws = [], []
+    for row in reader:
+        try:
+            raw = row[raw_col]
+            if (
+                raw.startswith(ERROR_PREFIX)
+                or (model_col is not None and row[model_col].startswith(LOCAL_PREFIX))
+                or (stage_col is not None and row[stage_col].startswith(LOCAL_PREFIX))
+            ):
+                raw = None
+        except IndexError:  # short row
+            raw = row[raw_col] if raw_col < len(row) else ""
+        rows.append(row)
+        raws.append(raw)
+        if len(rows) >= chunk_rows:
+            yield rows, raws
+            rows, raws = [], []
+    if rows:
+        yield rows, raws
+
+
+def parsed_chunks(chunks, pool: ProcessPoolExecutor | None, prefetch: int):
+    """(rows, parsed) in input order; at most prefetch chunks are held at once."""
+    if pool is None:
+        for rows, raws in chunks:
+            yield rows, parse_chunk(raws)
+        return
+    pending: deque = deque()
+    for rows, raws in chunks:
+        pending.append((rows, pool.submit(parse_chunk, raws)))
+        if len(pending) >= prefetch:
+            rows, fut = pending.popleft()
+            yield rows, fut.result()
+    while pending:
+        rows, fut = pending.popleft()
+        yield rows, fut.result()
+
+
+def reparse_file(
+    src: Path,
+    dst: Path | None,
+    pool: ProcessPoolExecutor | None,
+    chunk_rows: int,
+    prefetch: int,
+    examples: int = 0,
+) -> tuple[dict[str, dict[str, int]], list[tuple]]:
+    """Re-parse src into dst (None: only diff). Returns ({model: diff counts}, example changes)."""
+    diff: dict[str, dict[str, int]] = {}
+    shown: list[tuple] = []
+    with open(src, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None or "raw_response" not in header:
+            raise ValueError(f"{src}: no raw_response column")
+        col = {name: i for i, name in enumerate(header)}
+        for name in ("predicted_tone", "heard_pinyin"):
+            if name not in col:
+                col[name] = len(header)
+                header.append(name)
+        i_model, i_tone, i_pinyin, i_true = col.get("model"), col["predicted_tone"], col["heard_pinyin"], col.get("true_tone")
+        width = len(header)
+        out = open(dst, "w", newline="", encoding="utf-8") if dst is not None else None
+        try:
+            writer = csv.writer(out) if out is not None else None
+            if writer is not None:
+                writer.writerow(header)
+            chunks = read_chunks(reader, col["raw_response"], i_model, col.get("stage"), chunk_rows)
+            for rows, parsed in parsed_chunks(chunks, pool, prefetch):
+                with profiling.span("diff", rows=len(rows)):
+                    for row, new in zip(rows, parsed):
+                        if len(row) < width:
+                            row.extend([""] * (width - len(row)))
+                        model = row[i_model] if i_model is not None else ""
+                        d = diff.get(model)
+                        if d is None:
+                            d = diff[model] = dict.fromkeys(DIFF_COLUMNS, 0)
+                        d["rows"] += 1
+                        old_tone, old_pinyin = row[i_tone], row[i_pinyin]
+                        tone, pinyin = (old_tone, old_pinyin) if new is None else new
+                        if tone != old_tone:
+                            d["tone_changed"] += 1
+                            d["recovered"] += not old_tone
+                            d["lost"] += not tone
+                            if len(shown) < examples:
+                                shown.append((model, row[col["raw_response"]], old_tone, tone))
+                        d["pinyin_changed"] += pinyin != old_pinyin
+                        if i_true is not None and row[i_true]:
+                            d["labelled"] += 1
+                            d["correct_before"] += old_tone == row[i_true]
+                            d["correct_after"] += tone == row[i_true]
+                        row[i_tone], row[i_pinyin] = tone, pinyin
+                if writer is not None:
+                    with profiling.span("write", rows=len(rows)):
+                        writer.writerows(rows)
+        finally:
+            if out is not None:
+                out.close()
+    return diff, shown
+
+
+def format_diff(diff: dict[str, dict[str, int]]) -> str:
+    width = max([len("model")] + [len(m) for m in diff])
+    lines = [f"  {'model':<{width}}  {'rows':>9}  {'tone Δ':>8}  {'pinyin Δ':>8}  {'recovered':>9}  {'lost':>6}  accuracy"]
+    for model in sorted(diff):
+        d = diff[model]
+        acc = (
+            f"{d['correct_before'] / d['labelled']:.4f} -> {d['correct_after'] / d['labelled']:.4f}"
+            if d["labelled"] else "-"
+        )
+        lines.append(
+            f"  {model:<{width}}  {d['rows']:>9}  {d['tone_changed']:>8}  {d['pinyin_changed']:>8}  "
+            f"{d['recovered']:>9}  {d['lost']:>6}  {acc}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Re-parse stored raw responses with the current parsers.")
+    parser.add_argument("csvs", nargs="+", type=Path, help="Result CSVs with a raw_response column")
+    dest = parser.add_mutually_exclusive_group()
+    dest.add_argument("--in-place", action="store_true", help="Replace each input (via a temporary file) instead of writing <stem>_reparsed.csv")
+    dest.add_argument("--output-dir", type=Path, default=None, help="Write <name> into this directory instead of next to the input")
+    dest.add_argument("--dry-run", action="store_true", help="Only print the diff summary; write nothing")
+    parser.add_argument("--examples", type=int, default=0, help="Print up to N changed rows per file")
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Parser processes (default: min(8, CPUs); 0 = in this process)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"Rows per chunk sent to a worker (default: {CHUNK_ROWS})")
+    parser.add_argument("--prefetch", type=int, default=None, help="Chunks in flight (default: 2 × workers)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "reparse_results")
+    csv.field_size_limit(sys.maxsize)
+
+    paths = [p if p.is_absolute() else _ROOT / p for p in args.csvs]
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        print(f"Error: file not found: {', '.join(map(str, missing))}", file=sys.stderr)
+        return 1
+    prefetch = args.prefetch or max(2, 2 * args.workers)
+    total: dict[str, dict[str, int]] = {}
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 0 else None
+    try:
+        for src in paths:
+            if args.dry_run:
+                dst = None
+            elif args.in_place:
+                dst = src.with_name(f".{src.name}.reparse.tmp")
+            elif args.output_dir is not None:
+                out_dir = args.output_dir if args.output_dir.is_absolute() else _ROOT / args.output_dir
+                out_dir.mkdir(parents=True, exist_ok=True)
+                dst = out_dir / src.name
+                if dst.resolve() == src.resolve():
+                    print(f"Error: --output-dir would overwrite {src}; use --in-place", file=sys.stderr)
+                    return 1
+            else:
+                dst = src.with_name(f"{src.stem}_reparsed.csv")
+            try:
+                diff, shown = reparse_file(src, dst, pool, args.chunk_rows, prefetch, args.examples)
+            except ValueError as e:
+                print(f"Skipping {e}", file=sys.stderr)
+                if dst is not None:
+                    dst.unlink(missing_ok=True)
+                continue
+            if args.in_place:
+                dst.replace(src)
+                dst = src
+            n_rows = sum(d["rows"] for d in diff.values())
+            n_changed = sum(d["tone_changed"] for d in diff.values())
+            print(f"{src}: {n_rows} rows, {n_changed} predicted tones changed" + (f" -> {dst}" if dst is not None else ""))
+            print(format_diff(diff))
+            for model, raw, old, new in shown:
+                print(f"    {model}: {old or '(none)'} -> {new or '(none)'}  {raw[:100]!r}")
+            for model, d in diff.items():
+                t = total.setdefault(model, dict.fromkeys(DIFF_COLUMNS, 0))
+                for k, v in d.items():
+                    t[k] += v
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if len(paths) > 1 and total:
+        print("\nAll files:")
+        print(format_diff(total))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
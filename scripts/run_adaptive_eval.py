@@ -0,0 +1,290 @@
+"""
+Adaptive model evaluation: stop querying a model once its result is settled.
+
+Clips are visited in a stratified random order (tones interleaved, shuffled within each tone,
+--seed) and evaluated in rounds of --batch-size clips for every model still active. After each
+round every model gets a Wilson score interval for its accuracy, and a model stops being
+queried once
+  - its interval is disjoint from every other model's interval (its rank is settled), or
+  - with --threshold, its interval lies entirely above or below the threshold.
+Intervals are Bonferroni-corrected over models and rounds, so looking after every round keeps
+the overall chance of a wrong stop below 1 - --confidence. No model stops before --min-clips.
+
+--max-calls and --max-cost (USD) cap the run: a round that would go over either budget is not
+started. Cost is the LiteLLM-reported cost where available, else estimated from the capability
+index (scripts/model_index.py). Local models are free and not counted as calls.
+
+Rows (run_tone_eval columns plus round, latency_s, cost_usd) are written as they finish; the
+report lists each model's interval and stop reason and the calls saved compared with the full
+model × clip grid.
+
+Usage:
+  python scripts/run_adaptive_eval.py --manifest audio_syllabs/manifest_15syllables.json --audio-dir audio_syllabs
+  python scripts/run_adaptive_eval.py --pack results/syllabs.pack --threshold 0.25 --confidence 0.99
+  python scripts/run_adaptive_eval.py ... --batch-size 24 --max-calls 2000 --max-cost 5 --workers 16
+"""
+
+import argparse
+import csv
+import math
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from statistics import NormalDist
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import http_pool
+import model_index
+import profiling
+import run_tone_eval
+from packed_corpus import PackedCorpus
+from run_tone_eval import LOCAL_MODELS, MODELS, TONE_DEFINITIONS, encode_audio, encode_bytes, run_encoded, run_local
+
+_ROOT = Path(__file__).resolve().parent.parent
+FIELDNAMES = [
+    "model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response",
+    "round", "latency_s", "cost_usd",
+]
+# Token counts for estimating the cost of one call before any cost has been reported
+PROMPT_TOKENS = len(TONE_DEFINITIONS) // 4
+AUDIO_TOKENS_PER_CLIP = 50  # ~1.5 s at Gemini's 32 audio tokens/s
+OUTPUT_TOKENS = 30
+
+
+def wilson_interval(correct: int, n: int, z: float) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion; (0, 1) when n == 0."""
+    if n == 0:
+        return 0.0, 1.0
+    p = correct / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_order(manifest: dict[str, int], files: list[str], seed: int) -> list[str]:
+    """files shuffled within each tone, then interleaved tone by tone, so any prefix is balanced."""
+    rng = random.Random(seed)
+    by_tone: dict[int, list[str]] = {}
+    for f in sorted(files):
+        by_tone.setdefault(manifest[f], []).append(f)
+    for group in by_tone.values():
+        rng.shuffle(group)
+    order = []
+    for k in range(max((len(g) for g in by_tone.values()), default=0)):
+        order.extend(g[k] for _, g in sorted(by_tone.items()) if k < len(g))
+    return order
+
+
+def stop_reason(
+    model: str,
+    bounds: dict[str, tuple[float, float]],
+    threshold: float | None,
+) -> str | None:
+    """Why model's result is settled ("above 0.25", "below 0.25", "rank"), or None; bounds holds
+    the models it is ranked against (and itself)."""
+    lo, hi = bounds[model]
+    if threshold is not None:
+        if lo > threshold:
+            return f"above {threshold:g}"
+        if hi < threshold:
+            return f"below {threshold:g}"
+    others = [b for m, b in bounds.items() if m != model]
+    if others and all(hi < o_lo or lo > o_hi for o_lo, o_hi in others):
+        return "rank"
+    return None
+
+
+def estimated_call_cost(model: str, observed: list[float]) -> float:
+    """USD per call: the mean reported cost so far, else the capability-index estimate (0 if unknown)."""
+    if model in LOCAL_MODELS:
+        return 0.0
+    if observed:
+        return sum(observed) / len(observed)
+    cost = model_index.estimate_cost(
+        run_tone_eval.capabilities(), model,
+        input_tokens=PROMPT_TOKENS, output_tokens=OUTPUT_TOKENS, input_audio_tokens=AUDIO_TOKENS_PER_CLIP,
+    )
+    return cost or 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Evaluate models adaptively, dropping each once its result is settled.")
+    parser.add_argument("--manifest", type=Path, default=None, help="Manifest or corpus index (default: synthetic_tones/manifest.json, or the --pack labels)")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Clip directory (default: index root, else synthetic_tones)")
+    parser.add_argument("--pack", type=Path, default=None, help="Read clips (and labels, unless --manifest) from a packed corpus")
+    parser.add_argument("--models", type=str, default=None, help="Comma-separated models (default: run_tone_eval.MODELS)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Overall confidence of the stop decisions (default: 0.95)")
+    parser.add_argument("--threshold", type=float, default=None, help="Also stop a model once its accuracy is surely above or below this, e.g. 0.25 (chance)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Clips per round (default: 16)")
+    parser.add_argument("--min-clips", type=int, default=32, help="Clips every model sees before it may stop (default: 32)")
+    parser.add_argument("--max-calls", type=int, default=None, help="Stop before a round that would exceed this many API calls")
+    parser.add_argument("--max-cost", type=float, default=None, help="Stop before a round whose estimated cost would exceed this many USD")
+    parser.add_argument("--seed", type=int, default=0, help="Clip order seed (default: 0)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests (default: 8)")
+    parser.add_argument("--output", type=Path, default=None, help="Output CSV (default: results/tone_eval_<name>_adaptive.csv)")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "run_adaptive_eval")
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be between 0 and 1")
+    http_pool.configure(max_connections=max(http_pool.DEFAULT_MAX_CONNECTIONS, args.workers))
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    models = [m.strip() for m in args.models.split(",")] if args.models else MODELS
+    remote = [m for m in models if m not in LOCAL_MODELS]
+    errors, warnings = model_index.validate_models(run_tone_eval.capabilities(), remote) if remote else ([], [])
+    errors += run_tone_eval.validate_local_models(models)
+    for w in warnings:
+        print(f"Warning: {w}", file=sys.stderr)
+    if errors:
+        parser.error("; ".join(errors))
+
+    pack = PackedCorpus(resolve(args.pack)) if args.pack is not None else None
+    manifest_path = resolve(args.manifest or run_tone_eval.DEFAULT_MANIFEST)
+    if pack is not None and args.manifest is None:
+        manifest = pack.manifest()
+        name = pack.path.stem
+    else:
+        manifest = run_tone_eval.load_manifest(manifest_path)
+        name = run_tone_eval.default_output_csv(manifest_path).stem.removeprefix("tone_eval_").removeprefix("tone_eval")
+    if pack is not None:
+        files = [f for f in manifest if f in pack]
+    else:
+        audio_dir = resolve(args.audio_dir or run_tone_eval.manifest_audio_dir(manifest_path) or run_tone_eval.DEFAULT_AUDIO_DIR)
+        files = [f for f in manifest if (audio_dir / f).exists()]
+    order = stratified_order(manifest, files, args.seed)
+    if not order:
+        print("No clips found.", file=sys.stderr)
+        return 1
+
+    def clip_audio(filename: str) -> Path | tuple:
+        return pack.pcm(filename) if pack is not None else audio_dir / filename
+
+    def clip_payload(filename: str) -> tuple[str, str]:
+        if pack is not None:
+            return encode_bytes(pack.data(filename), pack.entry(filename)["format"])
+        return encode_audio(audio_dir / filename)
+
+    n_rounds = -(-len(order) // args.batch_size)
+    alpha = 1 - args.confidence
+    z = NormalDist().inv_cdf(1 - alpha / (2 * len(models) * n_rounds))
+    print(
+        f"{len(models)} models × {len(order)} clips, up to {n_rounds} rounds of {args.batch_size}; "
+        f"z = {z:.2f} ({args.confidence:.0%} overall, Bonferroni over models and rounds)"
+    )
+
+    correct = {m: 0 for m in models}
+    seen = {m: 0 for m in models}
+    costs: dict[str, list[float]] = {m: [] for m in models}
+    bounds = {m: (0.0, 1.0) for m in models}
+    stopped: dict[str, tuple[str, int]] = {}  # model -> (reason, round)
+    calls = 0
+    spent = 0.0
+    budget_stop = ""
+
+    def run_cell(model: str, filename: str, payloads: dict[str, tuple[str, str]]) -> tuple[str, str, str, dict]:
+        stats: dict = {"latency_s": 0.0, "cost_usd": 0.0}
+        if model in LOCAL_MODELS:
+            pred, pinyin, raw = run_local(model, clip_audio(filename))
+        else:
+            pred, pinyin, raw = run_encoded(model, *payloads[filename], TONE_DEFINITIONS, stats)
+        return pred, pinyin, raw, stats
+
+    out_csv = resolve(args.output or run_tone_eval.RESULTS_DIR / f"tone_eval_{name}_adaptive.csv")
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_csv, "w", newline="", encoding="utf-8") as fh, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        w = csv.DictWriter(fh, fieldnames=FIELDNAMES)
+        w.writeheader()
+        for rnd in range(1, n_rounds + 1):
+            active = [m for m in models if m not in stopped]
+            if not active:
+                break
+            batch = order[(rnd - 1) * args.batch_size: rnd * args.batch_size]
+            active_remote = [m for m in active if m not in LOCAL_MODELS]
+            round_calls = len(batch) * len(active_remote)
+            round_cost = len(batch) * sum(estimated_call_cost(m, costs[m]) for m in active_remote)
+            if args.max_calls is not None and calls + round_calls > args.max_calls:
+                budget_stop = f"call budget ({calls} of {args.max_calls} used, round {rnd} needs {round_calls})"
+                break
+            if args.max_cost is not None and spent + round_cost > args.max_cost:
+                budget_stop = f"cost budget (${spent:.4f} of ${args.max_cost:g} used, round {rnd} needs ~${round_cost:.4f})"
+                break
+
+            with profiling.span("encode"):
+                payloads = {f: clip_payload(f) for f in batch} if active_remote else {}
+            cells = [(m, f) for m in active for f in batch]
+            results = pool.map(lambda cell: run_cell(*cell, payloads), cells)
+            rows = []
+            for (model, filename), (pred, pinyin, raw, stats) in zip(cells, results):
+                seen[model] += 1
+                correct[model] += pred == str(manifest[filename])
+                if model not in LOCAL_MODELS:
+                    calls += 1
+                    cost = stats["cost_usd"] or estimated_call_cost(model, costs[model])
+                    if stats["cost_usd"]:
+                        costs[model].append(stats["cost_usd"])
+                    spent += cost
+                rows.append({
+                    "model": model,
+                    "audio_file": filename,
+                    "true_tone": manifest[filename],
+                    "predicted_tone": pred or "",
+                    "heard_pinyin": pinyin or "",
+                    "raw_response": raw.replace("\n", " ").strip(),
+                    "round": rnd,
+                    "latency_s": round(stats["latency_s"], 4),
+                    "cost_usd": stats["cost_usd"],
+                })
+            with profiling.span("write"):
+                w.writerows(rows)
+                fh.flush()
+
+            for m in active:
+                bounds[m] = wilson_interval(correct[m], seen[m], z)
+            # A model stopped on the threshold keeps a wide frozen interval; it no longer takes part in ranking
+            ranked = {m: b for m, b in bounds.items() if m not in stopped or stopped[m][0] == "rank"}
+            newly = []
+            for m in active:
+                reason = stop_reason(m, ranked, args.threshold) if seen[m] >= args.min_clips else None
+                if reason:
+                    newly.append((m, reason))
+            for m, reason in newly:
+                stopped[m] = (reason, rnd)
+            still = len(active) - len(newly)
+            note = "; stopped " + ", ".join(f"{m} ({r})" for m, r in newly) if newly else ""
+            print(f"  round {rnd}/{n_rounds}: {len(batch)} clips × {len(active)} models, {calls} calls, ${spent:.4f}; {still} active{note}", flush=True)
+
+    full_calls = len(order) * len(remote)
+    full_cost = sum(len(order) * estimated_call_cost(m, costs[m]) for m in remote)
+    print(f"\nWrote {sum(seen.values())} rows to {out_csv}")
+    if budget_stop:
+        print(f"Stopped early: {budget_stop}")
+    width = max(len(m) for m in models)
+    print(f"\n{'model':<{width}}  {'clips':>5}  {'acc':>6}  {'interval':>15}  status")
+    for m in sorted(models, key=lambda m: -(correct[m] / seen[m] if seen[m] else 0.0)):
+        acc = correct[m] / seen[m] if seen[m] else 0.0
+        lo, hi = bounds[m]
+        if m in stopped:
+            status = f"settled ({stopped[m][0]}) after round {stopped[m][1]}"
+        else:
+            status = "unsettled" if seen[m] else "not run"
+        print(f"{m:<{width}}  {seen[m]:>5}  {acc:>6.3f}  [{lo:.3f}, {hi:.3f}]  {status}")
+    saved = full_calls - calls
+    print(
+        f"\nAPI calls: {calls} of {full_calls} for the full grid "
+        f"({saved} saved, {saved / full_calls:.0%})" if full_calls else "\nAPI calls: 0 (local models only)"
+    )
+    if full_calls:
+        print(f"Cost: ${spent:.4f} (estimated full grid ${full_cost:.4f}, saved ~${full_cost - spent:.4f})")
+    report = http_pool.report()
+    if report:
+        print(f"\n{report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,13 +10,37 @@ Usage:
         → synthetic_tones/ + manifest.json (tone1.wav … tone4.wav)
     python run_tone_eval.py --audio-dir audio_syllabs --manifest audio_syllabs/manifest_cai.json
         → audio_syllabs/ with cmn-cai1.mp3 … cmn-cai4.mp3
+    python run_tone_eval.py --manifest audio-cmn/64k/syllabs/index.json
+        → every clip of a corpus index from index_corpus.py (audio dir defaults to the index root)
+    python run_tone_eval.py --pack results/syllabs.pack
+        → clips and labels from a packed corpus (packed_corpus.py), read through one memory map
+    Default output: results/tone_eval_<name>.csv for manifest_<name>.json (tone_eval.csv for manifest.json).
   Single file (no manifest):
     python run_tone_eval.py --audio-file /path/to/my.wav
         → evaluate one recording; prints heard pinyin and predicted tone per model.
+  Cascade (local F0 scorer first, LLM tiers only for low-confidence clips):
+    python run_tone_eval.py --manifest audio_syllabs/manifest_15syllables.json --audio-dir audio_syllabs --cascade
+    python run_tone_eval.py ... --cascade --cascade-threshold 0.9 --compare-csv results/tone_eval_15syllables.csv
+        → escalation rate, latency, cost saved and accuracy vs the full fan-out CSV.
+  Self-consistency (N answers per clip, stored with a sample_idx column):
+    python run_tone_eval.py ... --samples 5
+        → one request with n=5 where the provider supports it, else 5 concurrent requests;
+          analyze_tone_results.py then reports single-sample vs majority-voted metrics.
+  Streaming with early exit (stop reading once "2) N" has arrived; tokens cut and time saved per row):
+    python run_tone_eval.py ... --stream
+  Upload once, reference many times (Gemini Files API; cache in results/gemini_files.json):
+    python run_tone_eval.py ... --gemini-files
+  Local models (no API call) can be listed in --models, e.g. --models local/contour,gemini/gemini-2.5-pro.
+  Sharded (one slice of the plan per host or process; same flags everywhere except --shard):
+    python run_tone_eval.py --manifest audio-cmn/64k/syllabs/index.json --shard 0/4 --shard-latency results/tone_eval.csv
+    python merge_shards.py results/tone_eval_syllabs_index_shard*of4.csv
   Record from microphone:
     python run_tone_eval.py --record
-        → record from mic (default 3 s), then evaluate with same models.
-    python run_tone_eval.py --record --duration 5 --output results/my_recording.csv
+        → record from mic (default 3 s), then evaluate with same models (from memory; no WAV is written).
+    python run_tone_eval.py --record --duration 5 --output results/my_recording.csv --save-recording results/recorded.wav
+  As a library (bytes, NumPy samples or file-like objects; no files needed):
+    import run_tone_eval
+    rows = run_tone_eval.evaluate_audio(samples, ["local/contour", "gemini/gemini-2.5-pro"], sample_rate=16000)
 """
 
 import argparse
@@ -24,9 +48,11 @@ import base64
 import csv
 import json
 import os
-import re
 import sys
 import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Load .env before litellm
@@ -43,9 +69,24 @@ if os.environ.get("GEMINI_API_KEY") and not os.environ.get("GOOGLE_API_KEY"):
 
 import litellm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import audio_io
+import contour_index
+import gemini_files
+import http_pool
+import local_tone
+import model_index
+import profiling
+import providers
+import sharding
+import streaming
+import tone_nn
+from tone_parsing import parse_heard_pinyin, parse_predicted_tone
+from packed_corpus import PackedCorpus
+
 # Models to query. All support audio input + text output.
 # Gemini: 2.0 Flash, 2.5 Pro, etc. (https://docs.cloud.google.com/vertex-ai/generative-ai/docs/migrate)
-# We do not pass modalities/audio for Gemini so the API returns text only.
+# Request shape and reply text per provider come from providers.py adapters.
 MODELS = [
     "openai/gpt-audio-2025-08-28",
     "openai/gpt-4o-audio-preview",  # full 4o audio; mini often refuses to process audio
@@ -55,6 +96,27 @@ MODELS = [
     "gemini/gemini-3.1-pro-preview",
 ]
 
+# Local scorers, selectable like any other model: name -> fn(samples, sample_rate) -> (tone, confidence)
+LOCAL_MODELS = {
+    "local/contour": local_tone.classify_samples,
+    "local/knn": contour_index.classify_samples,  # k nearest clips of results/contour_index.npz
+    "local/nn": tone_nn.classify_samples,  # conv net of results/tone_nn.npz (tone_nn.py train)
+}
+
+# Local models that read a built file: name -> (path, command that builds it)
+LOCAL_MODEL_FILES = {
+    "local/knn": (contour_index.DEFAULT_INDEX, "python scripts/contour_index.py build <corpus>"),
+    "local/nn": (tone_nn.DEFAULT_MODEL, "python scripts/tone_nn.py train <corpus>"),
+}
+
+# Cascade: LLM tiers tried in order (cheaper first) for clips the local scorer is unsure about
+CASCADE_LOCAL_MODEL = "local/contour"
+CASCADE_MODELS = [
+    "gemini/gemini-2.5-pro",
+    "gemini/gemini-3.1-pro-preview",
+]
+DEFAULT_CASCADE_THRESHOLD = 0.8
+
 DEFAULT_AUDIO_DIR = _root / "synthetic_tones"
 DEFAULT_MANIFEST = _root / "synthetic_tones" / "manifest.json"
 RESULTS_DIR = _root / "results"
@@ -73,133 +135,454 @@ Reply with:
 
 
 
+def capabilities() -> dict[str, dict]:
+    """Capability index (scripts/model_index.py), loaded once per process."""
+    return providers.capabilities()
+
+
 def load_manifest(manifest_path: Path) -> dict[str, int]:
-    with open(manifest_path) as f:
-        return json.load(f)
+    """{filename: tone} from a manifest, or from an index_corpus.py index (tones 1-4 only)."""
+    with open(manifest_path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data.get("entries"), dict):
+        return {name: e["tone"] for name, e in data["entries"].items() if 1 <= e.get("tone", 0) <= 4}
+    return data
+
+
+def manifest_audio_dir(manifest_path: Path) -> Path | None:
+    """Corpus directory recorded in an index_corpus.py index; None for plain manifests."""
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            root = json.load(f).get("root")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return Path(root) if root else None
+
+
+def default_output_csv(manifest_path: Path) -> Path:
+    """results/tone_eval_<name>.csv for manifest_<name>.json; tone_eval.csv for manifest.json;
+    tone_eval_<stem>.csv for any other manifest or index file."""
+    stem = manifest_path.stem
+    if stem == "manifest":
+        return RESULTS_DIR / "tone_eval.csv"
+    name = stem[len("manifest_"):] if stem.startswith("manifest_") else f"{manifest_path.parent.name}_{stem}"
+    return RESULTS_DIR / f"tone_eval_{name}.csv"
+
+
+def encode_audio(audio, fmt: str | None = None, sample_rate: int | None = None) -> tuple[str, str]:
+    """Return (base64_data, format). Same as docs: raw file bytes, base64.b64encode(...).decode('utf-8').
+
+    audio is a Path, encoded bytes (bytes / bytearray / memoryview), a binary file-like object,
+    or NumPy samples with sample_rate (wrapped in an in-memory WAV, see audio_io.py)."""
+    with profiling.span("read"):
+        data, fmt = audio_io.as_encoded(audio, fmt, sample_rate)
+    return encode_bytes(data, fmt)
 
 
-def encode_audio(path: Path) -> tuple[str, str]:
-    """Return (base64_data, format). Same as docs: raw file bytes, base64.b64encode(...).decode('utf-8')."""
-    data = path.read_bytes()
-    b64 = base64.b64encode(data).decode("utf-8")
-    fmt = "mp3" if path.suffix.lower() == ".mp3" else "wav"
+def encode_bytes(data, fmt: str) -> tuple[str, str]:
+    """encode_audio for bytes already in memory (bytes or a memoryview, e.g. from a PackedCorpus)."""
+    with profiling.span("encode"):
+        b64 = base64.b64encode(data).decode("utf-8")
     return b64, fmt
 
 
-def record_audio(duration_sec: float, sample_rate: int, out_path: Path) -> None:
-    """Record from default microphone for duration_sec, save as WAV to out_path. Requires sounddevice."""
+def record_samples(duration_sec: float, sample_rate: int):
+    """Record from default microphone for duration_sec; return mono float32 samples. Requires sounddevice."""
     try:
         import sounddevice as sd
-        from scipy.io import wavfile
     except ImportError as e:
-        if "sounddevice" in str(e).lower() or "No module named 'sounddevice'" in str(e):
-            raise SystemExit(
-                "Recording requires the sounddevice package. Install with: pip install sounddevice"
-            ) from e
-        raise
+        raise SystemExit(
+            "Recording requires the sounddevice package. Install with: pip install sounddevice"
+        ) from e
     frames = int(duration_sec * sample_rate)
     print(f"Recording for {duration_sec} s at {sample_rate} Hz ... (speak your syllable)", flush=True)
     recording = sd.rec(frames, samplerate=sample_rate, channels=1, dtype="float32")
     sd.wait()
-    # scipy.io.wavfile expects int16; convert float32 [-1,1] to int16
-    import numpy as np
-    recording_int = (np.clip(recording, -1, 1) * 32767).astype(np.int16)
-    wavfile.write(out_path, sample_rate, recording_int)
+    return recording[:, 0]
+
+
+def record_audio(duration_sec: float, sample_rate: int, out_path: Path) -> None:
+    """Record from default microphone for duration_sec, save as WAV to out_path. Requires sounddevice."""
+    out_path.write_bytes(audio_io.wav_bytes(record_samples(duration_sec, sample_rate), sample_rate))
     print(f"Saved to {out_path}", flush=True)
 
 
-def parse_predicted_tone(content: str | None) -> str:
-    """Extract tone 1–4 from model response; return '' if unclear."""
-    if not content:
-        return ""
-    content = content.strip()
-    # Prefer explicit "tone N" or "Tone N"
-    m = re.search(r"\b[Tt]one\s*[:\s]*([1-4])\b", content, re.I)
-    if m:
-        return m.group(1)
-    # Prefer digit after "2)" (we asked for "2) The tone number alone")
-    m = re.search(r"2\)\s*([1-4])\b", content)
-    if m:
-        return m.group(1)
-    # Standalone digit 1–4 that is NOT a list label (not followed by ")" )
-    m = re.search(r"\b([1-4])(?!\))\b", content)
-    if m:
-        return m.group(1)
-    # Fallback: tone digit at end of pinyin (e.g. cai4 -> 4)
-    m = re.search(r"[a-zü]+([1-4])\b", content, re.I)
-    if m:
-        return m.group(1)
-    return ""
-
-
-def parse_heard_pinyin(content: str | None) -> str:
-    """Extract pinyin with tone (e.g. cai1, ma2) from model response; return '' if not found."""
-    if not content:
-        return ""
-    content = content.strip()
-    # Pinyin syllable (letters, optional ü) followed by tone 1-4
-    m = re.search(r"\b([a-zü]+)([1-4])\b", content, re.I)
-    if m:
-        return f"{m.group(1).lower()}{m.group(2)}"
-    return ""
-
-
-def run_one(model: str, audio_path: Path, true_tone: int) -> tuple[str, str, str]:
-    """Call model with audio; return (predicted_tone, heard_pinyin, raw_content)."""
-    encoded, fmt = encode_audio(audio_path)
-    messages = [
+def decode_audio(audio, fmt: str | None = None, sample_rate: int | None = None) -> tuple:
+    """(mono float32 samples, sample_rate) for the inputs encode_audio accepts, or a (samples, sr) tuple."""
+    if isinstance(audio, tuple):
+        return audio
+    if isinstance(audio, (str, Path)):
+        return local_tone.load_audio(Path(audio))
+    if hasattr(audio, "ndim"):  # NumPy samples
+        if sample_rate is None:
+            raise ValueError("sample_rate is required for NumPy audio")
+        return local_tone.pcm_to_float(audio), sample_rate
+    data, fmt = audio_io.as_encoded(audio, fmt)
+    return local_tone.load_audio_bytes(data, fmt)
+
+
+def local_predict(model: str, audio: Path | tuple) -> tuple[int, float]:
+    """(tone, confidence) from a LOCAL_MODELS entry; audio is a file path or (samples, sample_rate)."""
+    with profiling.span("local", model=model):
+        samples, sr = decode_audio(audio)
+        return LOCAL_MODELS[model](samples, sr)
+
+
+def validate_local_models(models: list[str]) -> list[str]:
+    """Errors for local models whose index or weights have not been built yet."""
+    errors = []
+    for model in dict.fromkeys(models):
+        path, command = LOCAL_MODEL_FILES.get(model, (None, None))
+        if path is not None and not path.exists():
+            errors.append(f"{model}: {path} not found; build it with: {command}")
+    return errors
+
+
+def run_local(model: str, audio: Path | tuple) -> tuple[str, str, str]:
+    """Score audio with a LOCAL_MODELS entry; same return shape as run_one."""
+    tone, confidence = local_predict(model, audio)
+    pred = str(tone) if tone else ""
+    return pred, "", f"tone {pred or '?'} (confidence {confidence:.3f})"
+
+
+def build_messages(encoded: str, fmt: str, prompt: str = TONE_DEFINITIONS, file_ref: dict | None = None) -> list[dict]:
+    """Audio plus prompt; with file_ref (gemini_files.reference) the audio is sent as a file URI."""
+    if file_ref is not None:
+        audio = {"type": "file", "file": {"file_id": file_ref["uri"], "format": file_ref["mime_type"]}}
+    else:
+        audio = {"type": "input_audio", "input_audio": {"data": encoded, "format": fmt}}
+    return [
         {
             "role": "user",
             "content": [
-                {
-                    "type": "input_audio",
-                    "input_audio": {"data": encoded, "format": fmt},
-                },
-                {"type": "text", "text": TONE_DEFINITIONS},
+                audio,
+                {"type": "text", "text": prompt},
             ],
         },
     ]
+
+
+def complete_encoded(
+    model: str,
+    encoded: str,
+    fmt: str,
+    prompt: str = TONE_DEFINITIONS,
+    stats: dict | None = None,
+    n: int = 1,
+) -> list[str]:
+    """One completion request; return the reply text of each of its n choices. Raises on API errors."""
+    start = time.perf_counter()
+    with profiling.span("upload", model=model):
+        file_ref = gemini_files.reference(model, encoded, fmt)
+    kwargs = {"model": model, "messages": build_messages(encoded, fmt, prompt, file_ref), "timeout": 90}
+    if n > 1:
+        kwargs["n"] = n
+    # Cheapest valid request shape of the provider (text-only output where allowed)
+    adapter = providers.adapter_for(model)
+    shape = adapter.shape
+    kwargs.update(adapter.request_kwargs(shape))
+    kwargs.update(http_pool.completion_kwargs(model))
+    def send():
+        # Streamed (cut off once the answer is settled) where enabled, else one blocking call
+        text = streaming.complete(kwargs, stats, start) if n == 1 else None
+        return [text] if text is not None else litellm.completion(**kwargs)
+
+    request_start = time.perf_counter()
+    with profiling.span("request", model=model):
+        try:
+            resp = send()
+        except Exception as e:
+            if file_ref is not None and gemini_files.is_stale_reference_error(e, file_ref):
+                # Expired or unknown upload: forget it and send this request inline
+                gemini_files.invalidate(file_ref)
+                file_ref = None
+                kwargs["messages"] = build_messages(encoded, fmt, prompt)
+            elif adapter.rejected_shape(e, shape):
+                # Text-only output refused (here or by a concurrent request): send the shape the model insists on
+                shape = adapter.shape
+                kwargs.update(adapter.request_kwargs(shape))
+            else:
+                raise
+            request_start = time.perf_counter()
+            resp = send()
+    gemini_files.count_request(model, file_ref, time.perf_counter() - request_start)
+    if isinstance(resp, list):
+        return resp  # streamed: stats carry the time to the answer, upload included
+    if stats is not None:
+        stats["latency_s"] = time.perf_counter() - start
+        try:
+            stats["cost_usd"] = float(litellm.completion_cost(completion_response=resp) or 0.0)
+        except Exception:
+            pass
+    return [adapter.extract_text(choice.message) for choice in resp.choices]
+
+
+def run_encoded(
+    model: str,
+    encoded: str,
+    fmt: str,
+    prompt: str = TONE_DEFINITIONS,
+    stats: dict | None = None,
+) -> tuple[str, str, str]:
+    """Call model with already base64-encoded audio; same return and stats as run_one."""
+    start = time.perf_counter()
+    if stats is not None:
+        stats.update(latency_s=0.0, cost_usd=0.0)
     try:
-        kwargs = {"model": model, "messages": messages, "timeout": 90}
-        if model.startswith("openai/"):
-            # OpenAI audio models require modalities + audio output config even for text reply
-            kwargs["modalities"] = ["text", "audio"]
-            kwargs["audio"] = {"voice": "alloy", "format": "wav"}
-        # Gemini: do not pass modalities or audio; it returns "only supports text output" otherwise
-        resp = litellm.completion(**kwargs)
-        msg = resp.choices[0].message
-        # With audio output, text may be in content or in audio.transcript
-        content = (getattr(msg, "content", None) or "").strip()
-        if not content and getattr(msg, "audio", None) is not None:
-            a = msg.audio
-            content = (getattr(a, "transcript", None) or getattr(a, "text", None) or "").strip()
-        if not content and hasattr(msg, "__dict__"):
-            # Fallback: capture any text-like field for debugging
-            for key in ("content", "text", "transcript"):
-                val = getattr(msg, key, None)
-                if val and isinstance(val, str):
-                    content = val.strip()
-                    break
-        pred = parse_predicted_tone(content)
-        pinyin = parse_heard_pinyin(content)
+        content = complete_encoded(model, encoded, fmt, prompt, stats)[0]
+        with profiling.span("parse"):
+            pred = parse_predicted_tone(content)
+            pinyin = parse_heard_pinyin(content)
         return pred, pinyin, content
     except Exception as e:
+        if stats is not None:
+            stats["latency_s"] = time.perf_counter() - start
         return "", "", str(e)
 
 
+def supports_n(model: str) -> bool:
+    """Whether LiteLLM maps the OpenAI `n` parameter (several choices per request) for model."""
+    return providers.adapter_for(model).batching
+
+
+def run_samples(
+    model: str,
+    encoded: str,
+    fmt: str,
+    n: int,
+    prompt: str = TONE_DEFINITIONS,
+) -> list[tuple[str, str, str, dict]]:
+    """Draw n answers for one clip: a single request with `n` choices where the provider supports
+    it, otherwise n concurrent requests sharing the same encoded payload.
+    Returns [(predicted_tone, heard_pinyin, raw, stats)] with one entry per sample."""
+    if supports_n(model):
+        stats = {"latency_s": 0.0, "cost_usd": 0.0}
+        try:
+            contents = complete_encoded(model, encoded, fmt, prompt, stats, n=n)
+        except litellm.UnsupportedParamsError:
+            providers.adapter_for(model).batching = False  # provider rejected n; fall through to concurrent requests
+            contents = []
+        except Exception as e:
+            return [("", "", str(e), {"latency_s": stats["latency_s"], "cost_usd": 0.0}) for _ in range(n)]
+        if contents:
+            # One request: split its cost evenly, every sample shares its latency
+            per = {"latency_s": stats["latency_s"], "cost_usd": stats["cost_usd"] / len(contents)}
+            with profiling.span("parse"):
+                samples = [(parse_predicted_tone(c), parse_heard_pinyin(c), c, dict(per)) for c in contents]
+            # Some providers silently return fewer choices than asked; top up with single requests
+            for _ in range(n - len(samples)):
+                st: dict = {}
+                samples.append((*run_encoded(model, encoded, fmt, prompt, st), st))
+            return samples[:n]
+
+    def one(_):
+        st: dict = {}
+        return (*run_encoded(model, encoded, fmt, prompt, st), st)
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(one, range(n)))
+
+
+def run_one(
+    model: str,
+    audio_path: Path,
+    true_tone: int,
+    stats: dict | None = None,
+    prompt: str = TONE_DEFINITIONS,
+) -> tuple[str, str, str]:
+    """Call model with audio; return (predicted_tone, heard_pinyin, raw_content).
+
+    audio_path may also be any in-memory input encode_audio accepts (NumPy samples need
+    evaluate_audio, which carries the sample rate).
+    If stats is given it is filled with latency_s and cost_usd (0.0 when unknown)."""
+    if model in LOCAL_MODELS:
+        start = time.perf_counter()
+        result = run_local(model, decode_audio(audio_path))
+        if stats is not None:
+            stats.update(latency_s=time.perf_counter() - start, cost_usd=0.0)
+        return result
+    encoded, fmt = encode_audio(audio_path)
+    return run_encoded(model, encoded, fmt, prompt, stats)
+
+
+def evaluate_audio(
+    audio,
+    models: list[str] | None = None,
+    prompt: str = TONE_DEFINITIONS,
+    sample_rate: int | None = None,
+    fmt: str | None = None,
+    workers: int = 1,
+    on_result=None,
+) -> list[dict]:
+    """Evaluate one clip with every model; the in-memory entry point of the evaluator.
+
+    audio is a Path, encoded bytes, a binary file-like object or NumPy samples (with
+    sample_rate). The clip is encoded once for all API models and decoded once for all local
+    models. Returns one dict per model, in model order, with model, predicted_tone,
+    heard_pinyin, raw_response, latency_s and cost_usd; on_result(row) is called as each
+    model finishes (models run on `workers` threads)."""
+    models = models or MODELS
+    if isinstance(audio, (str, Path)) or hasattr(audio, "ndim"):
+        source = audio
+    else:
+        source, fmt = audio_io.as_encoded(audio, fmt)  # file-like objects can only be read once
+    payload = encode_audio(source, fmt, sample_rate) if any(m not in LOCAL_MODELS for m in models) else None
+    samples = decode_audio(source, fmt, sample_rate) if any(m in LOCAL_MODELS for m in models) else None
+
+    def one(model: str) -> dict:
+        stats = {"latency_s": 0.0, "cost_usd": 0.0}
+        if model in LOCAL_MODELS:
+            start = time.perf_counter()
+            pred, heard_pinyin, raw = run_local(model, samples)
+            stats["latency_s"] = time.perf_counter() - start
+        else:
+            pred, heard_pinyin, raw = run_encoded(model, *payload, prompt, stats)
+        row = {
+            "model": model,
+            "predicted_tone": pred or "",
+            "heard_pinyin": heard_pinyin or "",
+            "raw_response": raw.replace("\n", " ").strip(),
+            "latency_s": round(stats["latency_s"], 4),
+            "cost_usd": stats["cost_usd"],
+        }
+        if on_result is not None:
+            on_result(row)
+        return row
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(one, models))
+
+
+def run_cascade(
+    audio: Path | tuple,
+    tiers: list[str],
+    threshold: float,
+    local_model: str = CASCADE_LOCAL_MODEL,
+    payload: tuple[str, str] | None = None,
+) -> dict:
+    """Local scorer first; escalate through tiers while the answer stays ambiguous.
+
+    A local answer with confidence >= threshold is final. Otherwise tiers are queried in
+    order and a tier's answer is accepted once it agrees with the local guess; if no tier
+    agrees, the last tier that answered wins (the local guess if none did).
+    audio is a file path or (samples, sample_rate); payload is the (base64, format) sent to
+    the tiers and is encoded from the file when not given.
+    Returns the row fields plus call stats."""
+    start = time.perf_counter()
+    local_pred, confidence = local_predict(local_model, audio)
+    local_s = time.perf_counter() - start
+    result = {
+        "predicted_tone": str(local_pred) if local_pred else "",
+        "heard_pinyin": "",
+        "raw_response": f"tone {local_pred or '?'} (confidence {confidence:.3f})",
+        "stage": local_model,
+        "local_tone": local_pred or "",
+        "local_confidence": round(confidence, 4),
+        "llm_calls": 0,
+        "latency_s": local_s,
+        "cost_usd": 0.0,
+        "calls": [],
+    }
+    if local_pred and confidence >= threshold:
+        return result
+    for tier in tiers:
+        if payload is None:
+            payload = encode_audio(audio)
+        stats: dict = {}
+        pred, heard_pinyin, raw = run_encoded(tier, *payload, TONE_DEFINITIONS, stats)
+        result["llm_calls"] += 1
+        result["latency_s"] += stats["latency_s"]
+        result["cost_usd"] += stats["cost_usd"]
+        result["calls"].append((tier, stats))
+        if pred:
+            result.update(predicted_tone=pred, heard_pinyin=heard_pinyin, raw_response=raw, stage=tier)
+        if pred and pred == str(local_pred):
+            break
+    return result
+
+
+def load_fanout_accuracy(csv_path: Path, files: set[str]) -> dict[str, tuple[int, int]]:
+    """Per-model (correct, total) on the given files from a full fan-out results CSV."""
+    acc: dict[str, list[int]] = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if r.get("audio_file") not in files:
+                continue
+            a = acc.setdefault(r["model"], [0, 0])
+            a[0] += int((r.get("predicted_tone") or "").strip() == str(r.get("true_tone", "")).strip())
+            a[1] += 1
+    return {m: (c, n) for m, (c, n) in acc.items()}
+
+
+def cascade_report(
+    results: list[dict],
+    tiers: list[str],
+    threshold: float,
+    fanout_models: list[str],
+    compare_csv: Path | None = None,
+) -> str:
+    """Escalation rate, latency, cost vs full fan-out, and accuracy vs a fan-out CSV if given."""
+    n = len(results)
+    escalated = sum(1 for r in results if r["llm_calls"])
+    tier_calls = Counter(t for r in results for t, _ in r["calls"])
+    llm_calls = sum(tier_calls.values())
+    latency = sum(r["latency_s"] for r in results)
+    cost = sum(r["cost_usd"] for r in results)
+    # Observed cost per call, per model; models never called fall back to the overall mean
+    model_costs: dict[str, list[float]] = {}
+    for r in results:
+        for t, st in r["calls"]:
+            model_costs.setdefault(t, []).append(st["cost_usd"])
+    all_costs = [c for cs in model_costs.values() for c in cs]
+    mean_cost = sum(all_costs) / len(all_costs) if all_costs else 0.0
+    fanout_cost = sum(
+        n * (sum(model_costs[m]) / len(model_costs[m]) if m in model_costs else mean_cost)
+        for m in fanout_models
+    )
+    fanout_calls = n * len(fanout_models)
+    lines = [
+        f"Cascade: threshold {threshold}, tiers {' -> '.join(tiers)}",
+        f"  clips: {n}, escalated: {escalated} ({100 * escalated / n if n else 0:.1f}%)",
+        "  calls per tier: " + ", ".join(f"{t} {tier_calls.get(t, 0)}" for t in tiers),
+        f"  total latency: {latency:.1f} s ({latency / n if n else 0:.2f} s/clip)",
+        f"  LLM calls: {llm_calls} vs {fanout_calls} for full fan-out over {len(fanout_models)} models "
+        f"({fanout_calls - llm_calls} saved)",
+        f"  cost: ${cost:.4f} vs ~${fanout_cost:.4f} est. full fan-out (${max(fanout_cost - cost, 0):.4f} saved)",
+    ]
+    labeled = [r for r in results if r["true_tone"]]
+    if labeled:
+        correct = sum(1 for r in labeled if r["predicted_tone"] == str(r["true_tone"]))
+        acc = correct / len(labeled)
+        lines.append(f"  cascade accuracy: {acc:.4f} ({correct}/{len(labeled)})")
+        if compare_csv is not None and compare_csv.exists():
+            fanout = load_fanout_accuracy(compare_csv, {r["audio_file"] for r in labeled})
+            lines.append(f"  vs full fan-out ({compare_csv.name}):")
+            for m, (c, total) in sorted(fanout.items(), key=lambda kv: -kv[1][0] / max(kv[1][1], 1)):
+                m_acc = c / total if total else 0.0
+                lines.append(f"    {m:40s} {m_acc:.4f} ({c}/{total})  cascade diff {acc - m_acc:+.4f}")
+    return "\n".join(lines)
+
+
+def print_pool_report() -> None:
+    """Connection reuse of the shared provider clients, Gemini file reference and streaming savings, if used."""
+    for report in (http_pool.report(), gemini_files.report(), streaming.report()):
+        if report:
+            print(report)
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Run tone evaluation on audio files.")
     parser.add_argument(
         "--audio-dir",
         type=Path,
-        default=DEFAULT_AUDIO_DIR,
-        help="Directory containing audio files (default: synthetic_tones)",
+        default=None,
+        help="Directory containing audio files (default: the index root for a corpus index, else synthetic_tones)",
     )
     parser.add_argument(
         "--manifest",
         type=Path,
-        default=DEFAULT_MANIFEST,
-        help="JSON manifest mapping filename -> tone 1-4 (default: synthetic_tones/manifest.json)",
+        default=None,
+        help="JSON manifest mapping filename -> tone 1-4 (default: synthetic_tones/manifest.json, or the --pack labels)",
     )
     parser.add_argument(
         "--output",
@@ -235,83 +618,278 @@ def main() -> int:
         default=3.0,
         help="Recording duration in seconds when using --record (default: 3).",
     )
+    parser.add_argument(
+        "--save-recording",
+        type=Path,
+        default=None,
+        help="With --record: also save the recording as a WAV here (it is evaluated from memory either way).",
+    )
     parser.add_argument(
         "--sample-rate",
         type=int,
         default=16000,
         help="Sample rate for --record in Hz (default: 16000).",
     )
+    parser.add_argument(
+        "--pack",
+        type=Path,
+        default=None,
+        help="Read clips from a packed corpus (packed_corpus.py) instead of --audio-dir; "
+        "its labels are the manifest unless --manifest is given.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=1,
+        help="Answers to draw per (model, clip) in batch mode; stored with a sample_idx column (default: 1).",
+    )
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help=f"Score with {CASCADE_LOCAL_MODEL} first; only low-confidence clips go to the --cascade-models tiers.",
+    )
+    parser.add_argument(
+        "--cascade-threshold",
+        type=float,
+        default=DEFAULT_CASCADE_THRESHOLD,
+        help=f"Local confidence at or above which no LLM is called (default: {DEFAULT_CASCADE_THRESHOLD}).",
+    )
+    parser.add_argument(
+        "--cascade-models",
+        type=str,
+        default=None,
+        help="Comma-separated LLM tiers for --cascade, cheapest first (default: " + ",".join(CASCADE_MODELS) + ").",
+    )
+    parser.add_argument(
+        "--compare-csv",
+        type=Path,
+        default=None,
+        help="With --cascade: full fan-out results CSV to compare accuracy against.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="Run only shard i of N (e.g. 0/4) of the (model, file) plan; see scripts/sharding.py. "
+        "Combine shard outputs with scripts/merge_shards.py.",
+    )
+    parser.add_argument(
+        "--shard-latency",
+        type=str,
+        default=None,
+        help="Comma-separated earlier result CSVs with latency_s; their per-model medians balance the shards. "
+        "Every shard must get the same value.",
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        default=None,
+        help="Value for a run_id column (default with --shard: a hash of the plan, shared by all shards).",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=http_pool.DEFAULT_MAX_CONNECTIONS,
+        help=f"Pooled keep-alive connections per provider (default: {http_pool.DEFAULT_MAX_CONNECTIONS}).",
+    )
+    parser.add_argument(
+        "--no-http-pool",
+        action="store_true",
+        help="Leave HTTP clients to LiteLLM instead of one shared pooled client per provider (see scripts/http_pool.py).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream replies and stop reading once the tone answer is settled (see scripts/streaming.py); "
+        "adds early_exit, tokens_cut and latency_saved_s columns. Models that cannot stream use the blocking call.",
+    )
+    parser.add_argument(
+        "--stream-calibrate-every",
+        type=int,
+        default=streaming.CALIBRATE_EVERY,
+        help=f"With --stream: read every Nth settled stream of a model to the end to measure what is cut (default: {streaming.CALIBRATE_EVERY}).",
+    )
+    parser.add_argument(
+        "--gemini-files",
+        action="store_true",
+        help="Upload each clip once through the Gemini Files API and send gemini/ models a file reference "
+        "instead of inline audio (falls back to inline; see scripts/gemini_files.py).",
+    )
+    parser.add_argument(
+        "--gemini-files-cache",
+        type=Path,
+        default=gemini_files.DEFAULT_CACHE,
+        help="JSON cache of uploaded file URIs by content hash (default: results/gemini_files.json).",
+    )
+    profiling.add_profile_args(parser)
     args = parser.parse_args()
+    profiling.start(args, "run_tone_eval")
+    if not args.no_http_pool:
+        http_pool.configure(max_connections=max(args.pool_size, args.samples))
+    if args.stream:
+        if args.stream_calibrate_every < 1:
+            parser.error("--stream-calibrate-every must be at least 1.")
+        streaming.configure(args.stream_calibrate_every)
+    if args.gemini_files:
+        gemini_files.configure(args.gemini_files_cache if args.gemini_files_cache.is_absolute() else _root / args.gemini_files_cache)
+    shard = None
+    if args.shard is not None:
+        try:
+            shard = sharding.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
 
     single_file_mode = args.record or args.audio_file is not None
     if args.audio_file is not None and args.record:
         parser.error("--audio-file and --record are mutually exclusive.")
     models_to_run = [m.strip() for m in args.models.split(",")] if args.models else MODELS
+    cascade_tiers = [m.strip() for m in args.cascade_models.split(",")] if args.cascade_models else CASCADE_MODELS
+    remote = [m for m in dict.fromkeys(models_to_run + (cascade_tiers if args.cascade else [])) if m not in LOCAL_MODELS]
+    errors, warnings = model_index.validate_models(capabilities(), remote)
+    errors += validate_local_models(models_to_run)
+    for w in warnings:
+        print(f"Warning: {w}", file=sys.stderr)
+    if errors:
+        parser.error("; ".join(errors))
 
     if single_file_mode:
-        # Record or use provided file
+        # Record into memory or use the provided file; either way no temporary file is written
+        sample_rate = None
         if args.record:
-            out_path = _root / "results" / "recorded.wav"
-            RESULTS_DIR.mkdir(parents=True, exist_ok=True)
-            record_audio(args.duration, args.sample_rate, out_path)
-            audio_path = out_path
+            audio = record_samples(args.duration, args.sample_rate)
+            sample_rate = args.sample_rate
             audio_name = "recorded.wav"
+            if args.save_recording is not None:
+                save_path = args.save_recording if args.save_recording.is_absolute() else _root / args.save_recording
+                save_path.parent.mkdir(parents=True, exist_ok=True)
+                save_path.write_bytes(audio_io.wav_bytes(audio, sample_rate))
+                audio_name = save_path.name
+                print(f"Saved to {save_path}", flush=True)
         else:
-            audio_path = args.audio_file if args.audio_file.is_absolute() else _root / args.audio_file
-            if not audio_path.exists():
-                print(f"Error: file not found: {audio_path}", file=sys.stderr)
+            audio = args.audio_file if args.audio_file.is_absolute() else _root / args.audio_file
+            if not audio.exists():
+                print(f"Error: file not found: {audio}", file=sys.stderr)
                 return 1
-            audio_name = audio_path.name
-        total = len(models_to_run)
-        rows = []
-        for idx, model in enumerate(models_to_run, start=1):
-            print(f"  [{idx}/{total}] {model} ...", flush=True)
-            pred, heard_pinyin, raw = run_one(model, audio_path, 0)
-            print(f"    → heard: {heard_pinyin or '(none)'}, tone: {pred or '(none)'}")
-            rows.append({
-                "model": model,
-                "audio_file": audio_name,
-                "true_tone": 0,
-                "predicted_tone": pred or "",
-                "heard_pinyin": heard_pinyin or "",
-                "raw_response": raw.replace("\n", " ").strip(),
-            })
+            audio_name = audio.name
+        if args.cascade:
+            local_audio = decode_audio(audio, sample_rate=sample_rate)
+            payload = encode_audio(audio, sample_rate=sample_rate)
+            result = run_cascade(local_audio, cascade_tiers, args.cascade_threshold, payload=payload)
+            print(
+                f"  cascade → heard: {result['heard_pinyin'] or '(none)'}, tone: {result['predicted_tone'] or '(none)'}"
+                f" (via {result['stage']}, local confidence {result['local_confidence']:.2f})"
+            )
+            return 0
+        done = []
+
+        def report(row: dict) -> None:
+            done.append(row)
+            print(
+                f"  [{len(done)}/{len(models_to_run)}] {row['model']} → heard: {row['heard_pinyin'] or '(none)'}, "
+                f"tone: {row['predicted_tone'] or '(none)'}",
+                flush=True,
+            )
+
+        rows = evaluate_audio(audio, models_to_run, sample_rate=sample_rate, on_result=report)
+        for row in rows:
+            row.update(audio_file=audio_name, true_tone=0)
         if args.output is not None:
             out_csv = args.output if args.output.is_absolute() else _root / args.output
             RESULTS_DIR.mkdir(parents=True, exist_ok=True)
             out_csv.parent.mkdir(parents=True, exist_ok=True)
             fieldnames = ["model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response"]
-            with open(out_csv, "w", newline="", encoding="utf-8") as f:
-                w = csv.DictWriter(f, fieldnames=fieldnames)
+            with profiling.span("write"), open(out_csv, "w", newline="", encoding="utf-8") as f:
+                w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
                 w.writeheader()
                 w.writerows(rows)
             print(f"Wrote {len(rows)} rows to {out_csv}")
+        print_pool_report()
         return 0
 
     # Manifest-based batch mode
-    audio_dir = args.audio_dir if args.audio_dir.is_absolute() else _root / args.audio_dir
-    manifest_path = args.manifest if args.manifest.is_absolute() else _root / args.manifest
-    manifest = load_manifest(manifest_path)
+    manifest_path = args.manifest or DEFAULT_MANIFEST
+    manifest_path = manifest_path if manifest_path.is_absolute() else _root / manifest_path
+    pack = None
+    if args.pack is not None:
+        pack = PackedCorpus(args.pack if args.pack.is_absolute() else _root / args.pack)
+        if args.manifest is not None:
+            manifest = load_manifest(manifest_path)
+        else:
+            manifest = pack.manifest()
+            manifest_path = pack.path.with_name(f"manifest_{pack.path.stem}.json")  # names the default output
+        available = set(pack.names())
+    else:
+        audio_dir = args.audio_dir or manifest_audio_dir(manifest_path) or DEFAULT_AUDIO_DIR
+        audio_dir = audio_dir if audio_dir.is_absolute() else _root / audio_dir
+        manifest = load_manifest(manifest_path)
+        available = {f for f in manifest if (audio_dir / f).exists()}
+
+    def clip_audio(filename: str) -> Path | tuple:
+        """What local models read: the file, or decoded samples from the pack."""
+        return pack.pcm(filename) if pack is not None else audio_dir / filename
+
+    def clip_payload(filename: str) -> tuple[str, str]:
+        if pack is not None:
+            return encode_bytes(pack.data(filename), pack.entry(filename)["format"])
+        return encode_audio(audio_dir / filename)
+
     files = sorted(manifest.keys(), key=lambda f: manifest[f])
-    to_run = [(m, f) for m in models_to_run for f in files if (audio_dir / f).exists()]
-    total = len(to_run)
+    to_run = [(m, f) for m in (["cascade"] if args.cascade else models_to_run) for f in files if f in available]
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
     out_csv = args.output
     if out_csv is None:
-        if "15syllables" in str(manifest_path):
-            out_csv = RESULTS_DIR / "tone_eval_15syllables.csv"
-        elif "cai" in str(manifest_path):
-            out_csv = RESULTS_DIR / "tone_eval_cai.csv"
-        elif "hao" in str(manifest_path):
-            out_csv = RESULTS_DIR / "tone_eval_hao.csv"
-        else:
-            out_csv = RESULTS_DIR / "tone_eval.csv"
+        out_csv = default_output_csv(manifest_path)
+        if args.cascade:
+            out_csv = out_csv.with_name(f"{out_csv.stem}_cascade.csv")
+        if shard is not None:
+            out_csv = out_csv.with_name(f"{out_csv.stem}_shard{shard[0]}of{shard[1]}.csv")
     out_csv = out_csv if out_csv.is_absolute() else _root / out_csv
 
+    run_id = args.run_id
+    if shard is not None:
+        plan = sharding.plan_id(to_run, shard[1])
+        run_id = run_id or plan
+        latency_csvs = [Path(p.strip()) for p in args.shard_latency.split(",")] if args.shard_latency else []
+        weights = sharding.model_latency_weights([p if p.is_absolute() else _root / p for p in latency_csvs])
+        owners = sharding.assign_shards(to_run, shard[1], weights, LOCAL_MODELS)
+        to_run = [cell for cell, owner in zip(to_run, owners) if owner == shard[0]]
+        out_csv.parent.mkdir(parents=True, exist_ok=True)
+        sharding.write_sidecar(out_csv, shard[0], shard[1], run_id, plan, to_run, args.samples)
+        print(f"Shard {shard[0]}/{shard[1]} (plan {plan}): {len(to_run)} of {len(owners)} cells")
+    total = len(to_run)
+
+    if args.cascade:
+        cascade_files = [f for _, f in to_run]
+        results = []
+        for idx, filename in enumerate(cascade_files, start=1):
+            print(f"  [{idx}/{len(cascade_files)}] cascade / {filename} ...", flush=True)
+            payload = clip_payload(filename) if pack is not None else None
+            result = run_cascade(clip_audio(filename), cascade_tiers, args.cascade_threshold, payload=payload)
+            result.update(model="cascade", audio_file=filename, true_tone=manifest[filename])
+            result["raw_response"] = result["raw_response"].replace("\n", " ").strip()
+            if run_id is not None:
+                result["run_id"] = run_id
+            results.append(result)
+        fieldnames = [
+            "model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response",
+            "stage", "local_tone", "local_confidence", "llm_calls", "latency_s", "cost_usd",
+        ] + (["run_id"] if run_id is not None else [])
+        with profiling.span("write"), open(out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            w.writeheader()
+            w.writerows(results)
+        print(f"Wrote {len(results)} rows to {out_csv}")
+        compare_csv = args.compare_csv
+        if compare_csv is not None and not compare_csv.is_absolute():
+            compare_csv = _root / compare_csv
+        print(cascade_report(results, cascade_tiers, args.cascade_threshold, models_to_run, compare_csv))
+        print_pool_report()
+        return 0
+
     fieldnames = ["model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin", "raw_response"]
     existing_rows: list[dict[str, str | int]] = []
     if args.append and out_csv.exists():
-        with open(out_csv, newline="", encoding="utf-8") as f:
+        with profiling.span("read_existing"), open(out_csv, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f)
             existing_rows = list(reader)
         replace_keys = {(m, f) for m, f in to_run}
@@ -319,27 +897,56 @@ def main() -> int:
         print(f"Append mode: keeping {len(existing_rows)} existing rows, running {total} new.")
 
     rows = []
+    payloads: dict[str, tuple[str, str]] = {}
     for idx, (model, filename) in enumerate(to_run, start=1):
         true_tone = manifest[filename]
-        audio_path = audio_dir / filename
         print(f"  [{idx}/{total}] {model} / {filename} ...", flush=True)
-        pred, heard_pinyin, raw = run_one(model, audio_path, true_tone)
-        rows.append({
-            "model": model,
-            "audio_file": filename,
-            "true_tone": true_tone,
-            "predicted_tone": pred or "",
-            "heard_pinyin": heard_pinyin or "",
-            "raw_response": raw.replace("\n", " ").strip(),
-        })
+        start = time.perf_counter()
+        if args.samples > 1 and model not in LOCAL_MODELS:
+            if filename not in payloads:
+                payloads[filename] = clip_payload(filename)
+            samples = run_samples(model, *payloads[filename], args.samples)
+        elif pack is not None:
+            if model in LOCAL_MODELS:
+                samples = [(*run_local(model, clip_audio(filename)), {})]
+            else:
+                st: dict = {}
+                samples = [(*run_encoded(model, *clip_payload(filename), TONE_DEFINITIONS, st), st)]
+        else:
+            st = {}
+            samples = [(*run_one(model, audio_dir / filename, true_tone, st), st)]
+        elapsed = time.perf_counter() - start
+        for sample_idx, (pred, heard_pinyin, raw, sample_stats) in enumerate(samples):
+            row = {
+                "model": model,
+                "audio_file": filename,
+                "true_tone": true_tone,
+                "predicted_tone": pred or "",
+                "heard_pinyin": heard_pinyin or "",
+                "raw_response": raw.replace("\n", " ").strip(),
+            }
+            if args.samples > 1:
+                row["sample_idx"] = sample_idx
+            if run_id is not None:
+                row["run_id"] = run_id
+            if shard is not None:
+                # Measured latencies let later sweeps balance shards (--shard-latency)
+                row["latency_s"] = round(sample_stats.get("latency_s", elapsed), 4)
+            if "early_exit" in sample_stats:
+                # Streamed: latency_s is the time to the settled answer
+                row["latency_s"] = round(sample_stats["latency_s"], 4)
+                row.update({k: sample_stats[k] for k in ("early_exit", "tokens_cut", "latency_saved_s")})
+            rows.append(row)
 
     all_rows = existing_rows + rows
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+    extra = [k for k in dict.fromkeys(k for r in all_rows for k in r) if k not in fieldnames]
+    with profiling.span("write"), open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames + extra)
         w.writeheader()
         w.writerows(all_rows)
 
     print(f"Wrote {len(all_rows)} rows to {out_csv} ({len(rows)} new)")
+    print_pool_report()
     return 0
 
 
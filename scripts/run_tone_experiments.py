@@ -0,0 +1,190 @@
+"""
+Run a prompt × model × clip experiment matrix with run_tone_eval's models.
+
+Prompt templates come from a JSON file {prompt_id: text} (default: scripts/tone_prompts.json);
+"{tone_definitions}" in a template is replaced by run_tone_eval.TONE_DEFINITIONS, and the
+"default" prompt (TONE_DEFINITIONS itself) is always available. Every clip is read and
+base64-encoded once and the payload is shared by all prompts and models. Cells already in
+the output CSV (same prompt_id, model, audio_file) are skipped, so an interrupted run
+resumes where it stopped; rows are appended as they complete.
+
+Results carry a prompt_id column; analyze_tone_results.py breaks metrics down per prompt.
+
+Usage:
+  python scripts/run_tone_experiments.py --audio-dir audio_syllabs --manifest audio_syllabs/manifest_15syllables.json
+  python scripts/run_tone_experiments.py --prompts my_prompts.json --prompt-ids default,minimal \\
+      --models gemini/gemini-2.5-pro --workers 16 --output results/prompt_sweep.csv
+"""
+
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import profiling
+import run_tone_eval
+from run_tone_eval import (
+    DEFAULT_AUDIO_DIR,
+    DEFAULT_MANIFEST,
+    LOCAL_MODELS,
+    MODELS,
+    RESULTS_DIR,
+    TONE_DEFINITIONS,
+    encode_audio,
+    load_manifest,
+    manifest_audio_dir,
+    run_encoded,
+    run_local,
+)
+
+_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_PROMPTS = Path(__file__).resolve().parent / "tone_prompts.json"
+DEFAULT_OUTPUT = RESULTS_DIR / "tone_experiments.csv"
+FIELDNAMES = [
+    "prompt_id", "model", "audio_file", "true_tone", "predicted_tone", "heard_pinyin",
+    "raw_response", "latency_s", "cost_usd",
+]
+
+
+def load_prompts(path: Path | None) -> dict[str, str]:
+    """{prompt_id: prompt text}; always includes "default" (TONE_DEFINITIONS)."""
+    prompts = {"default": TONE_DEFINITIONS}
+    if path is not None and path.exists():
+        with open(path, encoding="utf-8") as f:
+            for pid, template in json.load(f).items():
+                prompts[pid] = template.replace("{tone_definitions}", TONE_DEFINITIONS)
+    return prompts
+
+
+def completed_cells(out_csv: Path, retry_empty: bool = False) -> set[tuple[str, str, str]]:
+    """(prompt_id, model, audio_file) already present in out_csv."""
+    if not out_csv.exists():
+        return set()
+    done = set()
+    with open(out_csv, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if retry_empty and not (r.get("predicted_tone") or "").strip():
+                continue
+            done.add((r.get("prompt_id") or "default", r["model"], r["audio_file"]))
+    return done
+
+
+def build_plan(
+    prompt_ids: list[str],
+    models: list[str],
+    files: list[str],
+    done: set[tuple[str, str, str]],
+) -> list[tuple[str, str, str]]:
+    """All (prompt_id, model, audio_file) cells not yet in done. Local models ignore the prompt,
+    so they get a single cell under the first prompt."""
+    plan = []
+    for model in models:
+        pids = prompt_ids[:1] if model in LOCAL_MODELS else prompt_ids
+        for pid in pids:
+            for f in files:
+                if (pid, model, f) not in done:
+                    plan.append((pid, model, f))
+    return plan
+
+
+def run_cell(
+    cell: tuple[str, str, str],
+    prompts: dict[str, str],
+    payloads: dict[str, tuple[str, str]],
+    audio_dir: Path,
+) -> tuple[str, str, str, dict]:
+    pid, model, filename = cell
+    stats: dict = {"latency_s": 0.0, "cost_usd": 0.0}
+    if model in LOCAL_MODELS:
+        pred, pinyin, raw = run_local(model, audio_dir / filename)
+    else:
+        encoded, fmt = payloads[filename]
+        pred, pinyin, raw = run_encoded(model, encoded, fmt, prompts[pid], stats)
+    return pred, pinyin, raw, stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a prompt × model × clip experiment matrix.")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Directory containing audio files (default: index root or synthetic_tones)")
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST, help="JSON manifest filename -> tone 1-4")
+    parser.add_argument("--prompts", type=Path, default=DEFAULT_PROMPTS, help="JSON {prompt_id: template} (default: scripts/tone_prompts.json)")
+    parser.add_argument("--prompt-ids", type=str, default=None, help="Comma-separated prompt ids to run (default: all)")
+    parser.add_argument("--models", type=str, default=None, help="Comma-separated model names (default: run_tone_eval.MODELS)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Output CSV; existing cells are skipped (default: results/tone_experiments.csv)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests (default: 8)")
+    parser.add_argument("--retry-empty", action="store_true", help="Re-run cells whose stored predicted_tone is empty")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan size and exit")
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "run_tone_experiments")
+
+    manifest_path = args.manifest if args.manifest.is_absolute() else _ROOT / args.manifest
+    audio_dir = args.audio_dir or manifest_audio_dir(manifest_path) or DEFAULT_AUDIO_DIR
+    audio_dir = audio_dir if audio_dir.is_absolute() else _ROOT / audio_dir
+    out_csv = args.output if args.output.is_absolute() else _ROOT / args.output
+    prompts = load_prompts(args.prompts if args.prompts.is_absolute() else _ROOT / args.prompts)
+    prompt_ids = [p.strip() for p in args.prompt_ids.split(",")] if args.prompt_ids else list(prompts)
+    unknown = [p for p in prompt_ids if p not in prompts]
+    if unknown:
+        parser.error(f"unknown prompt id(s): {', '.join(unknown)}; available: {', '.join(prompts)}")
+    models = [m.strip() for m in args.models.split(",")] if args.models else MODELS
+    errors, warnings = run_tone_eval.model_index.validate_models(
+        run_tone_eval.capabilities(), [m for m in models if m not in LOCAL_MODELS]
+    )
+    errors += run_tone_eval.validate_local_models(models)
+    for w in warnings:
+        print(f"Warning: {w}", file=sys.stderr)
+    if errors:
+        parser.error("; ".join(errors))
+
+    manifest = load_manifest(manifest_path)
+    files = [f for f in sorted(manifest, key=lambda f: manifest[f]) if (audio_dir / f).exists()]
+    done = completed_cells(out_csv, args.retry_empty)
+    plan = build_plan(prompt_ids, models, files, done)
+    full = len(build_plan(prompt_ids, models, files, set()))
+    print(
+        f"Plan: {len(prompt_ids)} prompts × {len(models)} models × {len(files)} clips = {full} cells; "
+        f"{full - len(plan)} already done, {len(plan)} to run"
+    )
+    if args.dry_run or not plan:
+        return 0
+
+    # Encode each clip once; the same payload is shared by every prompt and model
+    needed = sorted({f for _, m, f in plan if m not in LOCAL_MODELS})
+    payloads = {f: encode_audio(audio_dir / f) for f in needed}
+
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    write_header = not out_csv.exists() or out_csv.stat().st_size == 0
+    n_done = 0
+    with open(out_csv, "a", newline="", encoding="utf-8") as fh, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        w = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
+        if write_header:
+            w.writeheader()
+        futures = {pool.submit(run_cell, cell, prompts, payloads, audio_dir): cell for cell in plan}
+        for fut in as_completed(futures):
+            pid, model, filename = futures[fut]
+            pred, pinyin, raw, stats = fut.result()
+            n_done += 1
+            print(f"  [{n_done}/{len(plan)}] {pid} / {model} / {filename} → {pred or '(none)'}", flush=True)
+            with profiling.span("write"):
+                w.writerow({
+                    "prompt_id": pid,
+                    "model": model,
+                    "audio_file": filename,
+                    "true_tone": manifest[filename],
+                    "predicted_tone": pred or "",
+                    "heard_pinyin": pinyin or "",
+                    "raw_response": raw.replace("\n", " ").strip(),
+                    "latency_s": round(stats["latency_s"], 4),
+                    "cost_usd": stats["cost_usd"],
+                })
+                fh.flush()
+    print(f"Wrote {n_done} rows to {out_csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
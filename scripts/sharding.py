@@ -0,0 +1,128 @@
+"""
+Deterministic sharding of a (model, audio_file) evaluation plan across hosts or processes.
+
+Every shard computes the same assignment from the same plan, so no coordination is needed:
+  - each model's cells are ordered by a stable hash (SHA-1, not Python's salted hash()) and
+    dealt round-robin over the shards, starting at a per-model offset, so every shard gets
+    an equal share of every model and slow models cannot pile up on one shard;
+  - the cells left over when a model's count is not a multiple of N go, heaviest first, to
+    the shard with the least estimated latency so far (per-model latency weights).
+Weights come from latency_s columns of earlier result CSVs (median per model); all shards
+must be started with the same plan and weight sources.
+
+Each shard writes a sidecar <output>.shard.json listing its cells; merge_shards.py uses the
+sidecars to check that every cell of every shard is present.
+"""
+
+import csv
+import hashlib
+import json
+import statistics
+from pathlib import Path
+
+LOCAL_WEIGHT = 0.05  # default latency weight (s) for local models without measurements
+REMOTE_WEIGHT = 1.0  # default latency weight (s) for API models without measurements
+
+
+def stable_hash(*parts: str) -> int:
+    """64-bit hash of parts that is identical across processes, hosts and Python versions."""
+    return int.from_bytes(hashlib.sha1("\0".join(parts).encode()).digest()[:8], "big")
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """'2/8' -> (2, 8); shards are numbered 0 .. N-1."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}") from None
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"shard index must be in 0..{n - 1}, got {spec!r}")
+    return i, n
+
+
+def model_latency_weights(csv_paths: list[Path]) -> dict[str, float]:
+    """Median latency_s per model over the given result CSVs (rows without latency are ignored)."""
+    latencies: dict[str, list[float]] = {}
+    for path in csv_paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                try:
+                    latency = float(r.get("latency_s") or "")
+                except ValueError:
+                    continue
+                latencies.setdefault(r["model"], []).append(latency)
+    return {m: statistics.median(v) for m, v in latencies.items() if v}
+
+
+def cell_weight(model: str, weights: dict[str, float], local_models) -> float:
+    if model in weights:
+        return weights[model]
+    return LOCAL_WEIGHT if model in local_models else REMOTE_WEIGHT
+
+
+def assign_shards(
+    cells: list[tuple[str, str]],
+    n_shards: int,
+    weights: dict[str, float],
+    local_models=(),
+) -> list[int]:
+    """Shard index for each (model, audio_file) cell, in the order of cells."""
+    by_model: dict[str, list[int]] = {}
+    for idx, (model, _) in enumerate(cells):
+        by_model.setdefault(model, []).append(idx)
+    owner = [0] * len(cells)
+    load = [0.0] * n_shards
+    leftovers: list[tuple[float, int, int]] = []  # (-weight, hash, cell index)
+    for model in sorted(by_model):
+        w = cell_weight(model, weights, local_models)
+        order = sorted(by_model[model], key=lambda i: stable_hash(model, cells[i][1]))
+        offset = stable_hash(model) % n_shards
+        full = len(order) - len(order) % n_shards
+        for k, idx in enumerate(order[:full]):
+            owner[idx] = (offset + k) % n_shards
+        for shard in range(n_shards):
+            load[shard] += w * (full // n_shards)
+        leftovers.extend((-w, stable_hash(model, cells[i][1]), i) for i in order[full:])
+    for neg_w, _, idx in sorted(leftovers):
+        shard = min(range(n_shards), key=lambda s: (load[s], s))
+        owner[idx] = shard
+        load[shard] -= neg_w
+    return owner
+
+
+def plan_id(cells: list[tuple[str, str]], n_shards: int) -> str:
+    """Short hash naming one sharded plan; shards of the same run agree on it."""
+    h = hashlib.sha1(f"{n_shards}".encode())
+    for model, filename in sorted(cells):
+        h.update(f"\0{model}\0{filename}".encode())
+    return h.hexdigest()[:12]
+
+
+def sidecar_path(out_csv: Path) -> Path:
+    return out_csv.with_suffix(".shard.json")
+
+
+def write_sidecar(
+    out_csv: Path,
+    shard: int,
+    n_shards: int,
+    run_id: str,
+    plan: str,
+    cells: list[tuple[str, str]],
+    samples: int = 1,
+) -> None:
+    path = sidecar_path(out_csv)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps({
+            "shard": shard,
+            "n_shards": n_shards,
+            "run_id": run_id,
+            "plan_id": plan,
+            "samples": samples,
+            "output": out_csv.name,
+            "cells": [list(c) for c in cells],
+        }, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    tmp.replace(path)
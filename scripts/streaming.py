@@ -0,0 +1,187 @@
+"""
+Streamed completions that stop reading as soon as the tone answer is settled.
+
+A blocking completion returns only after the whole reply, often an explanation after the
+"2) N" we ask for. With streaming enabled, run_tone_eval.complete_encoded requests
+stream=True. The growing text (taken from each chunk by the model's providers.py adapter) is
+checked with tone_parsing.answer_settled after every chunk, and the stream is closed once the
+answer is there. Closing the connection makes the provider stop generating.
+The text received so far is parsed by the usual parsers.
+
+The tokens and time that were cut cannot be seen on a cancelled stream. So every
+CALIBRATE_EVERY-th settled stream of a model (starting with the first) is read to the end.
+Its tail (tokens and seconds after the answer) is measured, and the other early exits of that
+model are credited with the mean tail. stats gets early_exit, tokens_cut and latency_saved_s
+(estimated unless measured); report() sums them per model.
+
+Models whose adapter does not declare streaming, or that reject it, quietly use the blocking
+call. The cost of a cut stream is left at 0.0 (unknown) since no usage is returned.
+
+Usage (run_tone_eval.py --stream does this):
+  import streaming
+  streaming.configure()
+  text = streaming.complete(completion_kwargs, stats)   # None: use the blocking call
+  print(streaming.report())
+"""
+
+import threading
+import time
+
+import litellm
+
+import providers
+from tone_parsing import answer_settled
+
+CALIBRATE_EVERY = 20
+
+
+def close_stream(stream) -> None:
+    """Close the provider stream under LiteLLM's wrapper, dropping the connection."""
+    inner = getattr(stream, "completion_stream", None)
+    for obj in (inner, stream):
+        close = getattr(obj, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+            return
+
+
+class StreamStats:
+    """Per-model early-exit counters and tail calibration (thread-safe)."""
+
+    def __init__(self, calibrate_every: int = CALIBRATE_EVERY):
+        self.calibrate_every = calibrate_every
+        self.models: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def supports(self, model: str) -> bool:
+        return providers.adapter_for(model).streaming
+
+    def unsupported(self, model: str) -> None:
+        providers.adapter_for(model).streaming = False
+        with self._lock:
+            self._model(model)["fallbacks"] += 1
+
+    def _model(self, model: str) -> dict:
+        if model not in self.models:
+            self.models[model] = dict.fromkeys(
+                ("streams", "settled", "early_exits", "calibrations", "tail_tokens", "tail_s", "tokens_cut", "saved_s", "fallbacks"), 0
+            )
+            self.models[model]["tail_s"] = self.models[model]["saved_s"] = 0.0
+        return self.models[model]
+
+    def should_calibrate(self, model: str) -> bool:
+        """Whether this settled stream is read to the end to measure the tail."""
+        with self._lock:
+            m = self._model(model)
+            m["settled"] += 1
+            return (m["settled"] - 1) % self.calibrate_every == 0
+
+    def record(self, model: str, settled: bool, tail: tuple[int, float] | None) -> tuple[float | None, float | None]:
+        """Count one stream; tail = (tokens, s) measured after the answer on a calibration stream.
+        Returns the (tokens, seconds) credited as cut for this request (None when unknown)."""
+        with self._lock:
+            m = self._model(model)
+            m["streams"] += 1
+            if tail is not None:
+                m["calibrations"] += 1
+                m["tail_tokens"] += tail[0]
+                m["tail_s"] += tail[1]
+                return float(tail[0]), tail[1]
+            if not settled:
+                return 0.0, 0.0
+            m["early_exits"] += 1
+            if not m["calibrations"]:
+                return None, None
+            tokens, saved = m["tail_tokens"] / m["calibrations"], m["tail_s"] / m["calibrations"]
+            m["tokens_cut"] += tokens
+            m["saved_s"] += saved
+            return tokens, saved
+
+    def report(self) -> str:
+        if not self.models:
+            return ""
+        lines = [f"Streaming early exit (tail measured on 1 in {self.calibrate_every} settled streams per model):"]
+        for model, m in sorted(self.models.items()):
+            if m["calibrations"]:
+                tail = f"mean tail {m['tail_tokens'] / m['calibrations']:.0f} tokens / {m['tail_s'] / m['calibrations'] * 1000:.0f} ms"
+            else:
+                tail = "tail not measured"
+            lines.append(
+                f"  {model:40s} {m['early_exits']}/{m['streams']} cut early, ~{m['tokens_cut']:.0f} tokens and "
+                f"~{m['saved_s']:.1f} s saved ({tail}; {m['fallbacks']} blocking fallbacks)"
+            )
+        return "\n".join(lines)
+
+
+_stats: StreamStats | None = None
+
+
+def configure(calibrate_every: int = CALIBRATE_EVERY) -> StreamStats:
+    global _stats
+    _stats = StreamStats(calibrate_every)
+    return _stats
+
+
+def disable() -> None:
+    global _stats
+    _stats = None
+
+
+def enabled(model: str) -> bool:
+    return _stats is not None and _stats.supports(model)
+
+
+def complete(kwargs: dict, stats: dict | None = None, start: float | None = None) -> str | None:
+    """Stream one completion (kwargs as for litellm.completion) and return the reply text up to the
+    settled answer, or the whole reply. None when the model does not stream: use the blocking call.
+    stats["latency_s"] counts from start (time.perf_counter(); default: now), so a caller can include
+    work done before the request, such as an upload. Raises on API errors like litellm.completion."""
+    model = kwargs["model"]
+    if not enabled(model):
+        return None
+    if start is None:
+        start = time.perf_counter()
+    try:
+        stream = litellm.completion(**kwargs, stream=True)
+    except (litellm.UnsupportedParamsError, NotImplementedError):
+        _stats.unsupported(model)
+        return None
+    except litellm.BadRequestError as e:
+        if "stream" not in str(e).lower():
+            raise
+        _stats.unsupported(model)
+        return None
+    chunk_text = providers.adapter_for(model).chunk_text
+    parts: list[str] = []
+    answer, answer_s, calibrate = None, None, False
+    try:
+        for chunk in stream:
+            text = chunk_text(chunk)
+            if not text:
+                continue
+            parts.append(text)
+            if answer is None and answer_settled("".join(parts)):
+                answer, answer_s = "".join(parts), time.perf_counter() - start
+                calibrate = _stats.should_calibrate(model)
+                if not calibrate:
+                    break
+    finally:
+        close_stream(stream)
+    tail = None
+    if answer is not None and calibrate:
+        rest = "".join(parts)[len(answer):]
+        tail = (litellm.token_counter(model=model, text=rest) if rest.strip() else 0, time.perf_counter() - start - answer_s)
+    tokens_cut, saved_s = _stats.record(model, answer is not None, tail)
+    if stats is not None:
+        stats["latency_s"] = answer_s if answer_s is not None else time.perf_counter() - start
+        stats["early_exit"] = answer is not None
+        stats["tokens_cut"] = "" if tokens_cut is None else round(tokens_cut, 1)
+        stats["latency_saved_s"] = "" if saved_s is None else round(saved_s, 4)
+    return answer if answer is not None else "".join(parts)
+
+
+def report() -> str:
+    return _stats.report() if _stats is not None else ""
@@ -0,0 +1,463 @@
+"""
+Compact learned tone classifier: a small 1-D conv net over F0 frame sequences, pure NumPy.
+
+Each clip becomes a sequence of 10 ms frames (local_tone.extract_f0) cropped to the voiced
+part plus a few frames of margin. Every frame has N_FEATURES channels: F0 in semitones around
+the clip's median (gaps inside the syllable interpolated), its slope, a voiced flag and the
+log frame energy. The net has two 'same' convolutions with ReLU, then mean pooling over
+SEGMENTS equal parts of each clip (so where a rise or a dip happens still counts), then one
+dense layer for tones 1-4. That is about 2k parameters. Training (backprop and Adam written out
+in NumPy) takes seconds to minutes on a CPU and needs no deep-learning framework. Inference is
+the same forward pass, so there is no export step and no ONNX runtime to install.
+
+Clips are padded and bucketed by length: predict() sorts clips by frame count and cuts them
+into batches of BATCH_SIZE. Each batch is padded only to its own longest clip, and batches run
+on a thread pool (NumPy releases the GIL in its matrix products). Frames past a clip's length
+are masked after every layer, so a clip scores the same in any batch. F0 extraction for
+many clips runs in a process pool over all cores.
+
+Training data is any mix of corpora (run_tone_eval manifests, index_corpus indexes, .pack
+files, e.g. generate_tones.py --sweep --pack) and --synthetic N random clips from the
+generate_tones contours with jittered length, pitch level, range and noise. Held out: the
+speakers in --val-speakers when given, else a random --val-fraction. The model is available to
+run_tone_eval.py as the local model local/nn (model: results/tone_nn.npz).
+
+Usage:
+  python scripts/generate_tones.py --sweep --pack results/sweep.pack
+  python scripts/tone_nn.py train results/sweep.pack results/syllabs.pack --synthetic 4000   # -> results/tone_nn.npz
+  python scripts/tone_nn.py evaluate results/syllabs.pack        # accuracy vs local/contour, clips/s
+  python scripts/tone_nn.py predict path/to/clip.wav results/other.pack
+  python scripts/run_tone_eval.py --models local/nn,local/contour --pack results/syllabs.pack
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import generate_tones
+import local_tone
+import profiling
+from packed_corpus import PackedCorpus, corpus_clips, map_clips
+
+_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODEL = _ROOT / "results" / "tone_nn.npz"
+N_FEATURES = 4  # semitones, slope, voiced flag, log energy
+MARGIN_FRAMES = 3  # unvoiced frames kept on each side of the voiced part
+SEMITONE_SCALE = 6.0  # feature scaling to roughly unit range
+HIDDEN = 16
+KERNEL = 5
+SEGMENTS = 4
+BATCH_SIZE = 256  # clips per inference batch
+LENGTH_STEP = 8  # batches are padded to a multiple of this many frames
+
+
+def frame_features(samples: np.ndarray, sample_rate: int) -> np.ndarray | None:
+    """(frames, N_FEATURES) float32 features of the voiced part; None if under 3 voiced frames."""
+    f0 = local_tone.extract_f0(samples, sample_rate)
+    voiced = np.flatnonzero(~np.isnan(f0))
+    if len(voiced) < 3:
+        return None
+    x = np.asarray(samples, dtype=np.float64)
+    frame = int(sample_rate * local_tone.FRAME_MS / 1000)
+    hop = max(1, int(sample_rate * local_tone.HOP_MS / 1000))
+    if len(x) < frame:
+        x = np.pad(x, (0, frame - len(x)))
+    power = np.concatenate([[0.0], np.cumsum(x * x)])
+    starts = np.arange(len(f0)) * hop
+    energy = (power[starts + frame] - power[starts]) / frame
+    log_energy = np.log10(energy / max(energy.max(), 1e-12) + 1e-6) / 3  # 0 at the loudest frame, -2 at silence
+
+    first, last = voiced[0], voiced[-1]
+    lo, hi = max(0, first - MARGIN_FRAMES), min(len(f0), last + MARGIN_FRAMES + 1)
+    semitones = np.zeros(hi - lo)
+    seg = f0[first:last + 1]
+    pos = np.arange(len(seg))
+    ok = ~np.isnan(seg)
+    seg = np.interp(pos, pos[ok], seg[ok])
+    semitones[first - lo:last + 1 - lo] = 12 * np.log2(seg / np.median(seg)) / SEMITONE_SCALE
+    slope = np.zeros_like(semitones)
+    if len(seg) > 1:
+        slope[first - lo:last + 1 - lo] = np.gradient(semitones[first - lo:last + 1 - lo]) * 10
+    flags = ~np.isnan(f0[lo:hi])
+    return np.stack([semitones, slope, flags, log_energy[lo:hi]], axis=1).astype(np.float32)
+
+
+def pad_batch(feats: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """(batch, frames, N_FEATURES) zero-padded to the longest clip (rounded up to LENGTH_STEP), and lengths."""
+    lengths = np.array([len(f) for f in feats])
+    frames = -(-int(lengths.max()) // LENGTH_STEP) * LENGTH_STEP
+    x = np.zeros((len(feats), frames, N_FEATURES), dtype=np.float32)
+    for i, f in enumerate(feats):
+        x[i, :len(f)] = f
+    return x, lengths
+
+
+def _patches(h: np.ndarray, kernel: int) -> np.ndarray:
+    """'same' im2col: (batch, frames, channels) -> (batch, frames, kernel * channels)."""
+    pad = kernel // 2
+    hp = np.pad(h, ((0, 0), (pad, kernel - 1 - pad), (0, 0)))
+    win = sliding_window_view(hp, kernel, axis=1)  # (batch, frames, channels, kernel)
+    return win.transpose(0, 1, 3, 2).reshape(h.shape[0], h.shape[1], -1)
+
+
+def _unpatch(d: np.ndarray, kernel: int, channels: int) -> np.ndarray:
+    """Gradient of _patches: (batch, frames, kernel * channels) -> (batch, frames, channels)."""
+    b, t, _ = d.shape
+    pad = kernel // 2
+    d = d.reshape(b, t, kernel, channels)
+    out = np.zeros((b, t + kernel - 1, channels), dtype=d.dtype)
+    for j in range(kernel):
+        out[:, j:j + t] += d[:, :, j]
+    return out[:, pad:pad + t]
+
+
+def _pooling(lengths: np.ndarray, frames: int, segments: int) -> np.ndarray:
+    """(batch, segments, frames) weights averaging each of `segments` equal parts of every clip."""
+    t = np.arange(frames)
+    seg = np.floor((t[None, :] + 0.5) * segments / lengths[:, None]).astype(int)
+    seg[t[None, :] >= lengths[:, None]] = segments  # padding: no segment
+    weights = (seg[:, None, :] == np.arange(segments)[None, :, None]).astype(np.float32)
+    counts = weights.sum(axis=2, keepdims=True)
+    return weights / np.maximum(counts, 1)
+
+
+class ToneNet:
+    """Two 'same' conv layers, segment mean pooling and a dense softmax layer; parameters in self.params."""
+
+    def __init__(self, params: dict[str, np.ndarray], kernel: int = KERNEL, segments: int = SEGMENTS):
+        self.params = params
+        self.kernel = kernel
+        self.segments = segments
+
+    @classmethod
+    def create(cls, hidden: int = HIDDEN, kernel: int = KERNEL, segments: int = SEGMENTS, seed: int = 0) -> "ToneNet":
+        rng = np.random.default_rng(seed)
+
+        def he(fan_in: int, fan_out: int) -> np.ndarray:
+            return (rng.normal(0, np.sqrt(2 / fan_in), (fan_in, fan_out))).astype(np.float32)
+
+        params = {
+            "w1": he(kernel * N_FEATURES, hidden), "b1": np.zeros(hidden, np.float32),
+            "w2": he(kernel * hidden, hidden), "b2": np.zeros(hidden, np.float32),
+            "w3": he(segments * hidden, 4) / 2, "b3": np.zeros(4, np.float32),
+        }
+        return cls(params, kernel, segments)
+
+    def _forward(self, x: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, dict]:
+        p = self.params
+        mask = (np.arange(x.shape[1])[None, :] < lengths[:, None])[:, :, None]
+        p1 = _patches(x, self.kernel)
+        h1 = np.maximum(p1 @ p["w1"] + p["b1"], 0) * mask
+        p2 = _patches(h1, self.kernel)
+        h2 = np.maximum(p2 @ p["w2"] + p["b2"], 0) * mask
+        pool = _pooling(lengths, x.shape[1], self.segments)
+        z = (pool @ h2).reshape(len(x), -1)  # (batch, segments * hidden)
+        logits = z @ p["w3"] + p["b3"]
+        return logits, {"mask": mask, "p1": p1, "h1": h1, "p2": p2, "h2": h2, "pool": pool, "z": z}
+
+    def predict_proba(self, x: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """(batch, 4) tone probabilities for a padded batch."""
+        logits, _ = self._forward(x, lengths)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def loss_and_grads(self, x: np.ndarray, lengths: np.ndarray, tones: np.ndarray) -> tuple[float, dict[str, np.ndarray]]:
+        """Mean cross-entropy of a padded batch (tones 1-4) and its parameter gradients."""
+        p = self.params
+        logits, c = self._forward(x, lengths)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        rows = np.arange(len(x))
+        loss = float(-np.log(probs[rows, tones - 1] + 1e-12).mean())
+        d = probs
+        d[rows, tones - 1] -= 1
+        d /= len(x)
+        g = {"w3": c["z"].T @ d, "b3": d.sum(axis=0)}
+        dz = (d @ p["w3"].T).reshape(len(x), self.segments, -1)
+        dh2 = np.swapaxes(c["pool"], 1, 2) @ dz * (c["h2"] > 0)
+        g["w2"] = c["p2"].reshape(-1, c["p2"].shape[2]).T @ dh2.reshape(-1, dh2.shape[2])
+        g["b2"] = dh2.sum(axis=(0, 1))
+        dh1 = _unpatch(dh2 @ p["w2"].T, self.kernel, c["h1"].shape[2]) * (c["h1"] > 0)
+        g["w1"] = c["p1"].reshape(-1, c["p1"].shape[2]).T @ dh1.reshape(-1, dh1.shape[2])
+        g["b1"] = dh1.sum(axis=(0, 1))
+        return loss, g
+
+    def classify_samples(self, samples: np.ndarray, sample_rate: int) -> tuple[int, float]:
+        """(tone 1-4, confidence) of one clip; (0, 0.0) without a usable contour."""
+        feats = frame_features(samples, sample_rate)
+        if feats is None:
+            return 0, 0.0
+        probs = self.predict_proba(feats[None], np.array([len(feats)]))[0]
+        best = int(np.argmax(probs))
+        return best + 1, float(probs[best])
+
+    def save(self, path: Path, **meta) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        config = {"kernel": self.kernel, "segments": self.segments, "n_features": N_FEATURES, **meta}
+        np.savez(path, config=json.dumps(config), **self.params)
+
+    @classmethod
+    def load(cls, path: Path) -> "ToneNet":
+        with np.load(path) as z:
+            config = json.loads(str(z["config"]))
+            if config["n_features"] != N_FEATURES:
+                raise ValueError(f"{path}: trained on {config['n_features']} features, this version has {N_FEATURES}")
+            params = {k: z[k] for k in z.files if k != "config"}
+        return cls(params, config["kernel"], config["segments"])
+
+
+def buckets(lengths: np.ndarray, batch_size: int) -> list[np.ndarray]:
+    """Clip indices grouped into batches of similar length (sorted by frame count)."""
+    order = np.argsort(lengths, kind="stable")
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def predict(net: ToneNet, feats: list[np.ndarray], batch_size: int = BATCH_SIZE, workers: int | None = None) -> np.ndarray:
+    """(clips, 4) probabilities for feature sequences, scored in length buckets on a thread pool."""
+    if not feats:
+        return np.zeros((0, 4), dtype=np.float32)
+    out = np.zeros((len(feats), 4), dtype=np.float32)
+
+    def run(idx: np.ndarray) -> None:
+        x, lengths = pad_batch([feats[i] for i in idx])
+        out[idx] = net.predict_proba(x, lengths)
+
+    groups = buckets(np.array([len(f) for f in feats]), batch_size)
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        list(pool.map(run, groups))
+    return out
+
+
+def train(
+    net: ToneNet,
+    feats: list[np.ndarray],
+    tones: np.ndarray,
+    epochs: int = 30,
+    batch_size: int = 64,
+    lr: float = 3e-3,
+    seed: int = 0,
+    val: tuple[list[np.ndarray], np.ndarray] | None = None,
+) -> list[dict]:
+    """Adam on length-bucketed minibatches (clip order jittered every epoch). Returns per-epoch stats."""
+    rng = np.random.default_rng(seed)
+    lengths = np.array([len(f) for f in feats], dtype=float)
+    m = {k: np.zeros_like(v) for k, v in net.params.items()}
+    v = {k: np.zeros_like(p) for k, p in net.params.items()}
+    beta1, beta2, step = 0.9, 0.999, 0
+    history = []
+    for epoch in range(epochs):
+        # Similar lengths share a batch; the jitter varies which clips go together
+        groups = buckets(lengths + rng.uniform(0, 4, len(lengths)), batch_size)
+        rng.shuffle(groups)
+        total = 0.0
+        for idx in groups:
+            x, lens = pad_batch([feats[i] for i in idx])
+            loss, grads = net.loss_and_grads(x, lens, tones[idx])
+            step += 1
+            for k, g in grads.items():
+                m[k] = beta1 * m[k] + (1 - beta1) * g
+                v[k] = beta2 * v[k] + (1 - beta2) * g * g
+                net.params[k] -= (lr * (m[k] / (1 - beta1 ** step)) / (np.sqrt(v[k] / (1 - beta2 ** step)) + 1e-8)).astype(np.float32)
+            total += loss * len(idx)
+        stats = {"epoch": epoch + 1, "loss": total / len(feats)}
+        stats["train_acc"] = float(np.mean(predict(net, feats).argmax(axis=1) + 1 == tones))
+        if val is not None and len(val[0]):
+            stats["val_acc"] = float(np.mean(predict(net, val[0]).argmax(axis=1) + 1 == val[1]))
+        history.append(stats)
+    return history
+
+
+def synthetic_clip(rng: np.random.Generator, tone: int) -> np.ndarray:
+    """One generate_tones contour with random length, pitch level and range, jitter and noise (int16)."""
+    sr = generate_tones.SAMPLE_RATE
+    t = generate_tones._time_axis(rng.uniform(150, 500), sr)
+    high = rng.uniform(140, 320)
+    low = max(80.0, high - rng.uniform(15, 0.45 * high))
+    f0_fn = (generate_tones.f0_t1, generate_tones.f0_t2, generate_tones.f0_t3, generate_tones.f0_t4)[tone - 1]
+    f0 = f0_fn(t, high, low) * (1 + 0.01 * np.cumsum(rng.normal(0, 0.02, len(t))) / np.sqrt(len(t) / 100))
+    samples = generate_tones.f0_to_wav(f0, sr, generate_tones.AMPLITUDE, generate_tones.FADE_MS).astype(np.float64)
+    samples += rng.normal(0, 32767 * generate_tones.AMPLITUDE * 10 ** (-rng.uniform(15, 40) / 20), len(samples))
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def _synthetic_job(args: tuple[int, int]) -> np.ndarray | None:
+    seed, tone = args
+    return frame_features(synthetic_clip(np.random.default_rng(seed), tone), generate_tones.SAMPLE_RATE)
+
+
+def synthetic_features(n: int, seed: int, workers: int) -> tuple[list[np.ndarray], np.ndarray]:
+    """(features, tones) of n synthetic clips (tones in turn) built and analysed on a process pool."""
+    jobs = [(seed * 1_000_003 + i, i % 4 + 1) for i in range(n)]
+    with profiling.span("synthetic", clips=n), ProcessPoolExecutor(workers) as pool:
+        feats = list(pool.map(_synthetic_job, jobs, chunksize=max(1, n // (workers * 8))))
+    kept = [(f, tone) for f, (_, tone) in zip(feats, jobs) if f is not None]
+    return [f for f, _ in kept], np.array([tone for _, tone in kept], dtype=int)
+
+
+def extract_features(sources: list, workers: int, pack: Path | None = None) -> list[np.ndarray | None]:
+    """frame_features of many clips on a process pool: file paths, clip names in pack, or (samples, sample_rate)."""
+    with profiling.span("features", clips=len(sources)):
+        return map_clips(frame_features, sources, workers, pack)
+
+
+def load_corpus(corpus: Path, audio_dir: Path | None, workers: int) -> tuple[list[np.ndarray], np.ndarray, list[str], int]:
+    """(features, tones, speakers, clips without a usable contour) of a manifest, corpus index or .pack."""
+    clips = corpus_clips(corpus, audio_dir)
+    feats = extract_features([c["source"] for c in clips], workers, corpus if corpus.suffix == ".pack" else None)
+    kept = [(c, f) for c, f in zip(clips, feats) if f is not None]
+    return [f for _, f in kept], np.array([c["tone"] for c, _ in kept], dtype=int), [c["speaker"] for c, _ in kept], len(clips) - len(kept)
+
+
+_default: ToneNet | None = None
+_default_lock = threading.Lock()
+
+
+def default_net() -> ToneNet:
+    """The model at DEFAULT_MODEL, loaded once per process."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            if not DEFAULT_MODEL.exists():
+                raise FileNotFoundError(f"{DEFAULT_MODEL} not found; train it with: python scripts/tone_nn.py train <corpus>")
+            _default = ToneNet.load(DEFAULT_MODEL)
+        return _default
+
+
+def classify_samples(samples: np.ndarray, sample_rate: int) -> tuple[int, float]:
+    """local/nn: (tone 1-4, confidence) from the default model; (0, 0.0) if unvoiced."""
+    return default_net().classify_samples(samples, sample_rate)
+
+
+def _contour(feats: np.ndarray) -> np.ndarray | None:
+    """local_tone contour vector rebuilt from the semitone channel (for the template comparison)."""
+    voiced = np.flatnonzero(feats[:, 2] > 0)
+    if len(voiced) < 3:
+        return None
+    seg = feats[voiced[0]:voiced[-1] + 1, 0].astype(np.float64) * SEMITONE_SCALE
+    grid = np.linspace(0, len(seg) - 1, local_tone.N_POINTS)
+    vec = np.interp(grid, np.arange(len(seg)), seg)
+    return vec - vec.mean()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Train and run a compact NumPy tone classifier over F0 frame sequences.")
+    parser.add_argument("--model", type=Path, default=DEFAULT_MODEL, help="Model file (default: results/tone_nn.npz)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for F0 extraction (default: CPUs)")
+    parser.add_argument("--audio-dir", type=Path, default=None, help="Clip directory of manifest corpora (default: index root, else manifest directory)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("train", help="Train on corpora and/or synthetic clips")
+    p.add_argument("corpora", nargs="*", type=Path, help="Manifests, corpus indexes or .pack files")
+    p.add_argument("--synthetic", type=int, default=0, help="Add N random synthetic clips (generate_tones contours)")
+    p.add_argument("--epochs", type=int, default=30)
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--lr", type=float, default=3e-3)
+    p.add_argument("--hidden", type=int, default=HIDDEN, help=f"Channels per conv layer (default: {HIDDEN})")
+    p.add_argument("--val-fraction", type=float, default=0.1, help="Random share of clips held out (default: 0.1)")
+    p.add_argument("--val-speakers", type=str, default="", help="Comma-separated speakers held out instead of a random share")
+    p.add_argument("--seed", type=int, default=0)
+    p = sub.add_parser("evaluate", help="Accuracy vs the template scorer (local/contour) and throughput on a corpus")
+    p.add_argument("corpus", type=Path)
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Clips per inference batch (default: {BATCH_SIZE})")
+    p = sub.add_parser("predict", help="Tone of audio files and every clip of .pack files")
+    p.add_argument("files", nargs="+", type=Path)
+    profiling.add_profile_args(parser)
+    args = parser.parse_args()
+    profiling.start(args, "tone_nn")
+
+    def resolve(path: Path) -> Path:
+        return path if path.is_absolute() else _ROOT / path
+
+    model_path = resolve(args.model)
+    audio_dir = resolve(args.audio_dir) if args.audio_dir else None
+    if args.cmd == "train":
+        if not args.corpora and not args.synthetic:
+            print("Error: give corpora and/or --synthetic N", file=sys.stderr)
+            return 1
+        feats, tones, speakers = [], [], []
+        for corpus in map(resolve, args.corpora):
+            f, t, s, unvoiced = load_corpus(corpus, audio_dir, args.workers)
+            print(f"{corpus}: {len(f)} clips ({unvoiced} without a usable contour)")
+            feats += f
+            tones += list(t)
+            speakers += s
+        if args.synthetic:
+            f, t = synthetic_features(args.synthetic, args.seed, args.workers)
+            print(f"synthetic: {len(f)} clips")
+            feats += f
+            tones += list(t)
+            speakers += ["synthetic"] * len(f)
+        tones = np.array(tones, dtype=int)
+        rng = np.random.default_rng(args.seed)
+        if args.val_speakers:
+            held = np.isin(speakers, args.val_speakers.split(","))
+        else:
+            held = rng.random(len(feats)) < args.val_fraction
+        train_idx, val_idx = np.flatnonzero(~held), np.flatnonzero(held)
+        net = ToneNet.create(hidden=args.hidden, seed=args.seed)
+        val = ([feats[i] for i in val_idx], tones[val_idx])
+        print(f"Training on {len(train_idx)} clips, {len(val_idx)} held out")
+        with profiling.span("train", clips=len(train_idx), epochs=args.epochs):
+            start = time.perf_counter()
+            for stats in train(net, [feats[i] for i in train_idx], tones[train_idx], args.epochs, args.batch_size, args.lr, args.seed, val):
+                val_acc = f"  val {stats['val_acc']:.4f}" if "val_acc" in stats else ""
+                print(f"  epoch {stats['epoch']:3d}  loss {stats['loss']:.4f}  train {stats['train_acc']:.4f}{val_acc}")
+        print(f"Trained in {time.perf_counter() - start:.1f} s")
+        if len(val_idx):
+            template = np.array([local_tone.classify_contour(_contour(feats[i]))[0] for i in val_idx])
+            print(f"Held-out template scorer (local/contour) accuracy {np.mean(template == tones[val_idx]):.4f}")
+        net.save(model_path, clips=len(train_idx), epochs=args.epochs, corpora=[str(c) for c in args.corpora], synthetic=args.synthetic)
+        print(f"Saved {sum(p.size for p in net.params.values())} parameters to {model_path}")
+        return 0
+
+    if not model_path.exists():
+        print(f"Error: {model_path} not found; run the train command first", file=sys.stderr)
+        return 1
+    net = ToneNet.load(model_path)
+
+    if args.cmd == "evaluate":
+        feats, tones, _, unvoiced = load_corpus(resolve(args.corpus), audio_dir, args.workers)
+        if not feats:
+            print("No clips with a usable contour", file=sys.stderr)
+            return 1
+        with profiling.span("predict", clips=len(feats)):
+            start = time.perf_counter()
+            pred = predict(net, feats, args.batch_size).argmax(axis=1) + 1
+            elapsed = time.perf_counter() - start
+        template = np.array([local_tone.classify_contour(_contour(f))[0] for f in feats])
+        per_tone = "  ".join(f"T{t} {np.mean(pred[tones == t] == t):.3f}" for t in range(1, 5) if np.any(tones == t))
+        print(f"{len(feats)} clips ({unvoiced} without a usable contour); {len(feats) / elapsed:.0f} clips/s batched")
+        print(f"  local/nn      accuracy {np.mean(pred == tones):.4f}  ({per_tone})")
+        print(f"  local/contour accuracy {np.mean(template == tones):.4f}")
+        return 0
+
+    # predict
+    for path in map(resolve, args.files):
+        if path.suffix == ".pack":
+            with PackedCorpus(path) as pack:
+                names = pack.names()
+            feats = extract_features(names, args.workers, path)
+            usable = [i for i, f in enumerate(feats) if f is not None]
+            probs = predict(net, [feats[i] for i in usable])
+            results = dict(zip(usable, probs))
+            for i, name in enumerate(names):
+                pr = results.get(i)
+                print(f"{name}: tone {int(pr.argmax()) + 1} (confidence {pr.max():.2f})" if pr is not None else f"{name}: tone ? (no usable contour)")
+            continue
+        tone, conf = net.classify_samples(*local_tone.load_audio(path))
+        print(f"{path}: tone {tone or '?'} (confidence {conf:.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Parsers for model replies: the tone digit and the heard pinyin.
+
+Kept free of heavy imports (no LiteLLM, no audio stack) so worker processes can load it cheaply,
+e.g. reparse_results.py re-applying the current parsers to stored raw responses. Patterns are
+compiled once at import. answer_settled tells when a streamed reply can be cut off (streaming.py).
+"""
+
+import re
+
+_TONE_WORD = re.compile(r"\b[Tt]one\s*[:\s]*([1-4])\b", re.I)  # "tone N" / "Tone: N"
+_ANSWER_2 = re.compile(r"2\)\s*([1-4])\b")  # we ask for "2) The tone number alone"
+_BARE_DIGIT = re.compile(r"\b([1-4])(?!\))\b")  # standalone 1-4 that is not a list label
+_PINYIN_TONE = re.compile(r"[a-zü]+([1-4])\b", re.I)  # tone digit at the end of pinyin (cai4)
+_PINYIN = re.compile(r"\b([a-zü]+)([1-4])\b", re.I)
+# Settled answers in a growing (streamed) reply: followed by a character that cannot extend them
+_ANSWER_2_SETTLED = re.compile(r"2\)\s*[1-4](?=\W)")
+_TONE_WORD_SETTLED = re.compile(r"\b[Tt]one\s*[:\s]*[1-4](?=\W)", re.I)
+
+
+def parse_predicted_tone(content: str | None) -> str:
+    """Extract tone 1–4 from model response; return '' if unclear."""
+    if not content:
+        return ""
+    content = content.strip()
+    for pattern in (_TONE_WORD, _ANSWER_2, _BARE_DIGIT, _PINYIN_TONE):
+        m = pattern.search(content)
+        if m:
+            return m.group(1)
+    return ""
+
+
+def answer_settled(content: str) -> bool:
+    """Whether a reply that is still being generated already holds its answer, so the rest need
+    not be read: the numbered tone "2) N" we ask for (the pinyin is "1)", before it), or "tone N"
+    after a pinyin syllable. Parse the text received so far with the functions here."""
+    if _ANSWER_2_SETTLED.search(content):
+        return True
+    m = _TONE_WORD_SETTLED.search(content)
+    return m is not None and _PINYIN.search(content, 0, m.start()) is not None
+
+
+def parse_heard_pinyin(content: str | None) -> str:
+    """Extract pinyin with tone (e.g. cai1, ma2) from model response; return '' if not found."""
+    if not content:
+        return ""
+    m = _PINYIN.search(content.strip())
+    if m:
+        return f"{m.group(1).lower()}{m.group(2)}"
+    return ""